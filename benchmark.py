@@ -0,0 +1,92 @@
+"""Measure API calls and latency of SheetsManager operations against the fake Sheets service.
+
+Runs a few rounds of a simulated tournament (generate matches, put them on
+court, submit every score) entirely in memory, so results are repeatable and
+no spreadsheet or credentials are needed.
+
+    python benchmark.py --players 40 --rounds 5 --latency 0.05
+"""
+import argparse
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from pickleball import config
+from pickleball.fake_sheets import FakeSheetsService
+from pickleball.governor import RequestGovernor
+from pickleball.sheets_manager import SheetsManager
+from pickleball.storage import SheetsBackend
+
+
+def build_manager(args):
+    """A SheetsManager on a fake spreadsheet with args.players checked-in players."""
+    check_in = datetime.now().strftime(config.TIMESTAMP_FORMAT)
+    players = [
+        [f"Player {i + 1}", config.STATUS_ACTIVE,
+         config.GENDER_FEMALE if i % 2 else config.GENDER_MALE, 0, 0, check_in, "", 0]
+        for i in range(args.players)
+    ]
+    service = FakeSheetsService(
+        sheets={
+            config.SHEET_PLAYERS: [config.PLAYERS_COLUMNS] + players,
+            config.SHEET_MATCHES: [config.MATCHES_COLUMNS],
+            config.SHEET_SCORES: [config.SCORES_COLUMNS],
+            config.SHEET_EVENTS: [config.EVENTS_COLUMNS],
+            config.SHEET_META: [["Sheet", "Revision"]],
+        },
+        latency=args.latency,
+        quota_per_minute=args.quota,
+        seed=args.seed
+    )
+    # Without an emulated quota, don't let the client-side governor throttle the run either
+    governor = RequestGovernor(requests_per_minute=args.quota or 1_000_000)
+    backend = SheetsBackend(spreadsheet_id="benchmark", service=service, governor=governor)
+    return SheetsManager(backend=backend), service
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=40, help="checked-in players")
+    parser.add_argument("--courts", type=int, default=config.COURTS_COUNT, help="courts in play")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds to play")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every API call")
+    parser.add_argument("--quota", type=int, default=0, help="API calls allowed per minute (0 = no limit)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for scores and latency jitter")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    manager, service = build_manager(args)
+    players = [f"Player {i + 1}" for i in range(args.players)]
+    timings = defaultdict(list)
+    calls = defaultdict(Counter)
+
+    def measure(operation, *call_args):
+        before = Counter(service.calls)
+        start = time.perf_counter()
+        result = getattr(manager, operation)(*call_args)
+        timings[operation].append(time.perf_counter() - start)
+        calls[operation].update(Counter(service.calls) - before)
+        return result
+
+    for _ in range(args.rounds):
+        measure("generate_next_matches", players, args.courts)
+        measure("assign_pending_matches_to_courts", args.courts)
+        matches = manager.read_sheet(config.SHEET_MATCHES)
+        on_court = matches[matches[config.COL_MATCH_STATUS] == config.STATUS_SCHEDULED]
+        for match_id in on_court[config.COL_MATCH_ID]:
+            measure("update_match_score", match_id, 11, random.randint(0, 9))
+
+    print(f"{'operation':<34}{'runs':>6}{'mean s':>10}{'max s':>10}  API calls per run")
+    for operation, samples in timings.items():
+        per_run = ", ".join(
+            f"{method} {count / len(samples):.1f}" for method, count in sorted(calls[operation].items())
+        )
+        print(f"{operation:<34}{len(samples):>6}{sum(samples) / len(samples):>10.3f}{max(samples):>10.3f}  {per_run}")
+    print(f"\nTotal API calls: {sum(service.calls.values())} ({dict(service.calls)})")
+    print(f"Rejected with 429: {sum(service.rejected.values())}, emulated latency: {service.busy_seconds:.2f}s")
+    print(f"Cache: {manager.cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
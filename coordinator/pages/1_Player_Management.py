@@ -1,14 +1,14 @@
 import streamlit as st
-from pickleball.sheets_manager import SheetsManager
+from pickleball.sheets_manager import get_sheets_manager
 from pickleball import config
 import pandas as pd
 
 st.set_page_config(page_title="Player Management - Pickleball Round Robin", layout="wide", initial_sidebar_state="collapsed")
-sheets_mgr = SheetsManager()
+sheets_mgr = get_sheets_manager()
 
 # Get and sort players alphabetically
-players_df = sheets_mgr.read_sheet(config.SHEET_PLAYERS)
-players_df = players_df.sort_values(by=config.COL_NAME)
+snapshot = sheets_mgr.load_snapshot()
+players_df = snapshot.players.sort_values(by=config.COL_NAME)
 
 # Initialize session states
 if 'show_match_removal' not in st.session_state:
@@ -214,7 +214,6 @@ if st.session_state.form_submitted:
     st.session_state.new_player_input = ""
     st.session_state.player_gender = config.GENDER_MALE
     st.session_state.form_submitted = False
-    sheets_mgr._clear_cache()  # Clear the cache before rerunning
 
 with st.form("add_player_form"):
     new_player = st.text_input("Player Name", key="new_player_input", value=st.session_state.new_player_input)
@@ -228,7 +227,6 @@ with st.form("add_player_form"):
         if sheets_mgr.add_player(new_player.strip(), gender == config.GENDER_FEMALE):
             st.success(f"Added {new_player}")
             st.session_state.form_submitted = True
-            sheets_mgr._clear_cache()  # Clear the cache after adding player
             st.rerun()
         else:
             st.error("Failed to add player")
@@ -266,7 +264,7 @@ with col1:
             if st.button("Deactivate", key=f"deactivate_{player[config.COL_NAME]}"):
                 st.session_state.player_to_deactivate = player[config.COL_NAME]
                 # Get current and scheduled matches for this player
-                matches_df = sheets_mgr.read_sheet(config.SHEET_MATCHES)
+                matches_df = snapshot.matches
                 current_matches = matches_df[
                     (matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS])) &
                     ((matches_df[config.COL_TEAM1_PLAYER1] == player[config.COL_NAME]) |
@@ -284,7 +282,6 @@ with col1:
                 st.session_state.current_matches = current_matches
                 st.session_state.scheduled_matches = scheduled_matches
                 st.session_state.show_match_removal = True
-                sheets_mgr._clear_cache()  # Clear cache before rerun
                 st.rerun()
 
 with col2:
@@ -313,7 +310,6 @@ with col2:
         with col_button:
             if st.button("Activate", key=f"activate_{player[config.COL_NAME]}"):
                 if sheets_mgr.update_player_status(player[config.COL_NAME], config.STATUS_ACTIVE):
-                    sheets_mgr._clear_cache()  # Clear cache after successful activation
                     st.rerun()
                 else:
                     st.error("Failed to activate player")
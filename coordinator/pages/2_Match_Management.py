@@ -1,23 +1,18 @@
 import streamlit as st
-from pickleball.sheets_manager import SheetsManager
+from pickleball.sheets_manager import get_sheets_manager
 from pickleball import config
 import pandas as pd
 import time
 
 # Force light theme
 st.set_page_config(page_title="Match Management - Pickleball Round Robin", layout="wide", initial_sidebar_state="collapsed")
-sheets_mgr = SheetsManager()
+sheets_mgr = get_sheets_manager()
 
-# Cache sheet data to avoid multiple reads
-@st.cache_data(ttl=60)  # Cache for 60 seconds
 def get_sheet_data():
-    players_df = sheets_mgr.read_sheet(config.SHEET_PLAYERS)
-    matches_df = sheets_mgr.read_sheet(config.SHEET_MATCHES)
-    return players_df, matches_df
-
-def clear_cache():
-    """Clear all Streamlit cached data"""
-    st.cache_data.clear()
+    # Players and matches come from one consistent snapshot, cached by the
+    # shared manager until a write (from any session) changes them
+    snapshot = sheets_mgr.load_snapshot()
+    return snapshot.players, snapshot.matches
 
 # Get cached sheet data
 players_df, matches_df = get_sheet_data()
@@ -114,7 +109,7 @@ if not pending_matches.empty and not scheduled_matches.empty:
 st.header("Court Status")
 active_courts = matches_df[
     matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS])
-][config.COL_COURT_NUMBER].unique()
+][config.COL_COURT_NUMBER].dropna().unique()
 
 # Initialize court count
 court_count = len(active_courts) if len(active_courts) > 0 else config.COURTS_COUNT
@@ -154,7 +149,6 @@ if len(active_courts) > 0:
                 if st.button("Cancel Match", key=f"cancel_current_{current_match[config.COL_MATCH_ID]}"):
                     success, message = sheets_mgr.cancel_match(current_match[config.COL_MATCH_ID])
                     if success:
-                        clear_cache()  # Clear cache after write
                         st.success(message)
                         time.sleep(1)
                         st.rerun()
@@ -183,9 +177,8 @@ if len(active_courts) > 0:
                             st.error("Winning team must win by at least 2 points")
                         else:
                             # Update scores
+                            # Also assigns the freed court to the next pending match
                             if sheets_mgr.update_match_score(current_match[config.COL_MATCH_ID], team1_score, team2_score):
-                                clear_cache()  # Clear cache after write
-                                sheets_mgr.check_and_assign_courts()
                                 st.success("Score updated successfully!")
                                 st.rerun()
                             else:
@@ -266,7 +259,6 @@ if not pending_matches.empty:
             if st.button("Cancel Match", key=f"cancel_pending_{match[config.COL_MATCH_ID]}_{idx}"):
                 success, message = sheets_mgr.cancel_match(match[config.COL_MATCH_ID])
                 if success:
-                    clear_cache()  # Clear cache after write
                     st.success(message)
                     time.sleep(1)
                     st.rerun()
@@ -286,7 +278,7 @@ else:
     # Get number of courts (use cached data)
     active_courts = matches_df[
         matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS])
-    ][config.COL_COURT_NUMBER].unique()
+    ][config.COL_COURT_NUMBER].dropna().unique()
     
     court_count = len(active_courts) if len(active_courts) > 0 else config.COURTS_COUNT
     
@@ -308,8 +300,8 @@ else:
                 with st.spinner("Generating matches..."):
                     success = sheets_mgr.generate_next_matches(active_players, min(court_count, available_slots))
                     if success:
-                        clear_cache()  # Clear cache after write
-                        st.success("Successfully generated new matches!")
+                        quality = sheets_mgr.last_round_quality
+                        st.success("Successfully generated new matches!" + (f" Round {quality}." if quality else ""))
                         time.sleep(1)  # Give time for sheet updates to propagate
                         st.rerun()
                     else:
@@ -318,9 +310,17 @@ else:
                 # Get list of available courts (1-COURTS_COUNT if no active matches)
                 available_courts = []
                 for i in range(1, config.COURTS_COUNT + 1):  # Courts 1-COURTS_COUNT
-                    if str(i) not in active_courts:
+                    if i not in active_courts:
                         available_courts.append(i)
                 
                 # Assign courts to new matches if courts are available
                 if available_courts:
                     sheets_mgr.assign_pending_matches_to_courts(available_courts)
+
+# Maintenance
+with st.expander("Maintenance"):
+    st.write("Players, Matches and Scores are kept up to date from the Events log. Bring them back in line with it if they look wrong.")
+    from_start = st.checkbox("Replay the whole log rather than only the events the sheets are missing")
+    if st.button("Repair Sheets from Events Log"):
+        if sheets_mgr.rebuild_views(from_start=from_start):
+            st.success("Sheets are up to date with the Events log")
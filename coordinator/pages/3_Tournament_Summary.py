@@ -1,10 +1,10 @@
 import streamlit as st
-from pickleball.sheets_manager import SheetsManager
+from pickleball.sheets_manager import get_sheets_manager
 from pickleball import config
 import pandas as pd
 
 st.set_page_config(page_title="Tournament Summary - Pickleball Round Robin", layout="wide", initial_sidebar_state="collapsed")
-sheets_mgr = SheetsManager()
+sheets_mgr = get_sheets_manager()
 
 st.title("Tournament Summary")
 
@@ -20,13 +20,14 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Get tournament data
-players_df = sheets_mgr.read_sheet(config.SHEET_PLAYERS)
-matches_df = sheets_mgr.read_sheet(config.SHEET_MATCHES)
+# Get tournament data (one consistent snapshot, copied since blanks are filled below)
+snapshot = sheets_mgr.load_snapshot()
+players_df = snapshot.players.copy()
+matches_df = snapshot.matches
 
-# Convert numeric columns to proper types and handle blanks
-players_df[config.COL_GAMES_PLAYED] = pd.to_numeric(players_df[config.COL_GAMES_PLAYED], errors='coerce').fillna(0).astype(int)
-players_df[config.COL_AVG_POINTS] = pd.to_numeric(players_df[config.COL_AVG_POINTS], errors='coerce').fillna(0.0)
+# Numeric columns are already typed, count blanks as zero
+players_df[config.COL_GAMES_PLAYED] = players_df[config.COL_GAMES_PLAYED].fillna(0).astype(int)
+players_df[config.COL_AVG_POINTS] = players_df[config.COL_AVG_POINTS].fillna(0.0)
 
 all_active_players = players_df[players_df[config.COL_STATUS] == config.STATUS_PLAYER_ACTIVE]
 
@@ -1,7 +1,6 @@
 import streamlit as st
-import qrcode
 from io import BytesIO
-import PIL.Image
+from pickleball import startup
 
 PLAYER_APP_URL = 'https://pickleball-tournament.streamlit.app/'
 
@@ -30,18 +29,25 @@ st.markdown("""
     </script>
 """, unsafe_allow_html=True)
 
-# Create QR code
-qr = qrcode.QRCode(version=1, box_size=10, border=5)
-qr.add_data(PLAYER_APP_URL)
-qr.make(fit=True)
-
-# Create PIL image
-qr_image = qr.make_image(fill_color="black", back_color="white")
-
-# Convert PIL image to bytes
-img_byte_arr = BytesIO()
-qr_image.save(img_byte_arr, format='PNG')
-img_byte_arr = img_byte_arr.getvalue()
+@st.cache_data
+def qr_code_png(url):
+    """PNG bytes of a QR code for url, drawn once per process"""
+    with startup.timed("import qrcode"):
+        import qrcode
+    # Create QR code
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    # Create PIL image
+    qr_image = qr.make_image(fill_color="black", back_color="white")
+
+    # Convert PIL image to bytes
+    img_byte_arr = BytesIO()
+    qr_image.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+img_byte_arr = qr_code_png(PLAYER_APP_URL)
 
 # Display QR code
 st.image(img_byte_arr)
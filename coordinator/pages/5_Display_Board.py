@@ -1,8 +1,10 @@
 import streamlit as st
-from pickleball.sheets_manager import SheetsManager
-from pickleball import config
+from pickleball.sheets_manager import get_sheets_manager
+from pickleball import config, startup
 import time
 
+_render_start = time.perf_counter()
+
 # Force light theme and configure page
 st.set_page_config(
     page_title="Display Board - Pickleball Round Robin",
@@ -93,12 +95,11 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize sheets manager
-sheets_mgr = SheetsManager()
+sheets_mgr = get_sheets_manager()
 
-# Cache data with a 15-second TTL ...
-@st.cache_data(ttl=14)  # Slightly less than refresh interval to ensure fresh data
 def get_sheet_data():
-    matches_df = sheets_mgr.read_sheet(config.SHEET_MATCHES)
+    # One small revision check per refresh, full read only when matches changed
+    matches_df = sheets_mgr.poll_sheet(config.SHEET_MATCHES)
     return matches_df
 
 def get_ordinal(n):
@@ -238,6 +239,7 @@ def main():
     # Display pending in right column (25%)
     with col2:
         display_pending(matches_df)
+    startup.report("Display Board", _render_start)
     
     # Rerun every 60 seconds using Streamlit's native functionality
     time.sleep(60)
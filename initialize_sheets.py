@@ -16,7 +16,7 @@ def initialize_sheets():
         existing_sheets = [sheet['properties']['title'] for sheet in spreadsheet['sheets']]
         
         # Define the sheets we need
-        required_sheets = ["Players", "Matches", "Scores"]
+        required_sheets = ["Players", "Matches", "Scores", config.SHEET_EVENTS, config.SHEET_META]
         
         # Create any missing sheets
         requests = []
@@ -25,7 +25,9 @@ def initialize_sheets():
                 requests.append({
                     "addSheet": {
                         "properties": {
-                            "title": sheet_name
+                            "title": sheet_name,
+                            # The revision sheet is bookkeeping, keep it out of the way
+                            "hidden": sheet_name == config.SHEET_META
                         }
                     }
                 })
@@ -38,24 +40,14 @@ def initialize_sheets():
             print(f"Created sheets: {[req['addSheet']['properties']['title'] for req in requests]}")
     
         # Initialize each sheet with headers
-        players_headers = [
-            [config.COL_NAME, config.COL_STATUS, config.COL_GENDER, config.COL_TOTAL_POINTS,
-             config.COL_GAMES_PLAYED, config.COL_CHECK_IN_TIME, config.COL_LAST_MATCH_TIME,
-             config.COL_AVG_POINTS]
-        ]
+        players_headers = [config.PLAYERS_COLUMNS]
+        matches_headers = [config.MATCHES_COLUMNS]
+        scores_headers = [config.SCORES_COLUMNS]
+        events_headers = [config.EVENTS_COLUMNS]
 
-        matches_headers = [
-            [config.COL_MATCH_ID, config.COL_COURT_NUMBER,
-             config.COL_TEAM1_PLAYER1, config.COL_TEAM1_PLAYER2,
-             config.COL_TEAM2_PLAYER1, config.COL_TEAM2_PLAYER2,
-             config.COL_START_TIME, config.COL_END_TIME,
-             config.COL_TEAM1_SCORE, config.COL_TEAM2_SCORE,
-             config.COL_MATCH_STATUS]
-        ]
-
-        scores_headers = [
-            ["Match ID", "Player Name", "Total Points"]
-        ]
+        # One revision row per sheet, bumped by every write to that sheet (for Events, the
+        # number of events the other sheets include)
+        meta_values = [["Sheet", "Revision"]] + [[name, "0"] for name in config.META_SHEETS]
 
         # Update each sheet
         sheets.values().update(
@@ -79,6 +71,22 @@ def initialize_sheets():
             body={"values": scores_headers}
         ).execute()
 
+        sheets.values().update(
+            spreadsheetId=config.SPREADSHEET_ID,
+            range=f"{config.SHEET_EVENTS}!A1",
+            valueInputOption="RAW",
+            body={"values": events_headers}
+        ).execute()
+
+        # Leave existing revisions alone, only fill in a new Meta sheet
+        if config.SHEET_META not in existing_sheets:
+            sheets.values().update(
+                spreadsheetId=config.SPREADSHEET_ID,
+                range=f"{config.SHEET_META}!A1",
+                valueInputOption="RAW",
+                body={"values": meta_values}
+            ).execute()
+
         # Format headers (make them bold and freeze them)
         format_requests = []
         for sheet_name in required_sheets:
@@ -1,3 +1,4 @@
+from . import startup  # Imported first so it starts the startup clock
 from .config import (
     GENDER_MALE,
     GENDER_FEMALE,
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+from . import config
+
+
+class SheetCache:
+    """Bounded LRU cache of parsed sheets, keyed by sheet name and data version.
+
+    Each sheet has a version number that local writes bump through
+    invalidate(), which makes every older entry for that sheet unreachable and
+    drops it straight away. Entries also expire after ttl seconds so writes made
+    by other sessions are picked up, but stay available to get_stale while the
+    backend is unreachable. When more than max_entries are held the least
+    recently used entry is evicted.
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = config.CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_entries = config.CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._entries = OrderedDict()  # (sheet, version) -> (stored_at, value)
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def version(self, name):
+        """Current data version of a sheet."""
+        return self._versions.get(name, 0)
+
+    def get(self, name):
+        """Return the cached value for a sheet, or None on a miss."""
+        with self._lock:
+            key = (name, self.version(name))
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                # Kept until replaced or evicted, for get_stale
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, name):
+        """Return the value for the current version of a sheet even if it has expired.
+
+        Used to keep serving data while the backend can't be reached. Does not
+        count towards the hit/miss statistics.
+        """
+        with self._lock:
+            entry = self._entries.get((name, self.version(name)))
+            return entry[1] if entry is not None else None
+
+    def put(self, name, value):
+        """Store a value for the current version of a sheet."""
+        with self._lock:
+            key = (name, self.version(name))
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, name=None):
+        """Bump the version of one sheet (or all sheets) and drop their entries."""
+        with self._lock:
+            names = [name] if name is not None else {key[0] for key in self._entries} | set(self._versions)
+            for sheet in names:
+                self._versions[sheet] = self.version(sheet) + 1
+                for key in [key for key in self._entries if key[0] == sheet]:
+                    del self._entries[key]
+
+    def stats(self):
+        """Hit/miss counters and current size, for display or logging."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+            }
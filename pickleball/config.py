@@ -10,14 +10,52 @@ BONUS_POINT_PER_DIFF = 0.1
 MAX_BONUS_POINTS = 1.0
 MIN_GAMES_FOR_RANKING = 3  # Minimum number of games required to be ranked in standings
 
+# Match Generation
+SCHEDULER_CANDIDATE_POOL = 24  # Most players considered for a round, neediest first (raised to fill every court)
+SCHEDULER_TIME_BUDGET = 0.5  # Seconds spent scoring candidates before the best round found so far is used
+SCHEDULER_SELECTION_BUDGET = 0.25  # Seconds spent improving on the greedy choice of which candidates make the round
+PARTNER_REPEAT_PENALTY = 50  # Score lost per past match two teammates have already played as partners
+OPPONENT_REPEAT_PENALTY = 10  # Score lost per past match two opponents have already played against each other
+SCHEDULER_WORKERS = int(os.getenv("PICKLEBALL_SCHEDULER_WORKERS", "1"))  # Processes scoring candidates in parallel (1 = always serial, the default)
+SCHEDULER_PARALLEL_MIN_PLAYERS = 32  # Smaller candidate pools are scored serially, as processes would cost more than they save
+SCHEDULER_SHARD_TOP_K = 2000  # Best candidates each worker process sends back per anchor player
+SCHEDULER_LOOKAHEAD_ROUNDS = int(os.getenv("PICKLEBALL_LOOKAHEAD_ROUNDS", "0"))  # Rounds planned ahead and handed out one per generation (0 = plan each round when asked)
+
 # Google Sheets Configuration
 SPREADSHEET_ID = "1_ga5oUPky7iEBf88KiBjMoCAr4-5eY-DZPuLRRCL86Y"  # To be filled with your Google Sheet ID
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
+# Storage Backend
+STORAGE_BACKEND = os.getenv("PICKLEBALL_STORAGE", "sheets")  # "sheets", "sqlite" or "fake" (in-memory Sheets stand-in)
+SQLITE_PATH = os.getenv("PICKLEBALL_SQLITE_PATH", "pickleball.db")  # Local database file for the sqlite backend
+SQLITE_MIRROR_TO_SHEETS = os.getenv("PICKLEBALL_SQLITE_MIRROR", "") == "1"  # Also copy sqlite writes to Google Sheets
+FAKE_SHEETS_LATENCY_SECONDS = float(os.getenv("PICKLEBALL_FAKE_LATENCY", "0"))  # Delay added to every fake Sheets call
+FAKE_SHEETS_QUOTA_PER_MINUTE = int(os.getenv("PICKLEBALL_FAKE_QUOTA", "0"))  # Fake Sheets answers 429 past this many calls a minute (0 = no limit)
+
+# Read Cache
+CACHE_TTL_SECONDS = 60  # How long a cached sheet is trusted before re-reading (other sessions may have written)
+CACHE_MAX_ENTRIES = 16  # Most sheet snapshots held in memory at once
+
+# Sheets API Quota
+SHEETS_REQUESTS_PER_MINUTE = 60  # Per-user quota, applied separately to reads and writes
+SHEETS_MAX_WAIT_SECONDS = 5  # Longest a single call may block on quota or retries before giving up
+SHEETS_BACKOFF_BASE_SECONDS = 1  # First retry waits up to this long, doubling each attempt
+SHEETS_BACKOFF_MAX_SECONDS = 64  # Cap on a single backoff delay
+RECONCILE_INTERVAL_SECONDS = 300  # How often tracked row counts are checked against the sheet
+
+# Published CSVs (player app)
+CSV_META_URL = os.getenv("PICKLEBALL_CSV_META_URL", "")  # Published CSV of the Meta sheet, lets unchanged sheets be skipped
+CSV_CACHE_TTL_SECONDS = 10  # How long a downloaded CSV is served without asking the server again
+CSV_STALE_SECONDS = 120  # How long past the TTL an old copy is still served while it is refreshed in the background
+CSV_POOL_SIZE = 10  # Connections kept open to the CSV host
+
 # Sheet Names
 SHEET_PLAYERS = "Players"
 SHEET_MATCHES = "Matches"
 SHEET_SCORES = "Scores"
+SHEET_EVENTS = "Events"  # Append-only log of every change; Players, Matches and Scores are views of it
+SHEET_META = "Meta"  # Hidden sheet holding a revision number per sheet, for cheap change checks
+META_SHEETS = [SHEET_PLAYERS, SHEET_MATCHES, SHEET_SCORES, SHEET_EVENTS]  # Order of the revision rows in the Meta sheet (Events: events included in the views)
 
 # Column Names
 # Players Sheet
@@ -44,6 +82,11 @@ COL_TEAM2_SCORE = "Team 2 Score"
 COL_MATCH_STATUS = "Match Status"
 COL_MATCH_TYPE = "Match Type"  # New column for match type
 
+# Events Sheet
+COL_EVENT_TIME = "Time"
+COL_EVENT_TYPE = "Event"
+COL_EVENT_DATA = "Data"  # JSON details of the event
+
 # Status Values
 STATUS_ACTIVE = "Active"
 STATUS_INACTIVE = "Inactive"
@@ -70,3 +113,26 @@ STATUS_CANCELLED = "Cancelled"
 
 # Scores Sheet
 COL_POINTS = "Points"
+
+# Sheet Layouts (column order of each sheet)
+PLAYERS_COLUMNS = [
+    COL_NAME, COL_STATUS, COL_GENDER, COL_TOTAL_POINTS,
+    COL_GAMES_PLAYED, COL_CHECK_IN_TIME, COL_LAST_MATCH_TIME, COL_AVG_POINTS
+]
+MATCH_PLAYER_COLUMNS = [  # The four player seats of a match, in team order
+    COL_TEAM1_PLAYER1, COL_TEAM1_PLAYER2, COL_TEAM2_PLAYER1, COL_TEAM2_PLAYER2
+]
+MATCHES_COLUMNS = [
+    COL_MATCH_ID, COL_COURT_NUMBER,
+    COL_TEAM1_PLAYER1, COL_TEAM1_PLAYER2, COL_TEAM2_PLAYER1, COL_TEAM2_PLAYER2,
+    COL_START_TIME, COL_END_TIME, COL_TEAM1_SCORE, COL_TEAM2_SCORE,
+    COL_MATCH_STATUS, COL_MATCH_TYPE
+]
+SCORES_COLUMNS = [COL_MATCH_ID, COL_NAME, COL_TOTAL_POINTS]
+EVENTS_COLUMNS = [COL_EVENT_TIME, COL_EVENT_TYPE, COL_EVENT_DATA]
+SHEET_COLUMNS = {
+    SHEET_PLAYERS: PLAYERS_COLUMNS,
+    SHEET_MATCHES: MATCHES_COLUMNS,
+    SHEET_SCORES: SCORES_COLUMNS,
+}
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # How times are written to the sheets
@@ -2,43 +2,232 @@ import pandas as pd
 import requests
 import io
 import logging
+import threading
+import time
 import urllib3
 import warnings
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
+from . import config
+from .player_index import EMPTY, build_player_index
 
 # Suppress SSL verification warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+
+@dataclass
+class _Download:
+    """A published CSV as last downloaded, with what's needed to revalidate it."""
+    df: pd.DataFrame
+    fetched_at: float  # time.monotonic() of the last download or revalidation
+    etag: str = None
+    last_modified: str = None
+    revision: str = None  # Meta revision the download is known to match, if any
+
+
+# Shared by every CSVManager in this process, so all sessions reuse one download
+_downloads = {}  # url -> _Download
+_url_locks = defaultdict(threading.Lock)  # One fetch per URL at a time
+_refreshing = set()  # URLs being refreshed in the background
+_indexes = {}  # url -> (DataFrame the index was built from, player index)
+_lock = threading.Lock()
+_session = None
+
+
+def _get_session():
+    """The pooled HTTP session shared by every CSVManager, created on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=config.CSV_POOL_SIZE, pool_maxsize=config.CSV_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.verify = False
+            _session = session
+        return _session
+
+
 class CSVManager:
-    def __init__(self):
+    def __init__(self, meta_url=None):
         self.urls = {
             'players': 'https://docs.google.com/spreadsheets/d/e/2PACX-1vTKnPg-np8V_1ytXq5HkMXg4bJiOHE0S8A8h18-hTlxrwun4yEfIXxt5bE2ks8MZjXS1gck-6OIG0ox/pub?gid=1330314038&single=true&output=csv',
             'matches': 'https://docs.google.com/spreadsheets/d/e/2PACX-1vTKnPg-np8V_1ytXq5HkMXg4bJiOHE0S8A8h18-hTlxrwun4yEfIXxt5bE2ks8MZjXS1gck-6OIG0ox/pub?gid=2141367686&single=true&output=csv',
             'scores': 'https://docs.google.com/spreadsheets/d/e/2PACX-1vTKnPg-np8V_1ytXq5HkMXg4bJiOHE0S8A8h18-hTlxrwun4yEfIXxt5bE2ks8MZjXS1gck-6OIG0ox/pub?gid=1595320677&single=true&output=csv'
         }
+        # Published Meta sheet with each sheet's revision (optional)
+        self.meta_url = meta_url or config.CSV_META_URL or None
+        self._revisions = None
+        self._sources = {}  # Lower-case sheet name -> shared DataFrame read_sheet last copied
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
-        
+
+    def read_revisions(self):
+        """Read every sheet's revision from the published Meta sheet, keyed by lower-case name.
+
+        Returns None if there is no meta URL or it can't be read.
+        """
+        if not self.meta_url:
+            return None
+        try:
+            meta_df = self._fetch(self.meta_url, dtype=str).df
+            return {str(name).lower(): revision for name, revision in zip(meta_df['Sheet'], meta_df['Revision'])}
+        except Exception as e:
+            self.logger.error(f"Error reading revisions: {str(e)}")
+            return None
+
+    def _current_revision(self, sheet_name):
+        """Revision of a sheet, read once per CSVManager so a page run sees one set of revisions"""
+        if self._revisions is None:
+            self._revisions = self.read_revisions() or {}
+        return self._revisions.get(sheet_name.lower())
+
+    def _fetch(self, url, revision=None, **read_csv_args):
+        """Return the _Download for a published CSV, downloading it only when needed.
+
+        A download is shared by every session for CSV_CACHE_TTL_SECONDS, or for
+        as long as its Meta revision is current. After that it is revalidated
+        with If-None-Match / If-Modified-Since, so an unchanged sheet costs an
+        empty 304 and no parsing. For CSV_STALE_SECONDS more the old copy is
+        served straight away while one background thread revalidates it. Only
+        one request per URL is ever in flight; other callers wait for it.
+        Errors are raised only when there is no copy to fall back on.
+        """
+        with _lock:
+            download = _downloads.get(url)
+        if download is not None:
+            age = time.monotonic() - download.fetched_at
+            if revision is not None and download.revision == revision:
+                return download
+            # A newer revision means the copy is known to be out of date, so don't serve it
+            if revision is None or download.revision is None:
+                if age <= config.CSV_CACHE_TTL_SECONDS:
+                    return download
+                if age <= config.CSV_CACHE_TTL_SECONDS + config.CSV_STALE_SECONDS:
+                    self._refresh_in_background(url, read_csv_args)
+                    return download
+
+        with _url_locks[url]:
+            # Another caller may have fetched it while we waited
+            with _lock:
+                current = _downloads.get(url)
+            if current is not None and current is not download and (revision is None or current.revision == revision):
+                return current
+            return self._revalidate(url, revision, read_csv_args)
+
+    def _refresh_in_background(self, url, read_csv_args):
+        """Revalidate a download on a background thread, unless one is already doing it"""
+        with _lock:
+            if url in _refreshing:
+                return
+            _refreshing.add(url)
+
+        def refresh():
+            try:
+                with _url_locks[url]:
+                    self._revalidate(url, None, read_csv_args)
+            except Exception as e:
+                self.logger.warning(f"Background refresh of {url} failed: {str(e)}")
+            finally:
+                with _lock:
+                    _refreshing.discard(url)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _revalidate(self, url, revision, read_csv_args):
+        """Conditionally download a CSV and store the result. Call with the URL's lock held."""
+        with _lock:
+            download = _downloads.get(url)
+        headers = {}
+        if download is not None:
+            if download.etag:
+                headers['If-None-Match'] = download.etag
+            if download.last_modified:
+                headers['If-Modified-Since'] = download.last_modified
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                response = _get_session().get(url, headers=headers, timeout=10)
+            if response.status_code != 304:
+                response.raise_for_status()  # Raise an exception for bad status codes
+        except requests.exceptions.RequestException as e:
+            if download is None:
+                raise
+            self.logger.warning(f"Serving cached copy of {url}: {str(e)}")
+            return download
+
+        if response.status_code == 304:
+            # Unchanged: keep the parsed frame, just restart its TTL
+            download = _Download(download.df, time.monotonic(), download.etag, download.last_modified,
+                                 revision or download.revision)
+        else:
+            download = _Download(
+                pd.read_csv(io.StringIO(response.text), **read_csv_args),
+                time.monotonic(),
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                revision
+            )
+        with _lock:
+            _downloads[url] = download
+        return download
+
     def read_sheet(self, sheet_name):
         """Read data from CSV URL based on sheet name."""
         try:
             url = self.urls.get(sheet_name.lower())
             if not url:
                 raise ValueError(f"Unknown sheet name: {sheet_name}")
-            
-            # Use requests to get the CSV data with SSL verification disabled
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                response = requests.get(url, verify=False)
-            response.raise_for_status()  # Raise an exception for bad status codes
-            
-            # Read CSV data from the response content
-            df = pd.read_csv(io.StringIO(response.text))
-            self.logger.info(f"Successfully read sheet {sheet_name}. Columns: {df.columns.tolist()}")
-            return df
-            
+
+            df = self._fetch(url, self._current_revision(sheet_name)).df
+            self._sources[sheet_name.lower()] = df
+            self.logger.debug(f"Read sheet {sheet_name}. Columns: {df.columns.tolist()}")
+            # The frame is shared with other sessions, so hand out a copy
+            return df.copy()
+
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Error fetching CSV data: {str(e)}")
             return pd.DataFrame()
         except Exception as e:
             self.logger.error(f"Error reading CSV data: {str(e)}")
             return pd.DataFrame()
+
+    def read_all(self, sheet_names=None):
+        """Read several published sheets at once, keyed by the names given (default: all of them).
+
+        The sheets are downloaded in parallel over the shared session, so a
+        page waits for the slowest download rather than all of them in turn.
+        Revisions are read from Meta once beforehand and every sheet is
+        matched against that one snapshot, so the frames belong together.
+        """
+        sheet_names = list(sheet_names or self.urls)
+        self._current_revision(sheet_names[0])  # Read Meta before the downloads start
+        with ThreadPoolExecutor(max_workers=len(sheet_names)) as pool:
+            return dict(zip(sheet_names, pool.map(self.read_sheet, sheet_names)))
+
+    def player_matches(self, player_name):
+        """A player's current, upcoming and completed matches, as a PlayerMatches.
+
+        Uses the Matches CSV this manager last read (reading it if it hasn't).
+        The index behind this is built once per download of that CSV and shared
+        by every session, so a refresh is a lookup rather than a scan.
+        """
+        if 'matches' not in self._sources:
+            self.read_sheet(config.SHEET_MATCHES)
+        source = self._sources.get('matches')
+        if source is None:
+            return EMPTY
+
+        url = self.urls['matches']
+        with _lock:
+            cached = _indexes.get(url)
+        if cached is not None and cached[0] is source:
+            index = cached[1]
+        else:
+            index = build_player_index(source)
+            with _lock:
+                _indexes[url] = (source, index)
+        return index.get(player_name, EMPTY)
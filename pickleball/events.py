@@ -0,0 +1,243 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+
+from . import config, schema
+
+# Event types written to the Events sheet
+PLAYER_ADDED = "Player Added"
+PLAYER_STATUS_CHANGED = "Player Status Changed"
+PLAYER_GENDER_CHANGED = "Player Gender Changed"
+MATCH_GENERATED = "Match Generated"
+COURT_ASSIGNED = "Court Assigned"
+MATCH_STATUS_CHANGED = "Match Status Changed"
+SCORE_SUBMITTED = "Score Submitted"
+MATCH_CANCELLED = "Match Cancelled"
+
+
+@dataclass(frozen=True)
+class Event:
+    """One change to the tournament, as a row of the Events sheet."""
+    time: str
+    type: str
+    data: dict = field(default_factory=dict)
+
+    def to_row(self):
+        return [self.time, self.type, json.dumps(self.data, sort_keys=True)]
+
+    @classmethod
+    def from_row(cls, row):
+        row = list(row) + [""] * (3 - len(row))
+        return cls(time=row[0], type=row[1], data=json.loads(row[2]) if row[2] else {})
+
+
+def parse_log(values):
+    """Events from the raw values of the Events sheet, in the order they were appended."""
+    if values and list(values[0][:len(config.EVENTS_COLUMNS)]) == config.EVENTS_COLUMNS:
+        values = values[1:]
+    return [Event.from_row(row) for row in values if any(row)]
+
+
+def _number(value):
+    """A numeric cell as a number, blanks as 0."""
+    return 0 if value in ("", None) else value
+
+
+class TournamentState:
+    """Players, Matches and Scores as plain rows, kept up to date by applying events.
+
+    This is the materialized form of the event log: SheetsManager builds one
+    from the sheets (which are snapshots of it), records new events against
+    it and writes back the rows that changed. Replaying the whole log into an
+    empty state rebuilds the sheets, or shows them as they were at any point.
+    position is the number of logged events the state includes.
+    """
+
+    def __init__(self, players=None, matches=None, scores=None, position=0):
+        self.tables = {
+            config.SHEET_PLAYERS: players or [],
+            config.SHEET_MATCHES: matches or [],
+            config.SHEET_SCORES: scores or [],
+        }
+        self.position = position
+        self.pending = []  # Events recorded but not yet logged
+
+    @classmethod
+    def from_frames(cls, players_df, matches_df, scores_df, position=0):
+        """State holding the rows of the three sheets as read."""
+        tables = []
+        for name, df in [(config.SHEET_PLAYERS, players_df), (config.SHEET_MATCHES, matches_df),
+                         (config.SHEET_SCORES, scores_df)]:
+            columns = config.SHEET_COLUMNS[name]
+            df = df.reindex(columns=columns) if not df.empty else schema.empty_frame(name)
+            tables.append([dict(zip(columns, row)) for row in schema.to_values(df)[1:]])
+        return cls(*tables, position=position)
+
+    @property
+    def players(self):
+        return self.tables[config.SHEET_PLAYERS]
+
+    @property
+    def matches(self):
+        return self.tables[config.SHEET_MATCHES]
+
+    @property
+    def scores(self):
+        return self.tables[config.SHEET_SCORES]
+
+    def frame(self, sheet):
+        """One table as a typed DataFrame, like SheetsManager.read_sheet returns."""
+        columns = config.SHEET_COLUMNS[sheet]
+        rows = [[row.get(col, "") for col in columns] for row in self.tables[sheet]]
+        return schema.convert(pd.DataFrame(rows, columns=columns, dtype=object))
+
+    def frames(self):
+        """{sheet: DataFrame} for Players, Matches and Scores."""
+        return {name: self.frame(name) for name in self.tables}
+
+    def find_player(self, name):
+        return next((row for row in self.players if row[config.COL_NAME] == name), None)
+
+    def find_match(self, match_id):
+        return next((row for row in self.matches if row[config.COL_MATCH_ID] == match_id), None)
+
+    def record(self, event_type, when=None, **data):
+        """Apply a new event and queue it to be logged."""
+        when = when or datetime.now()
+        event = Event(when.strftime(config.TIMESTAMP_FORMAT), event_type, data)
+        self.apply(event)
+        self.pending.append(event)
+        return event
+
+    def apply(self, event):
+        """Update the tables for one event. Events about unknown players or matches change nothing.
+
+        Events the tables already reflect (a player or match that exists, a
+        score already on its completed match) are skipped too, so an event
+        logged twice, as when a commit whose view write failed is retried,
+        counts once.
+        """
+        data = event.data
+        if event.type == PLAYER_ADDED:
+            if self.find_player(data['name']) is not None:
+                return
+            self.players.append({
+                config.COL_NAME: data['name'],
+                config.COL_STATUS: config.STATUS_PLAYER_ACTIVE,
+                config.COL_GENDER: data['gender'],
+                config.COL_TOTAL_POINTS: 0,
+                config.COL_GAMES_PLAYED: 0,
+                config.COL_CHECK_IN_TIME: "",
+                config.COL_LAST_MATCH_TIME: "",
+                config.COL_AVG_POINTS: 0
+            })
+        elif event.type == PLAYER_STATUS_CHANGED:
+            player = self.find_player(data['name'])
+            if player is not None:
+                player[config.COL_STATUS] = data['status']
+        elif event.type == PLAYER_GENDER_CHANGED:
+            player = self.find_player(data['name'])
+            if player is not None:
+                player[config.COL_GENDER] = data['gender']
+        elif event.type == MATCH_GENERATED:
+            if self.find_match(data['match_id']) is not None:
+                return
+            players = data['players']
+            self.matches.append({
+                config.COL_MATCH_ID: data['match_id'],
+                config.COL_COURT_NUMBER: "",
+                config.COL_TEAM1_PLAYER1: players[0],
+                config.COL_TEAM1_PLAYER2: players[1],
+                config.COL_TEAM2_PLAYER1: players[2],
+                config.COL_TEAM2_PLAYER2: players[3],
+                config.COL_START_TIME: "",
+                config.COL_END_TIME: "",
+                config.COL_TEAM1_SCORE: "",
+                config.COL_TEAM2_SCORE: "",
+                config.COL_MATCH_STATUS: config.STATUS_PENDING,
+                config.COL_MATCH_TYPE: data['type']
+            })
+        elif event.type == COURT_ASSIGNED:
+            match = self.find_match(data['match_id'])
+            if match is not None:
+                match[config.COL_COURT_NUMBER] = data['court']
+                match[config.COL_MATCH_STATUS] = config.STATUS_SCHEDULED
+                if data.get('started'):
+                    match[config.COL_START_TIME] = event.time
+        elif event.type == MATCH_STATUS_CHANGED:
+            match = self.find_match(data['match_id'])
+            if match is not None:
+                match[config.COL_MATCH_STATUS] = data['status']
+                if data['status'] == config.STATUS_IN_PROGRESS:
+                    match[config.COL_START_TIME] = event.time
+                elif data['status'] == config.STATUS_COMPLETED:
+                    match[config.COL_END_TIME] = event.time
+        elif event.type == SCORE_SUBMITTED:
+            match = self.find_match(data['match_id'])
+            if match is None or (
+                match[config.COL_MATCH_STATUS] == config.STATUS_COMPLETED
+                and match[config.COL_TEAM1_SCORE] == data['team1_score']
+                and match[config.COL_TEAM2_SCORE] == data['team2_score']
+            ):
+                return
+            # A corrected score replaces the one before it rather than adding to it
+            self._remove_scores(data['match_id'])
+            match[config.COL_TEAM1_SCORE] = data['team1_score']
+            match[config.COL_TEAM2_SCORE] = data['team2_score']
+            match[config.COL_MATCH_STATUS] = config.STATUS_COMPLETED
+            match[config.COL_END_TIME] = event.time
+            teams = [
+                ([match[config.COL_TEAM1_PLAYER1], match[config.COL_TEAM1_PLAYER2]], data['team1_points']),
+                ([match[config.COL_TEAM2_PLAYER1], match[config.COL_TEAM2_PLAYER2]], data['team2_points']),
+            ]
+            for names, points in teams:
+                for name in names:
+                    player = self.find_player(name) if name else None
+                    if player is None:
+                        continue
+                    self._add_points(player, points, 1)
+                    self.scores.append({
+                        config.COL_MATCH_ID: data['match_id'],
+                        config.COL_NAME: name,
+                        config.COL_TOTAL_POINTS: points
+                    })
+        elif event.type == MATCH_CANCELLED:
+            self.tables[config.SHEET_MATCHES] = [
+                row for row in self.matches if row[config.COL_MATCH_ID] != data['match_id']
+            ]
+
+    def _add_points(self, player, points, games):
+        """Add points over games to a player's totals (negative to take them away)."""
+        total = _number(player[config.COL_TOTAL_POINTS]) + points
+        played = _number(player[config.COL_GAMES_PLAYED]) + games
+        player[config.COL_TOTAL_POINTS] = total
+        player[config.COL_GAMES_PLAYED] = played
+        player[config.COL_AVG_POINTS] = total / played if played else 0
+
+    def _remove_scores(self, match_id):
+        """Take a match's Scores rows back out of the tables, with the points and games they added."""
+        for row in self.scores:
+            if row[config.COL_MATCH_ID] == match_id:
+                player = self.find_player(row[config.COL_NAME])
+                if player is not None:
+                    self._add_points(player, -_number(row[config.COL_TOTAL_POINTS]), -1)
+        self.tables[config.SHEET_SCORES] = [row for row in self.scores if row[config.COL_MATCH_ID] != match_id]
+
+
+def replay(events, until=None):
+    """A TournamentState built from nothing by applying events in order.
+
+    until limits the replay to the first until events (an int) or to the
+    events logged at or before until (a datetime).
+    """
+    state = TournamentState()
+    for index, event in enumerate(events):
+        if isinstance(until, int) and index >= until:
+            break
+        if isinstance(until, datetime) and datetime.strptime(event.time, config.TIMESTAMP_FORMAT) > until:
+            break
+        state.apply(event)
+        state.position += 1
+    return state
@@ -0,0 +1,250 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from . import config
+
+
+def _column_index(letters):
+    """0-based index of a column given in A1 letters ("A" -> 0, "AA" -> 26)."""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def _column_letters(index):
+    """A1 letters of a 0-based column index."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _to_cell(value):
+    """Store a value the way Sheets shows it back with FORMATTED_VALUE: as text."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class FakeRequest:
+    """A prepared call, run by execute() like googleapiclient's HttpRequest."""
+
+    def __init__(self, service, method, handler):
+        self._service = service
+        self._method = method
+        self._handler = handler
+
+    def execute(self, http=None, num_retries=0):
+        return self._service._call(self._method, self._handler)
+
+
+class _FakeValues:
+    def __init__(self, service):
+        self._service = service
+
+    def get(self, spreadsheetId, range, **kwargs):
+        return FakeRequest(self._service, 'values.get', lambda: self._service._get(range))
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        return FakeRequest(self._service, 'values.batchGet', lambda: {
+            'spreadsheetId': spreadsheetId,
+            'valueRanges': [self._service._get(a1_range) for a1_range in ranges]
+        })
+
+    def update(self, spreadsheetId, range, body, valueInputOption='RAW', **kwargs):
+        return FakeRequest(self._service, 'values.update', lambda: self._service._update(range, body['values']))
+
+    def batchUpdate(self, spreadsheetId, body):
+        def handler():
+            # Validate every range first so a bad request changes nothing, like the real API
+            for item in body['data']:
+                self._service._parse_range(item['range'])
+            responses = [self._service._update(item['range'], item['values']) for item in body['data']]
+            return {
+                'spreadsheetId': spreadsheetId,
+                'totalUpdatedRows': sum(r['updatedRows'] for r in responses),
+                'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+                'responses': responses
+            }
+        return FakeRequest(self._service, 'values.batchUpdate', handler)
+
+    def append(self, spreadsheetId, range, body, valueInputOption='RAW', insertDataOption='INSERT_ROWS', **kwargs):
+        return FakeRequest(self._service, 'values.append', lambda: self._service._append(range, body['values']))
+
+    def clear(self, spreadsheetId, range, body=None):
+        return FakeRequest(self._service, 'values.clear', lambda: self._service._clear(range))
+
+
+class _FakeSpreadsheets:
+    def __init__(self, service):
+        self._service = service
+
+    def values(self):
+        return _FakeValues(self._service)
+
+
+class FakeSheetsService:
+    """In-process stand-in for the Google Sheets v4 API, for tests and benchmarks.
+
+    Implements the values calls the project uses (get, batchGet, update,
+    batchUpdate, append and clear) with the same request/execute() shape and
+    response bodies as googleapiclient, on sheets held in memory. Pass it to
+    SheetsBackend(service=...), or select it with PICKLEBALL_STORAGE=fake.
+
+    latency (plus up to jitter) seconds are slept on every call. Calls beyond
+    quota_per_minute in a rolling minute, and every fail_every-th call, raise
+    the same 429 HttpError as the real API. jitter draws from a seeded random
+    generator and sleep can be replaced, so runs are reproducible.
+    """
+
+    def __init__(self, sheets=None, latency=0.0, jitter=0.0, quota_per_minute=0, fail_every=0,
+                 retry_after=None, seed=0, sleep=time.sleep):
+        if sheets is None:
+            sheets = [config.SHEET_PLAYERS, config.SHEET_MATCHES, config.SHEET_SCORES, config.SHEET_EVENTS, config.SHEET_META]
+        # A dict gives initial rows per sheet, a list just names empty sheets
+        if isinstance(sheets, dict):
+            self.sheets = {name: [[_to_cell(v) for v in row] for row in rows] for name, rows in sheets.items()}
+        else:
+            self.sheets = {name: [] for name in sheets}
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_per_minute = quota_per_minute
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.calls = Counter()  # Calls received, by method
+        self.rejected = Counter()  # Calls answered with a 429, by method
+        self.busy_seconds = 0.0  # Total emulated latency
+        self._random = random.Random(seed)
+        self._sleep = sleep
+        self._recent = deque()  # Times of the calls in the last minute
+        self._total = 0
+        self._lock = threading.RLock()
+
+    def spreadsheets(self):
+        return _FakeSpreadsheets(self)
+
+    def _error(self, status, message, headers=None):
+        resp = httplib2.Response({'status': status, **(headers or {})})
+        content = json.dumps({'error': {'code': status, 'message': message}}).encode()
+        return HttpError(resp, content)
+
+    def _call(self, method, handler):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            self._sleep(delay)
+        with self._lock:
+            self.busy_seconds += delay
+            self.calls[method] += 1
+            self._total += 1
+
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            over_quota = self.quota_per_minute and len(self._recent) >= self.quota_per_minute
+            if over_quota or (self.fail_every and self._total % self.fail_every == 0):
+                self.rejected[method] += 1
+                headers = {'retry-after': str(self.retry_after)} if self.retry_after is not None else None
+                raise self._error(429, "Quota exceeded for quota metric 'Read requests'", headers)
+            self._recent.append(now)
+            return handler()
+
+    def _parse_range(self, a1_range):
+        """Split an A1 range into (sheet, first_row, last_row, first_col, last_col), 1-based rows."""
+        name, _, cells = a1_range.rpartition('!')
+        if not name:
+            name, cells = cells, ""
+        name = name.strip("'")
+        if name not in self.sheets:
+            raise self._error(400, f"Unable to parse range: {a1_range}")
+        if not cells:
+            return name, 1, None, 0, None
+        match = re.fullmatch(r'([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?', cells.upper())
+        if not match:
+            raise self._error(400, f"Unable to parse range: {a1_range}")
+        start_col, start_row, end_col, end_row = match.groups()
+        return (
+            name,
+            int(start_row) if start_row else 1,
+            int(end_row) if end_row else (None if end_col or not start_row else int(start_row)),
+            _column_index(start_col),
+            _column_index(end_col) if end_col else (None if not start_row else _column_index(start_col)),
+        )
+
+    def _get(self, a1_range):
+        with self._lock:
+            name, first_row, last_row, first_col, last_col = self._parse_range(a1_range)
+            rows = self.sheets[name]
+            selected = rows[first_row - 1:last_row]
+            values = []
+            for row in selected:
+                cells = row[first_col:None if last_col is None else last_col + 1]
+                # Trailing blanks are left out of each row, as Sheets does
+                while cells and cells[-1] == "":
+                    cells = cells[:-1]
+                values.append(list(cells))
+            while values and not values[-1]:
+                values.pop()
+            result = {'range': a1_range, 'majorDimension': 'ROWS'}
+            if values:
+                result['values'] = values
+            return result
+
+    def _write(self, name, first_row, first_col, values):
+        rows = self.sheets[name]
+        width = max((len(row) for row in values), default=0)
+        for offset, row in enumerate(values):
+            row_index = first_row - 1 + offset
+            while len(rows) <= row_index:
+                rows.append([])
+            target = rows[row_index]
+            if len(target) < first_col + len(row):
+                target.extend([""] * (first_col + len(row) - len(target)))
+            for col, value in enumerate(row):
+                target[first_col + col] = _to_cell(value)
+        last_row = first_row + len(values) - 1
+        updated_range = f"{name}!{_column_letters(first_col)}{first_row}:{_column_letters(first_col + max(width, 1) - 1)}{last_row}"
+        return {
+            'updatedRange': updated_range,
+            'updatedRows': len(values),
+            'updatedColumns': width,
+            'updatedCells': sum(len(row) for row in values)
+        }
+
+    def _update(self, a1_range, values):
+        with self._lock:
+            name, first_row, _, first_col, _ = self._parse_range(a1_range)
+            return self._write(name, first_row, first_col, values)
+
+    def _append(self, a1_range, values):
+        with self._lock:
+            name, _, _, first_col, _ = self._parse_range(a1_range)
+            rows = self.sheets[name]
+            # New rows go after the last row with any content
+            last = len(rows)
+            while last and not any(rows[last - 1]):
+                last -= 1
+            return {'tableRange': f"{name}!A1", 'updates': self._write(name, last + 1, first_col, values)}
+
+    def _clear(self, a1_range):
+        with self._lock:
+            name, first_row, last_row, first_col, last_col = self._parse_range(a1_range)
+            rows = self.sheets[name]
+            for row in rows[first_row - 1:last_row]:
+                end = len(row) if last_col is None else min(len(row), last_col + 1)
+                for col in range(first_col, end):
+                    row[col] = ""
+            return {'clearedRange': a1_range}
@@ -0,0 +1,138 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: rate limited, or a transient server-side failure
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class QuotaExceeded(Exception):
+    """A request could not be made within the wait budget because of the API quota."""
+
+    def __init__(self, operation, retry_after):
+        super().__init__(f"Quota exceeded for {operation}, retry in {retry_after:.0f}s")
+        self.operation = operation
+        self.retry_after = retry_after
+
+
+def _http_status(error):
+    """Status code of a googleapiclient HttpError, or None for anything else."""
+    resp = getattr(error, 'resp', None)
+    return getattr(resp, 'status', None)
+
+
+def _retry_after(error):
+    """Seconds asked for by a Retry-After header on the error's response, if any."""
+    resp = getattr(error, 'resp', None)
+    value = resp.get('retry-after') if hasattr(resp, 'get') else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RequestGovernor:
+    """Central gate for Sheets API calls.
+
+    Each kind of request ('read' or 'write', which Google meters separately)
+    draws from a token bucket sized to the per-minute quota. Rate-limited and
+    transient failures are retried with jittered exponential backoff, honouring
+    Retry-After, but a call never blocks for longer than max_wait seconds in
+    total: past that it raises QuotaExceeded so the caller can serve cached
+    data and stay responsive. calls counts every request actually sent, by
+    operation name.
+    """
+
+    def __init__(self, requests_per_minute=None, max_wait=None, backoff_base=None, backoff_max=None):
+        self.requests_per_minute = requests_per_minute or config.SHEETS_REQUESTS_PER_MINUTE
+        self.max_wait = config.SHEETS_MAX_WAIT_SECONDS if max_wait is None else max_wait
+        self.backoff_base = config.SHEETS_BACKOFF_BASE_SECONDS if backoff_base is None else backoff_base
+        self.backoff_max = config.SHEETS_BACKOFF_MAX_SECONDS if backoff_max is None else backoff_max
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._tokens = {}
+        self._refilled_at = {}
+        self._blocked_until = {}
+        self._lock = threading.Lock()
+
+    def _reserve(self, kind):
+        """Take a token for kind and return how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            rate = self.requests_per_minute / 60.0
+            tokens = self._tokens.get(kind, float(self.requests_per_minute))
+            elapsed = now - self._refilled_at.get(kind, now)
+            tokens = min(float(self.requests_per_minute), tokens + elapsed * rate) - 1
+            self._tokens[kind] = tokens
+            self._refilled_at[kind] = now
+            wait = -tokens / rate if tokens < 0 else 0.0
+            return max(wait, self._blocked_until.get(kind, 0.0) - now)
+
+    def _release(self, kind):
+        """Give back a token that was reserved but not used."""
+        with self._lock:
+            self._tokens[kind] = self._tokens.get(kind, 0.0) + 1
+
+    def wait_time(self, kind='read'):
+        """Seconds a request of this kind would wait if sent now, without taking a token."""
+        with self._lock:
+            now = time.monotonic()
+            rate = self.requests_per_minute / 60.0
+            tokens = self._tokens.get(kind, float(self.requests_per_minute))
+            tokens = min(float(self.requests_per_minute), tokens + (now - self._refilled_at.get(kind, now)) * rate) - 1
+            wait = -tokens / rate if tokens < 0 else 0.0
+            return max(wait, self._blocked_until.get(kind, 0.0) - now)
+
+    def retry_after(self, kind='read'):
+        """Seconds until the quota is expected to allow another request of this kind."""
+        with self._lock:
+            return max(0.0, self._blocked_until.get(kind, 0.0) - time.monotonic())
+
+    def execute(self, operation, request, kind='read', idempotent=True):
+        """Send request() under the quota and return its result.
+
+        Non-idempotent requests (appends) are only retried after a 429, which
+        guarantees the first attempt was not applied.
+        """
+        deadline = time.monotonic() + self.max_wait
+        attempt = 0
+        while True:
+            wait = self._reserve(kind)
+            if time.monotonic() + wait > deadline:
+                self._release(kind)
+                self.throttled[operation] += 1
+                raise QuotaExceeded(operation, wait)
+            if wait > 0:
+                time.sleep(wait)
+
+            self.calls[operation] += 1
+            try:
+                return request()
+            except Exception as e:
+                status = _http_status(e)
+                transient = status in RETRYABLE_STATUSES or (status is None and isinstance(e, (ConnectionError, TimeoutError)))
+                if not transient or (status != 429 and not idempotent):
+                    raise
+
+                # Full jitter backoff, unless the server said how long to wait
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                attempt += 1
+                if status == 429:
+                    with self._lock:
+                        self._blocked_until[kind] = time.monotonic() + delay
+                logger.warning(f"{operation} failed with {status or type(e).__name__}, retrying in {delay:.1f}s")
+
+                if time.monotonic() + delay > deadline:
+                    self.throttled[operation] += 1
+                    if status == 429:
+                        raise QuotaExceeded(operation, delay) from e
+                    raise
+                time.sleep(delay)
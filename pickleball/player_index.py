@@ -0,0 +1,48 @@
+from dataclasses import dataclass, field
+
+from . import config
+
+
+@dataclass
+class PlayerMatches:
+    """One player's matches as the player app shows them. Matches are dicts of column -> value."""
+    current: dict = None  # Scheduled or in progress
+    upcoming: list = field(default_factory=list)  # (queue position, match), in queue order
+    completed: list = field(default_factory=list)  # By end time
+
+
+EMPTY = PlayerMatches()
+
+
+def build_player_index(matches_df):
+    """Map every player in matches_df to their PlayerMatches in one pass over the table.
+
+    Queue positions count pending matches in sheet order, starting at 1.
+    """
+    index = {}
+    if matches_df.empty:
+        return index
+
+    def entry(match):
+        names = {match.get(col) for col in config.MATCH_PLAYER_COLUMNS}
+        return [index.setdefault(name, PlayerMatches()) for name in names if isinstance(name, str) and name]
+
+    status = matches_df[config.COL_MATCH_STATUS]
+    active = matches_df[status.isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS])]
+    for match in active.to_dict('records'):
+        for player in entry(match):
+            if player.current is None:
+                player.current = match
+
+    pending = matches_df[status == config.STATUS_PENDING]
+    for position, match in enumerate(pending.to_dict('records'), 1):
+        for player in entry(match):
+            player.upcoming.append((position, match))
+
+    completed = matches_df[status == config.STATUS_COMPLETED]
+    if config.COL_END_TIME in completed:
+        completed = completed.sort_values(by=config.COL_END_TIME, kind='stable')
+    for match in completed.to_dict('records'):
+        for player in entry(match):
+            player.completed.append(match)
+    return index
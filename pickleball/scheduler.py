@@ -0,0 +1,826 @@
+import concurrent.futures
+import gc
+import heapq
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import accumulate, combinations
+
+import numpy as np
+import pandas as pd
+
+from . import config, events
+
+logger = logging.getLogger(__name__)
+
+# Matches that count towards a player's games
+COUNTED_STATUSES = [config.STATUS_COMPLETED, config.STATUS_IN_PROGRESS, config.STATUS_SCHEDULED, config.STATUS_PENDING]
+
+# Equal scores are broken in this order of type, as the exhaustive search broke them
+TYPE_ORDER = [config.MATCH_TYPE_MIXED, config.MATCH_TYPE_MENS, config.MATCH_TYPE_WOMENS]
+
+# Ways to split a foursome into teams, as seat orders (team 1 is the first two).
+# Mixed candidates are seated man, woman, man, woman, so only two splits keep each team mixed
+SAME_GENDER_SPLITS = [(0, 1, 2, 3), (0, 2, 1, 3), (0, 3, 1, 2)]
+MIXED_SPLITS = [(0, 1, 2, 3), (0, 3, 2, 1)]
+
+# Neediest free players fill_round() picks each match from, widening to the next when none fits
+FILL_WINDOWS = (8, 16)
+FILL_SECONDS_PER_COURT = 0.003  # Time find_round() sets aside for fill_round() per court
+SORT_SECONDS_PER_CANDIDATE = 1e-6  # Time search() leaves itself for sorting each candidate it scores
+
+
+@dataclass
+class Candidate:
+    """A possible match. players are team 1 player 1, team 1 player 2, team 2 player 1, team 2 player 2."""
+    players: tuple
+    type: str
+    score: float = 0
+    rank: tuple = ()  # Where an exhaustive enumeration would have met this match, to break score ties
+
+
+class InteractionIndex:
+    """How often every two players have been partners and opponents, kept up to date match by match.
+
+    Players are interned to ids the first time they are seen and the counts
+    are dense matrices over those ids, grown by doubling. Adding or removing
+    a match touches six cells, so the index is built from the Matches sheet
+    once and then follows the events SheetsManager commits.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+        self.partners = np.zeros((0, 0), dtype=np.int64)
+        self.opponents = np.zeros((0, 0), dtype=np.int64)
+        self.matches = {}  # Match ID -> players, for removing a match by ID
+
+    @classmethod
+    def from_matches(cls, matches_df):
+        """An index of every match in the Matches sheet."""
+        index = cls()
+        if matches_df.empty:
+            return index
+        names = pd.unique(matches_df[config.MATCH_PLAYER_COLUMNS].to_numpy().ravel())
+        index.intern([name for name in names if isinstance(name, str) and name])
+        spare = len(index.names)
+        seats = _seat_ids(matches_df, index.ids, spare)
+        partners = np.zeros((spare + 1, spare + 1), dtype=np.int64)
+        opponents = np.zeros((spare + 1, spare + 1), dtype=np.int64)
+        for a, b in [(0, 1), (2, 3)]:
+            np.add.at(partners, (seats[:, a], seats[:, b]), 1)
+            np.add.at(partners, (seats[:, b], seats[:, a]), 1)
+        for a in (0, 1):
+            for b in (2, 3):
+                np.add.at(opponents, (seats[:, a], seats[:, b]), 1)
+                np.add.at(opponents, (seats[:, b], seats[:, a]), 1)
+        index.partners[:spare, :spare] = partners[:spare, :spare]
+        index.opponents[:spare, :spare] = opponents[:spare, :spare]
+        for match_id, *players in matches_df[[config.COL_MATCH_ID] + config.MATCH_PLAYER_COLUMNS].itertuples(index=False):
+            index.matches[match_id] = tuple(players)
+        return index
+
+    def intern(self, names):
+        """Ids for names, giving new players the next free ids."""
+        for name in names:
+            if name not in self.ids:
+                self.ids[name] = len(self.names)
+                self.names.append(name)
+        size = len(self.partners)
+        if len(self.names) > size:
+            grown = max(len(self.names), 2 * size, 16)
+            for attr in ('partners', 'opponents'):
+                matrix = np.zeros((grown, grown), dtype=np.int64)
+                matrix[:size, :size] = getattr(self, attr)
+                setattr(self, attr, matrix)
+        return [self.ids[name] for name in names]
+
+    def _count(self, players, step):
+        seats = [self.ids[p] if isinstance(p, str) and p else None for p in players]
+        for a, b in [(0, 1), (2, 3)]:
+            if seats[a] is not None and seats[b] is not None:
+                self.partners[seats[a], seats[b]] += step
+                self.partners[seats[b], seats[a]] += step
+        for a in (0, 1):
+            for b in (2, 3):
+                if seats[a] is not None and seats[b] is not None:
+                    self.opponents[seats[a], seats[b]] += step
+                    self.opponents[seats[b], seats[a]] += step
+
+    def add_match(self, match_id, players):
+        """Count a new match. players are in team order, blanks allowed."""
+        self.intern([p for p in players if isinstance(p, str) and p])
+        self.remove_match(match_id)
+        self.matches[match_id] = tuple(players)
+        self._count(players, 1)
+
+    def remove_match(self, match_id):
+        """Stop counting a match, if it is counted."""
+        players = self.matches.pop(match_id, None)
+        if players is not None:
+            self._count(players, -1)
+
+    def apply(self, event):
+        """Follow a committed event; only generated and cancelled matches change who met whom.
+
+        Like TournamentState.apply, a match ID that is already counted keeps its first players.
+        """
+        if event.type == events.MATCH_GENERATED and event.data['match_id'] not in self.matches:
+            self.add_match(event.data['match_id'], event.data['players'])
+        elif event.type == events.MATCH_CANCELLED:
+            self.remove_match(event.data['match_id'])
+
+    def covers(self, matches_df):
+        """Whether the index counts exactly the matches in matches_df."""
+        return set(self.matches) == set(matches_df[config.COL_MATCH_ID]) if not matches_df.empty else not self.matches
+
+    def among(self, players):
+        """(partners, opponents) matrices restricted to players, in that order."""
+        seats = np.array(self.intern(list(players)), dtype=np.int64)
+        grid = np.ix_(seats, seats)
+        return self.partners[grid], self.opponents[grid]
+
+
+def _seat_ids(matches_df, ids, spare):
+    """(rows, 4) array of the player ids in each match, with spare for blanks and unknown players."""
+    return np.column_stack([
+        matches_df[col].map(ids).fillna(spare).to_numpy(dtype=np.int64) for col in config.MATCH_PLAYER_COLUMNS
+    ])
+
+
+@dataclass
+class PlayerStats:
+    """What scoring needs to know about the players, as arrays indexed by player id (position in names)."""
+    names: list
+    games: np.ndarray  # Matches each player is in, cancelled ones aside
+    mixed: np.ndarray  # How many of those were mixed
+    same: np.ndarray  # How many were same-gender (or of no recorded type)
+    wait: np.ndarray  # Minutes since each player's latest match ended, inf if it hasn't
+    partners: np.ndarray  # partners[i, j]: matches in which i and j were on the same team
+    opponents: np.ndarray  # opponents[i, j]: matches in which i and j were on opposite teams
+    type_ratios: dict  # Share of all matches of each type; empty before the first match
+    match_count: int = 0  # Matches the ratios are over
+    ids: dict = field(init=False)
+
+    def __post_init__(self):
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+
+def player_stats(players, matches_df, interactions=None, now=None):
+    """PlayerStats for players from the Matches sheet, in a few array operations.
+
+    Partner and opponent counts come from interactions, an InteractionIndex
+    of the same sheet, when one is given.
+    """
+    n = len(players)
+    if interactions is None:
+        interactions = InteractionIndex.from_matches(matches_df)
+    partners, opponents = interactions.among(players)
+    rows = len(matches_df)
+    if rows == 0:
+        zeros = np.zeros(n, dtype=np.int64)
+        return PlayerStats(list(players), zeros, zeros.copy(), zeros.copy(), np.full(n, np.inf),
+                           partners, opponents, {})
+
+    # Seat ids per match; anyone not in players (or a blank seat) goes to a spare id n
+    seats = _seat_ids(matches_df, {name: i for i, name in enumerate(players)}, n)
+    members = np.zeros((rows, n + 1), dtype=bool)
+    members[np.arange(rows)[:, None], seats] = True
+    members = members[:, :n]
+
+    counted = matches_df[config.COL_MATCH_STATUS].isin(COUNTED_STATUSES).to_numpy(dtype=bool)
+    is_mixed = (matches_df[config.COL_MATCH_TYPE] == config.MATCH_TYPE_MIXED).to_numpy(dtype=bool)
+    games = members[counted].sum(axis=0)
+    mixed = members[counted & is_mixed].sum(axis=0)
+
+    # Wait is measured from the end of each player's last match in the sheet
+    last = rows - 1 - np.argmax(members[::-1], axis=0)
+    end_times = pd.to_datetime(matches_df[config.COL_END_TIME]).to_numpy()[last]
+    now = np.datetime64(pd.Timestamp(now or datetime.now()).floor('s'))
+    wait = (now - end_times) / np.timedelta64(1, 'm')
+    wait = np.where(members.any(axis=0) & ~np.isnat(end_times), wait, np.inf)
+
+    type_counts = matches_df[config.COL_MATCH_TYPE].value_counts()
+    type_ratios = {match_type: type_counts.get(match_type, 0) / rows for match_type in TYPE_ORDER}
+    return PlayerStats(list(players), games, mixed, games - mixed, wait, partners, opponents, type_ratios, rows)
+
+
+def score_matches(stats, seats, match_type):
+    """Score many candidates of one type at once. seats is a (k, 4) array of player ids.
+
+    The rules are those score_combination always used:
+    - the first matches of the day lean towards same-gender play
+    - a type that is over- or under-played across the day is penalized or favoured
+    - players with fewer games than the busiest player are favoured
+    - players whose own mixed/same-gender split is lopsided are steered back
+    - teammates who have partnered before cost PARTNER_REPEAT_PENALTY per
+      past match, and opponents who have met before OPPONENT_REPEAT_PENALTY
+
+    seats are in team order, so the penalties are for that split of each foursome.
+    """
+    seats = np.asarray(seats, dtype=np.int64).reshape(-1, 4)
+    if not stats.type_ratios:
+        # For first run with empty matches sheet, give slight preference to non-mixed matches
+        return np.full(len(seats), 0 if match_type == config.MATCH_TYPE_MIXED else 50, dtype=np.int64)
+
+    ratios = stats.type_ratios
+    bonus = 0
+    if ratios[config.MATCH_TYPE_MIXED] > 0.5 and match_type == config.MATCH_TYPE_MIXED:
+        bonus = -300  # Heavy penalty for too many mixed matches
+    elif ratios[config.MATCH_TYPE_MENS] < 0.2 and match_type == config.MATCH_TYPE_MENS:
+        bonus = 200  # Bonus for needed mens matches
+    elif ratios[config.MATCH_TYPE_WOMENS] < 0.2 and match_type == config.MATCH_TYPE_WOMENS:
+        bonus = 200  # Bonus for needed womens matches
+
+    # Prefer players with fewer games
+    max_games = stats.games.max() if len(stats.games) else 1
+    player_score = (max_games - stats.games) * 2
+
+    # Per-player type balance, once a player has a few matches
+    total = stats.mixed + stats.same
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if match_type == config.MATCH_TYPE_MIXED:
+            player_score = player_score + np.where((total >= 3) & (stats.mixed / total > 0.6), -400, 0)
+        else:
+            player_score = player_score + np.where((total >= 3) & (stats.same / total < 0.3), 300, 0)
+
+    return bonus + player_score[seats].sum(axis=1) - repeat_penalty(stats, seats)
+
+
+def repeat_penalty(stats, seats):
+    """What it costs for the teams in seats to repeat past partnerships and past match-ups."""
+    partners = stats.partners[seats[:, 0], seats[:, 1]] + stats.partners[seats[:, 2], seats[:, 3]]
+    opponents = sum(stats.opponents[seats[:, a], seats[:, b]] for a in (0, 1) for b in (2, 3))
+    return config.PARTNER_REPEAT_PENALTY * partners + config.OPPONENT_REPEAT_PENALTY * opponents
+
+
+def best_split(stats, seats, match_type):
+    """seats reordered into each foursome's team split with the smallest repeat penalty, first split on ties."""
+    seats = np.asarray(seats, dtype=np.int64).reshape(-1, 4)
+    splits = MIXED_SPLITS if match_type == config.MATCH_TYPE_MIXED else SAME_GENDER_SPLITS
+    options = np.stack([seats[:, list(split)] for split in splits])
+    choice = np.stack([repeat_penalty(stats, option) for option in options]).argmin(axis=0)
+    return options[choice, np.arange(len(seats))]
+
+
+def score_candidates(stats, candidates):
+    """Split each candidate into its best teams and score it, in batched kernel calls per match type."""
+    for match_type in TYPE_ORDER:
+        group = [c for c in candidates if c.type == match_type]
+        if not group:
+            continue
+        seats = best_split(stats, [[stats.ids[p] for p in c.players] for c in group], match_type)
+        scores = score_matches(stats, seats, match_type).tolist()
+        for candidate, order, score in zip(group, seats.tolist(), scores):
+            candidate.players = tuple(stats.names[i] for i in order)
+            candidate.score = score
+
+
+def need_order(stats, players):
+    """players, most in need of a game first: fewest games, then longest wait, then as given."""
+    return sorted(players, key=lambda p: (stats.games[stats.ids[p]], -stats.wait[stats.ids[p]]))
+
+
+def pool_size(court_count):
+    """How many of the neediest players a round is drawn from."""
+    return max(config.SCHEDULER_CANDIDATE_POOL, 4 * court_count)
+
+
+def anchor_candidates(order, position, males, females):
+    """The candidates order[position] makes with the players before it in order.
+
+    Each match among the players of order is anchored on exactly one of
+    them, its last in order, so the anchors up to k together give every
+    match among order[:k + 1]: stopping early still leaves an exhaustive
+    search of the neediest players, and anchors can be scored separately.
+    males and females list each gender in the order equal scores should be
+    broken, which is the order the old combinations() enumeration used.
+    """
+    male_index = {p: i for i, p in enumerate(males)}
+    female_index = {p: i for i, p in enumerate(females)}
+    player = order[position]
+    if player in male_index:
+        index, other_index, match_type = male_index, female_index, config.MATCH_TYPE_MENS
+    elif player in female_index:
+        index, other_index, match_type = female_index, male_index, config.MATCH_TYPE_WOMENS
+    else:
+        return []
+    same = [p for p in order[:position] if p in index]
+    other = [p for p in order[:position] if p in other_index]
+    mixed_rank = TYPE_ORDER.index(config.MATCH_TYPE_MIXED)
+
+    batch = []
+    # Mixed: the player and one earlier player of the same gender, with two earlier players of the other
+    for partner in same:
+        pair = sorted([player, partner], key=index.get)
+        for others in combinations(other, 2):
+            others = sorted(others, key=other_index.get)
+            if match_type == config.MATCH_TYPE_MENS:
+                males_pair, females_pair = pair, others
+            else:
+                males_pair, females_pair = others, pair
+            batch.append(Candidate(
+                (males_pair[0], females_pair[0], males_pair[1], females_pair[1]),
+                config.MATCH_TYPE_MIXED,
+                rank=(mixed_rank, male_index[males_pair[0]], male_index[males_pair[1]],
+                      female_index[females_pair[0]], female_index[females_pair[1]])
+            ))
+    # Same gender: the player and three earlier players of the same gender
+    type_rank = TYPE_ORDER.index(match_type)
+    for trio in combinations(same, 3):
+        four = tuple(sorted((player,) + trio, key=index.get))
+        batch.append(Candidate(four, match_type, rank=(type_rank,) + tuple(index[p] for p in four)))
+    return batch
+
+
+def _best_first(candidate):
+    return -candidate.score, candidate.rank
+
+
+def score_anchor(stats, order, position, males, females, top_k=None):
+    """Score the candidates anchored on order[position], best first, keeping the top_k if given.
+
+    This is what each worker process runs when the search is sharded.
+    """
+    batch = anchor_candidates(order, position, males, females)
+    score_candidates(stats, batch)
+    if top_k is not None and len(batch) > top_k:
+        return heapq.nsmallest(top_k, batch, key=_best_first)
+    return batch
+
+
+def search(order, males, females, stats, deadline, progress=None, workers=1):
+    """Score candidates for the neediest players first, until all are scored or the deadline passes.
+
+    Every player in order needs an entry in stats. With more than one
+    worker, a large enough pool is sharded by anchor player across a process
+    pool (see _search_parallel); otherwise it is scored here, anchor by
+    anchor, and an anchor is skipped if, at the rate scored so far, it
+    would finish, with the sort of the candidates that follows, past the
+    deadline. The search always goes on until it has
+    at least one candidate, however late. progress, if given, is called
+    with the fraction of order searched and a line describing it. Returns
+    the scored candidates, best first, and how many players of order were
+    fully searched.
+    """
+    if workers > 1 and len(order) >= config.SCHEDULER_PARALLEL_MIN_PLAYERS:
+        pool = _get_pool(workers)
+        if pool is not None:
+            try:
+                return _search_parallel(pool, order, males, females, stats, deadline, progress)
+            except concurrent.futures.process.BrokenProcessPool as e:
+                _discard_pool(f"worker processes died: {str(e)}")
+
+    candidates = []
+    searched = 0
+    started = time.perf_counter()
+    male_set = set(males)
+    seen_males = seen_females = 0
+    for player in order:
+        # Anchors grow as the search goes on, so don't start one there's no time left to finish
+        if player in male_set:
+            size = anchor_size(seen_males, seen_females)
+            seen_males += 1
+        else:
+            size = anchor_size(seen_females, seen_males)
+            seen_females += 1
+        now = time.perf_counter()
+        finish = now + size * (now - started) / len(candidates) if candidates else now
+        if candidates and finish + (len(candidates) + size) * SORT_SECONDS_PER_CANDIDATE >= deadline:
+            break
+        candidates.extend(score_anchor(stats, order, searched, males, females))
+        searched += 1
+        if progress is not None:
+            progress(searched / len(order), _search_progress(searched, len(order), candidates))
+    candidates.sort(key=_best_first)
+    return candidates, searched
+
+
+def anchor_size(same, other):
+    """How many candidates a player anchors after same earlier players of their gender and other of the other."""
+    return same * math.comb(other, 2) + math.comb(same, 3)
+
+
+def _search_progress(searched, pool, candidates):
+    best = max((c.score for c in candidates), default=None)
+    return (f"Scored every match among the {searched} neediest of {pool} players "
+            f"({len(candidates)} candidates{'' if best is None else f', best match scores {best:g}'})")
+
+
+def _search_parallel(pool, order, males, females, stats, deadline, progress=None):
+    """search() with one task per anchor player on a process pool.
+
+    Each task gets its own pickled copy of the read-only stats and returns
+    only its best SCHEDULER_SHARD_TOP_K candidates, which are merged here.
+    Anchors are submitted neediest first; those unfinished at the deadline
+    are dropped.
+    """
+    futures = {
+        pool.submit(score_anchor, stats, order, position, males, females, config.SCHEDULER_SHARD_TOP_K): position
+        for position in range(len(order))
+    }
+    candidates = []
+    done_positions = []
+    pending = set(futures)
+    while pending:
+        timeout = None if not candidates else max(0, deadline - time.perf_counter())
+        done, pending = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            candidates.extend(future.result())
+            done_positions.append(futures[future])
+        if progress is not None:
+            progress(len(done_positions) / len(order), _search_progress(len(done_positions), len(order), candidates))
+    for future in pending:
+        future.cancel()
+
+    # Report the anchors searched without a gap, as the serial search does
+    done_positions = set(done_positions)
+    searched = next((i for i in range(len(order)) if i not in done_positions), len(order))
+    candidates.sort(key=_best_first)
+    return candidates, searched
+
+
+_pool = None
+_pool_workers = 0
+_pool_ready = None  # Futures that finish once every worker process has started
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """The shared process pool for sharded scoring, or None while its workers are still starting.
+
+    Processes come from forkserver (or spawn) rather than fork, since the
+    app runs threads. Until they are up, searches run serially instead of
+    waiting; a pool that can't start leaves scoring serial for good.
+    """
+    global _pool, _pool_workers, _pool_ready
+    with _pool_lock:
+        if _pool_workers == -1:
+            return None
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            try:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                _pool_ready = [_pool.submit(os.getpid) for _ in range(workers)]
+                _pool_workers = workers
+            except Exception as e:
+                _discard_pool(f"couldn't start {workers} worker processes: {str(e)}", locked=True)
+                return None
+        if not all(future.done() for future in _pool_ready):
+            return None
+        if any(future.exception() for future in _pool_ready):
+            _discard_pool(f"worker processes didn't start: {_pool_ready[0].exception()}", locked=True)
+            return None
+        return _pool
+
+
+def _discard_pool(reason, locked=False):
+    """Give up on the process pool; every later search runs serially."""
+    global _pool, _pool_workers
+    logger.warning(f"Scoring serially from now on, {reason}")
+    if not locked:
+        _pool_lock.acquire()
+    try:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool, _pool_workers = None, -1
+    finally:
+        if not locked:
+            _pool_lock.release()
+
+
+def type_cap(match_count):
+    """Most matches of one type in a round of match_count.
+
+    This is the mix the old greedy rule allowed: a match could be added
+    while its type made up no more than 60% of the matches already chosen.
+    """
+    return math.floor(0.6 * (match_count - 1)) + 1 if match_count > 0 else 0
+
+
+def greedy_round(candidates, court_count, fixed=()):
+    """Take the best candidates in turn, skipping any that reuse a player or tip a type over 60% of the round.
+
+    Candidates sharing a player with the round never fit again, so each
+    type's list is walked once: the next match is the best of the types the
+    60% rule allows, whatever the number of candidates.
+    """
+    selected = list(fixed)
+    used_players = {p for match in fixed for p in match.players}
+    selected_type_counts = {match_type: sum(m.type == match_type for m in fixed) for match_type in TYPE_ORDER}
+    by_type = {match_type: [] for match_type in TYPE_ORDER}
+    for i, match in enumerate(candidates):
+        by_type[match.type].append((i, match))
+    heads = dict.fromkeys(TYPE_ORDER, 0)
+
+    while len(selected) < court_count:
+        best = None
+        for match_type, group in by_type.items():
+            # No more than 60% of any type
+            if selected and selected_type_counts[match_type] / len(selected) > 0.6:
+                continue
+            i = heads[match_type]
+            while i < len(group) and not used_players.isdisjoint(group[i][1].players):
+                i += 1
+            heads[match_type] = i
+            if i < len(group) and (best is None or group[i][0] < best[0]):
+                best = group[i]
+        if best is None:
+            break  # No valid match found
+        match = best[1]
+        selected.append(match)
+        used_players.update(match.players)
+        selected_type_counts[match.type] += 1
+    return selected
+
+
+def pack_round(candidates, court_count, deadline=None, fixed=(), progress=None):
+    """Pick up to court_count matches with no shared players and the best total score, with a bound on it.
+
+    This is weighted set packing, solved by depth-first branch and bound over
+    candidates sorted best first: players are bits in a mask, and a branch is
+    dropped as soon as filling its free courts with the next best scores
+    couldn't beat the best round so far. Filling more courts always beats a
+    higher score, and no type may exceed type_cap(). The search starts from
+    the greedy round and, if deadline passes, stops with the best round found.
+    Matches in fixed are kept and the rest of the round is built around them.
+    progress, if given, is called with a line about each better round found.
+
+    Returns the round and the most any round of the candidates could score:
+    its own score if the search finished, else the best scores of enough
+    candidates to fill every court their players can fill added up.
+    """
+    fixed = list(fixed)
+    taken = {p for match in fixed for p in match.players}
+    candidates = [c for c in candidates if taken.isdisjoint(c.players)]
+    best_round = greedy_round(candidates, court_count, fixed)
+    # No round can fill more courts than the candidates' players make foursomes
+    reachable = min(court_count, len(fixed) + len({p for c in candidates for p in c.players}) // 4)
+    best_key = (len(best_round), sum(c.score for c in best_round))
+
+    bits = {}
+    masks = []
+
+    def add_masks(stop):
+        # Masks are made as the search reaches them, as it seldom gets far down a long list
+        for candidate in candidates[len(masks):stop]:
+            mask = 0
+            for player in candidate.players:
+                mask |= 1 << bits.setdefault(player, len(bits))
+            masks.append(mask)
+
+    scores = [c.score for c in candidates]
+    prefix = list(accumulate(scores, initial=0))
+    cap = type_cap(court_count)
+    counts = {match_type: sum(m.type == match_type for m in fixed) for match_type in TYPE_ORDER}
+    chosen = []
+    nodes = 0
+    timed_out = False
+
+    def visit(start, used, total):
+        nonlocal best_key, best_round, nodes, timed_out
+        size = len(fixed) + len(chosen)
+        if (size, total) > best_key and all(n <= type_cap(size) for n in counts.values()):
+            best_key = (size, total)
+            best_round = fixed + [candidates[i] for i in chosen]
+            if progress is not None:
+                progress(f"Found a round of {size} matches scoring {total:g}")
+        if size == reachable:
+            return
+        for j in range(start, len(candidates)):
+            nodes += 1
+            if deadline is not None and nodes % 1024 == 0 and time.perf_counter() >= deadline:
+                timed_out = True
+            if timed_out:
+                return
+            # Candidates are best first, so once the next ones can't win neither can any later ones
+            free = min(reachable - size, len(candidates) - j)
+            if (size + free, total + prefix[j + free] - prefix[j]) <= best_key:
+                return
+            if j >= len(masks):
+                add_masks(j + 1024)
+            match_type = candidates[j].type
+            if masks[j] & used or counts[match_type] >= cap:
+                continue
+            chosen.append(j)
+            counts[match_type] += 1
+            visit(j + 1, used | masks[j], total + scores[j])
+            chosen.pop()
+            counts[match_type] -= 1
+
+    visit(0, 0, sum(c.score for c in fixed))
+    bound = best_key[1]
+    if timed_out:
+        bound = max(bound, sum(c.score for c in fixed) + prefix[min(reachable - len(fixed), len(candidates))])
+    return best_round, bound
+
+
+def fill_round(stats, matches, players, males, females, court_count):
+    """matches with the courts they leave empty filled one match at a time from the neediest free players.
+
+    Each match added is the best scoring that fits the type cap among the
+    next FILL_WINDOWS[0] neediest players the round doesn't use, looking
+    wider only if none does, so this costs a few milliseconds a court
+    however many players there are. A search cut short by its deadline
+    then loses quality, not matches.
+    """
+    matches = list(matches)
+    busy = {p for match in matches for p in match.players}
+    free = need_order(stats, [p for p in players if p not in busy])
+    cap = type_cap(court_count)
+    while len(matches) < court_count and len(free) >= 4:
+        counts = {match_type: sum(m.type == match_type for m in matches) for match_type in TYPE_ORDER}
+        best = None
+        for window in FILL_WINDOWS:
+            candidates, _ = search(free[:window], males, females, stats, math.inf)
+            best = next((c for c in candidates if counts[c.type] < cap), None)
+            if best is not None or window >= len(free):
+                break
+        if best is None:
+            break
+        matches.append(best)
+        free = [p for p in free if p not in best.players]
+    return matches
+
+
+@dataclass
+class RoundQuality:
+    """How good a round found against a deadline is known to be."""
+    searched: int  # Neediest players every match among whom was scored
+    pool: int  # Neediest players the search set out to cover
+    candidates: int  # Matches scored
+    score: float  # Total score of the matches packed from the scored candidates
+    bound: float  # Most any round of the scored candidates could score, filling every court if it can
+    seconds: float  # Time taken
+    courts: int = 0  # Matches the round was asked for
+    matches: int = 0  # Matches in the round
+    filled: int = 0  # Matches fill_round() added from players the search didn't reach
+    filled_score: float = 0  # Their total score, which bound says nothing about
+
+    @property
+    def complete(self):
+        """Whether the whole pool was searched, every court filled from it, and the round is the best of it."""
+        return (self.searched == self.pool and self.matches == self.courts and not self.filled
+                and self.score >= self.bound)
+
+    def __str__(self):
+        if self.score >= self.bound:
+            reached = "best possible" if self.searched == self.pool else f"best among the {self.searched} neediest players"
+        else:
+            reached = f"within {self.bound - self.score:g} of the best among the {self.searched} neediest players"
+        if self.filled:
+            reached += (f", plus {self.filled} match{'es' if self.filled > 1 else ''} scoring {self.filled_score:g} "
+                        f"picked greedily from players the search didn't reach")
+        if self.matches < self.courts:
+            reached += f", {self.courts - self.matches} of {self.courts} courts left empty"
+        return f"score {self.score:g}, {reached} ({self.candidates} candidates, {self.seconds:.2f}s)"
+
+
+def find_round(stats, players, males, females, court_count, deadline, progress=None, workers=1, fixed=()):
+    """The best round that can be found by deadline, and a RoundQuality saying how good it is.
+
+    The neediest players are searched first and the candidates then packed
+    into a round, the time left split between the two in the ratio of
+    SCHEDULER_TIME_BUDGET to SCHEDULER_SELECTION_BUDGET. Either step may stop
+    at its deadline and still leave a valid round, so this is an anytime
+    search: a shorter deadline gives a round sooner, with a weaker bound.
+    Time for fill_round() to fill the courts the search doesn't reach is set
+    aside first, and garbage collection is held off until the round is
+    found, so the round is ready by deadline. Matches in fixed are kept and the rest of the round is drawn from the
+    players they leave free. progress, if given, is called with the
+    fraction done and a line describing the best found so far.
+    """
+    with _gc_paused():
+        return _find_round(stats, players, males, females, court_count, deadline, progress, workers, fixed)
+
+
+@contextmanager
+def _gc_paused():
+    """Hold off the cyclic garbage collector, whose passes over the candidates stall a search for tens of milliseconds.
+
+    Candidates hold no reference cycles, so nothing is left for it to do
+    once the round is found.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _find_round(stats, players, males, females, court_count, deadline, progress, workers, fixed):
+    started = time.perf_counter()
+    busy = {p for match in fixed for p in match.players}
+    free = [p for p in players if p not in busy]
+    order = need_order(stats, free)[:pool_size(court_count - len(fixed))] if len(fixed) < court_count else []
+    share = config.SCHEDULER_TIME_BUDGET / (config.SCHEDULER_TIME_BUDGET + config.SCHEDULER_SELECTION_BUDGET)
+    reserve = min((court_count - len(fixed)) * FILL_SECONDS_PER_COURT, (deadline - started) / 2)
+    candidates, searched = search(
+        order, [p for p in males if p not in busy], [p for p in females if p not in busy], stats,
+        started + share * (deadline - reserve - started), progress=progress, workers=workers
+    ) if order else ([], 0)
+
+    def packing(line):
+        progress(1.0, line)
+
+    packed, bound = pack_round(candidates, court_count, deadline - reserve, fixed,
+                               progress=packing if progress else None)
+    # Courts the search didn't reach enough players for are still filled
+    matches = fill_round(stats, packed, players, males, females, court_count)
+    return matches, RoundQuality(
+        searched, len(order), len(candidates), sum(c.score for c in packed), bound,
+        time.perf_counter() - started, court_count, len(matches), len(matches) - len(packed),
+        sum(c.score for c in matches[len(packed):])
+    )
+
+
+@dataclass
+class PlannedRound:
+    """One round of a lookahead plan."""
+    matches: list
+    games: dict  # Games of every player when this round comes up, if the rounds before it go to plan
+
+
+def project(stats, matches):
+    """A copy of stats as they will be once matches have been generated."""
+    games, mixed, same = stats.games.copy(), stats.mixed.copy(), stats.same.copy()
+    wait, partners, opponents = stats.wait.copy(), stats.partners.copy(), stats.opponents.copy()
+    type_counts = {t: stats.type_ratios.get(t, 0) * stats.match_count for t in TYPE_ORDER}
+    for match in matches:
+        seats = [stats.ids[p] for p in match.players]
+        games[seats] += 1
+        if match.type == config.MATCH_TYPE_MIXED:
+            mixed[seats] += 1
+        else:
+            same[seats] += 1
+        wait[seats] = np.inf  # Like a match waiting to be played, it has no end time yet
+        for a, b in [(0, 1), (2, 3)]:
+            partners[seats[a], seats[b]] += 1
+            partners[seats[b], seats[a]] += 1
+        for a in (0, 1):
+            for b in (2, 3):
+                opponents[seats[a], seats[b]] += 1
+                opponents[seats[b], seats[a]] += 1
+        type_counts[match.type] += 1
+    match_count = stats.match_count + len(matches)
+    type_ratios = {t: n / match_count for t, n in type_counts.items()} if match_count else {}
+    return PlayerStats(stats.names, games, mixed, same, wait, partners, opponents, type_ratios, match_count)
+
+
+def round_deadline(rounds=1):
+    """When rounds searched one after another from now should be done, at the configured budgets."""
+    return time.perf_counter() + rounds * (config.SCHEDULER_TIME_BUDGET + config.SCHEDULER_SELECTION_BUDGET)
+
+
+def plan_rounds(stats, players, males, females, court_count, rounds, workers=1, deadline=None):
+    """Plan the next rounds one after another, each against the stats the rounds before it leave.
+
+    Each round is found as generate_next_matches would, so later rounds see
+    who will have played, partnered and faced whom, and which types will be
+    short, and balance those over the whole horizon. The time to deadline
+    (default: the configured budgets per round) is shared out evenly over
+    the rounds still to plan. Stops early if a round can't be filled at all.
+    """
+    deadline = deadline or round_deadline(rounds)
+    plan = []
+    for planned in range(rounds):
+        now = time.perf_counter()
+        matches, _ = find_round(stats, players, males, females, court_count,
+                                now + (deadline - now) / (rounds - planned), workers=workers)
+        if not matches:
+            break
+        plan.append(PlannedRound(matches, {p: int(stats.games[stats.ids[p]]) for p in players}))
+        stats = project(stats, matches)
+    return plan
+
+
+def repair_round(planned, stats, players, males, females, court_count, workers=1, deadline=None):
+    """The planned round fitted to the players and courts there are now, or None if the plan no longer holds.
+
+    A plan holds while every current player was known to it and has played
+    the games it expected (results don't matter, as scoring doesn't use
+    them). Matches with players who have since left are dropped, surplus
+    matches trimmed, and free courts filled by a search, done by deadline,
+    among the players the round doesn't use.
+    """
+    if any(p not in planned.games or stats.games[stats.ids[p]] != planned.games[p] for p in players):
+        return None
+    current = set(players)
+    kept = [m for m in planned.matches if current.issuperset(m.players)][:court_count]
+    if len(kept) < court_count:
+        kept, _ = find_round(stats, players, males, females, court_count, deadline or round_deadline(),
+                             workers=workers, fixed=kept)
+    return kept
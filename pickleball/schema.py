@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from . import config
+
+# Numeric columns and their dtypes. Int64 holds integers with blanks as <NA>
+NUMERIC_COLUMNS = {
+    config.COL_TOTAL_POINTS: "float64",
+    config.COL_AVG_POINTS: "float64",
+    config.COL_GAMES_PLAYED: "Int64",
+    config.COL_COURT_NUMBER: "Int64",
+    config.COL_TEAM1_SCORE: "Int64",
+    config.COL_TEAM2_SCORE: "Int64",
+}
+
+# Timestamp columns, written in config.TIMESTAMP_FORMAT. Blanks, and text in any other format, become NaT
+DATETIME_COLUMNS = [
+    config.COL_CHECK_IN_TIME,
+    config.COL_LAST_MATCH_TIME,
+    config.COL_START_TIME,
+    config.COL_END_TIME,
+]
+
+# Columns with a small vocabulary, loaded as categoricals of these values plus any others found
+CATEGORY_COLUMNS = {
+    config.COL_STATUS: [config.STATUS_ACTIVE, config.STATUS_INACTIVE],
+    config.COL_GENDER: [config.GENDER_MALE, config.GENDER_FEMALE],
+    config.COL_MATCH_STATUS: [
+        config.STATUS_PENDING, config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS,
+        config.STATUS_COMPLETED, config.STATUS_CANCELLED
+    ],
+    config.COL_MATCH_TYPE: [config.MATCH_TYPE_MIXED, config.MATCH_TYPE_MENS, config.MATCH_TYPE_WOMENS],
+}
+
+
+def empty_frame(sheet):
+    """A typed DataFrame with no rows and the sheet's columns."""
+    columns = config.SHEET_COLUMNS.get(sheet)
+    if columns is None:
+        return pd.DataFrame()
+    return convert(pd.DataFrame({col: pd.Series(dtype=object) for col in columns}))
+
+
+def parse(sheet, values):
+    """Build a typed DataFrame from raw sheet values, header row first.
+
+    Columns are matched by header name and put in the order of
+    config.SHEET_COLUMNS in one reindex, so sheets with moved, missing or extra
+    columns still load. Returns (df, rows): rows is the sheet's text in that
+    column order, header first, for delta writes, or None when the sheet itself
+    isn't laid out in that order and row contents can't be diffed.
+    """
+    columns = config.SHEET_COLUMNS.get(sheet)
+    if not values:
+        return empty_frame(sheet), []
+    header, data = values[0], values[1:]
+    if columns is None:
+        return pd.DataFrame(data), None
+
+    # Rows come back ragged (trailing blanks are left out); pad to the widest
+    width = max([len(header)] + [len(row) for row in data])
+    raw = pd.DataFrame(data, columns=range(width), dtype=object)
+    raw.columns = list(header) + [f"#{i}" for i in range(len(header), width)]
+    raw = raw.loc[:, ~raw.columns.duplicated(keep='last')]
+    text = raw.reindex(columns=columns).fillna("")
+
+    rows = None
+    if header[:len(columns)] == columns:
+        rows = [list(columns)] + text.values.tolist()
+    return convert(text), rows
+
+
+def convert(text):
+    """Give the columns of a DataFrame of text cells their schema dtypes."""
+    columns = {}
+    for col in text.columns:
+        series = text[col]
+        if col in NUMERIC_COLUMNS:
+            if col == config.COL_COURT_NUMBER:
+                series = series.astype(str).str.replace("Court ", "", regex=False)
+            numbers = pd.to_numeric(series, errors='coerce')
+            if NUMERIC_COLUMNS[col] != "Int64":
+                numbers = numbers.astype(NUMERIC_COLUMNS[col])
+            elif (numbers.dropna() % 1 == 0).all():
+                numbers = numbers.astype("Int64")
+            series = numbers
+        elif col in DATETIME_COLUMNS:
+            series = pd.to_datetime(series, format=config.TIMESTAMP_FORMAT, errors='coerce')
+        elif col in CATEGORY_COLUMNS:
+            known = CATEGORY_COLUMNS[col]
+            # Blank cells load as "", like any other value not in the vocabulary
+            extra = sorted(set(series) - set(known))
+            series = pd.Categorical(series, categories=known + extra)
+        columns[col] = series
+    return pd.DataFrame(columns, index=text.index)
+
+
+def unparsed_cells(sheet, old_row, new_row):
+    """Columns where new_row blanks a timestamp that old_row, as text, held in a format convert() can't read.
+
+    Such a cell loads as NaT, so writing the row back would blank it even
+    though nothing changed it. Rows are lists of cell text in the sheet's
+    column order.
+    """
+    columns = config.SHEET_COLUMNS.get(sheet, [])
+    unparsed = []
+    for i, col in enumerate(columns[:min(len(old_row), len(new_row))]):
+        if col in DATETIME_COLUMNS and new_row[i] == "" and old_row[i] != "":
+            try:
+                datetime.strptime(old_row[i], config.TIMESTAMP_FORMAT)
+            except ValueError:
+                unparsed.append(i)
+    return unparsed
+
+
+def format_cell(value):
+    """A cell value the Sheets API accepts: blanks as '', timestamps as text, plain Python numbers."""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return ""
+    if isinstance(value, (float, np.floating)):
+        return "" if np.isnan(value) else float(value)
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return value.strftime(config.TIMESTAMP_FORMAT)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def to_values(df):
+    """Header plus rows of a DataFrame, with every cell passed through format_cell."""
+    return [df.columns.tolist()] + [[format_cell(v) for v in row] for row in df.itertuples(index=False)]
@@ -1,209 +1,333 @@
 import streamlit as st
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 import pandas as pd
-import numpy as np
+import functools
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
 from datetime import datetime
-from . import config
-import random
-import os
-import json
+from . import config, events, scheduler, schema
+from .cache import SheetCache
+from .governor import QuotaExceeded
+from .storage import cell_to_text, create_backend
 import time
 import logging
 
+logger = logging.getLogger(__name__)
+
+# Cache slot holding the last TournamentSnapshot
+_SNAPSHOT_CACHE_KEY = "__snapshot__"
+
+
+@dataclass(frozen=True)
+class TournamentSnapshot:
+    """Players, Matches and Scores as they were read together in one request.
+    
+    The same snapshot is handed to every consumer until a sheet changes, so
+    treat the frames as read-only and .copy() them before modifying.
+    """
+    players: pd.DataFrame
+    matches: pd.DataFrame
+    scores: pd.DataFrame
+    loaded_at: datetime
+
+
+def _synchronized(method):
+    """Run a SheetsManager method under the manager's lock, so sessions sharing it take turns writing"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
 class SheetsManager:
-    def __init__(self):
-        self.api_calls = 0
+    def __init__(self, backend=None):
+        # One manager is shared by every session (see get_sheets_manager), so
+        # read-modify-write operations are serialized on this lock. Reads and
+        # the scheduler run outside it and take it only to update the cache,
+        # known rows, revisions and plan
+        self._lock = threading.RLock()
         try:
-            # Try to get credentials from Streamlit secrets first
-            if 'google_credentials_type' in st.secrets:
-                # Reconstruct credentials dict from flattened secrets
-                creds_info = {
-                    'type': st.secrets['google_credentials_type'],
-                    'project_id': st.secrets['google_credentials_project_id'],
-                    'private_key_id': st.secrets['google_credentials_private_key_id'],
-                    'private_key': st.secrets['google_credentials_private_key'],
-                    'client_email': st.secrets['google_credentials_client_email'],
-                    'client_id': st.secrets['google_credentials_client_id'],
-                    'auth_uri': st.secrets['google_credentials_auth_uri'],
-                    'token_uri': st.secrets['google_credentials_token_uri'],
-                    'auth_provider_x509_cert_url': st.secrets['google_credentials_auth_provider_x509_cert_url'],
-                    'client_x509_cert_url': st.secrets['google_credentials_client_x509_cert_url'],
-                    'universe_domain': st.secrets['google_credentials_universe_domain']
-                }
-                self.creds = service_account.Credentials.from_service_account_info(
-                    creds_info, scopes=config.SCOPES
-                )
-            else:
-                # Fall back to environment variable
-                creds_json = os.getenv('GOOGLE_CREDENTIALS_JSON')
-                if creds_json:
-                    creds_info = json.loads(creds_json)
-                    self.creds = service_account.Credentials.from_service_account_info(
-                        creds_info, scopes=config.SCOPES
-                    )
-                else:
-                    raise Exception("No credentials found in Streamlit secrets or environment variables")
-            
-            self.service = build('sheets', 'v4', credentials=self.creds)
-            self.sheet = self.service.spreadsheets()
+            # Storage backend (Google Sheets by default, see config.STORAGE_BACKEND)
+            self.backend = backend if backend is not None else create_backend()
             self._last_modified = {}  # Track last modified time for each sheet
-            self._sheet_cache = {}  # Cache for sheet data
+            self._cache = SheetCache()  # Cache for sheet data, invalidated by local writes
+            self._known_rows = {}  # Rows as last read from / written to each sheet, for delta writes
+            self._checked_at = {}  # When each sheet's known rows were last confirmed by a full read
+            self._revisions = {}  # Last revision of each sheet seen in or written to the Meta sheet
+            self._meta_available = None  # Whether the spreadsheet has a Meta sheet, once checked
+            self._events_available = None  # Whether the spreadsheet has an Events sheet, once written to
+            self._interactions = None  # Partner/opponent counts, built on the first generation then kept up to date
+            self._plan = deque()  # Rounds planned ahead when SCHEDULER_LOOKAHEAD_ROUNDS is set
+            self.last_round_quality = None  # scheduler.RoundQuality of the last round searched for
         except Exception as e:
             st.write(f"Error initializing SheetsManager: {str(e)}")
             raise
 
+    @property
+    def api_calls(self):
+        """Requests sent to the Sheets API so far, by operation (empty for local storage)"""
+        return getattr(self.backend, 'api_calls', Counter())
+
     def _log_api_call(self, operation):
-        """Log API call for tracking"""
-        self.api_calls += 1
+        """Log a backend operation for debugging"""
+        logger.debug(operation)
+
+    def read_revisions(self):
+        """Read every sheet's revision from the Meta sheet in one small request.
+        
+        Returns {sheet: revision}, or None if the spreadsheet has no Meta sheet
+        (run initialize_sheets.py to add one).
+        """
+        if self._meta_available is False:
+            return None
+        self._log_api_call(f"Reading revisions from {config.SHEET_META}")
+        try:
+            values = self.backend.read_table(config.SHEET_META)
+        except Exception as e:
+            # Sheets answers 400 for a range on a sheet that doesn't exist
+            if getattr(getattr(e, 'resp', None), 'status', None) != 400:
+                raise
+            logger.warning(f"No {config.SHEET_META} sheet, change checks will read whole sheets")
+            self._meta_available = False
+            return None
+        self._meta_available = True
+        return self._parse_revisions(values)
+
+    def _parse_revisions(self, values):
+        """{sheet: revision} from the raw values of the Meta sheet, remembering the newest seen"""
+        revisions = {}
+        for row in values[1:]:
+            if len(row) >= 2 and str(row[1]).isdigit():
+                revisions[row[0]] = int(row[1])
+        with self._lock:
+            for name, revision in revisions.items():
+                self._revisions[name] = max(revision, self._revisions.get(name, 0))
+        return revisions
+
+    def _revision_rows(self, range_names, events_position=None):
+        """Meta rows bumping the revision of the given sheets, to be sent in the same batch as their data.
+        
+        Revisions are millisecond timestamps, kept strictly increasing past the
+        last one this manager saw. events_position, if given, is recorded as the
+        last row of the Events sheet the data includes. Empty if there is no
+        Meta sheet.
+        """
+        if self._meta_available is None:
+            try:
+                self.read_revisions()
+            except Exception as e:
+                logger.warning(f"Could not read {config.SHEET_META}: {str(e)}")
+                return {}
+        if not self._meta_available:
+            return {}
+        
+        now_ms = int(time.time() * 1000)
+        rows = {}
+        for name in range_names:
+            if name in config.META_SHEETS:
+                revision = max(self._revisions.get(name, 0) + 1, now_ms)
+                rows[config.META_SHEETS.index(name) + 2] = [name, str(revision)]
+        if events_position is not None:
+            rows[config.META_SHEETS.index(config.SHEET_EVENTS) + 2] = [config.SHEET_EVENTS, str(events_position)]
+        if rows:
+            rows[1] = ["Sheet", "Revision"]
+        return rows
+
+    def _remember_revisions(self, meta_rows):
+        """Record the revisions of Meta rows that were just written"""
+        for row_num, (name, revision) in meta_rows.items():
+            if row_num > 1:
+                self._revisions[name] = int(revision)
 
     def get_sheet_modified_time(self, sheet_name):
-        """Get the last modified time of a sheet"""
+        """Get the current revision of a sheet (its full contents if there is no Meta sheet)"""
+        revisions = self.read_revisions()
+        if revisions is not None:
+            return revisions.get(sheet_name, 0)
+        
         self._log_api_call(f"Getting modified time for sheet {sheet_name}")
-        result = self.sheet.values().get(
-            spreadsheetId=config.SPREADSHEET_ID,
-            range=sheet_name
-        ).execute()
+        values = self.backend.read_table(sheet_name)
         # Use the values themselves as a proxy for changes
-        return str(result.get('values', []))
+        return str(values)
 
     def has_sheet_changed(self, sheet_name):
         """Check if a sheet has changed since last check"""
         current_state = self.get_sheet_modified_time(sheet_name)
-        last_state = self._last_modified.get(sheet_name)
-        self._last_modified[sheet_name] = current_state
+        with self._lock:
+            last_state = self._last_modified.get(sheet_name)
+            self._last_modified[sheet_name] = current_state
         return last_state is None or current_state != last_state
 
+    def poll_sheet(self, range_name):
+        """Return a sheet for a display that refreshes on a timer.
+        
+        Costs one small Meta read per call. The cached frame is reused for as
+        long as the sheet's revision stays the same, however old it is, and the
+        sheet is read again only once the revision moves.
+        """
+        try:
+            changed = self.has_sheet_changed(range_name)
+        except Exception as e:
+            logger.warning(f"Could not check {range_name} for changes: {str(e)}")
+            changed = True
+        
+        if not changed:
+            cached = self._cache.get_stale(range_name)
+            if cached is not None:
+                return cached
+        else:
+            self._cache.invalidate(range_name)
+        return self.read_sheet(range_name)
+
     def read_sheet(self, range_name):
         """Read a sheet and return as DataFrame with proper column names."""
-        cache_key = f"{range_name}_{int(time.time() / 60)}"  # Cache key changes every minute
-        if cache_key in self._sheet_cache:
-            return self._sheet_cache[cache_key]
+        cached = self._cache.get(range_name)
+        if cached is not None:
+            return cached
+        stale = self._stale_while_throttled([range_name])
+        if stale is not None:
+            return stale[0]
 
         self._log_api_call(f"Reading sheet {range_name}")
-        max_retries = 3
-        retry_delay = 66  # seconds
+        version = self._cache.version(range_name)
+        try:
+            values = self.backend.read_table(range_name)
+        except QuotaExceeded as e:
+            # Keep the page working on the last data we had until the quota frees up
+            stale = self._cache.get_stale(range_name)
+            if stale is not None:
+                logger.warning(f"Serving cached {range_name}: {str(e)}")
+                return stale
+            st.warning(f"Google Sheets is busy, try again in {e.retry_after:.0f} seconds")
+            return pd.DataFrame()
+        except Exception as e:
+            st.error(f"Error reading sheet: {str(e)}")
+            return pd.DataFrame()
+        return self._parse_sheet(range_name, values, version)
+
+    def read_sheets(self, range_names):
+        """Read several sheets in a single request, returning DataFrames in the same order.
         
-        for attempt in range(max_retries):
-            try:
-                result = self.sheet.values().get(
-                    spreadsheetId=config.SPREADSHEET_ID,
-                    range=range_name
-                ).execute()
-                values = result.get('values', [])
-                
-                if not values:
-                    # Return empty DataFrame with correct columns
-                    if range_name == config.SHEET_PLAYERS:
-                        return pd.DataFrame(columns=[
-                            config.COL_NAME,
-                            config.COL_STATUS,
-                            config.COL_GENDER,
-                            config.COL_TOTAL_POINTS,
-                            config.COL_GAMES_PLAYED,
-                            config.COL_CHECK_IN_TIME,
-                            config.COL_LAST_MATCH_TIME,
-                            config.COL_AVG_POINTS
-                        ])
-                    elif range_name == config.SHEET_MATCHES:
-                        return pd.DataFrame(columns=[
-                            config.COL_MATCH_ID,
-                            config.COL_COURT_NUMBER,
-                            config.COL_TEAM1_PLAYER1,
-                            config.COL_TEAM1_PLAYER2,
-                            config.COL_TEAM2_PLAYER1,
-                            config.COL_TEAM2_PLAYER2,
-                            config.COL_START_TIME,
-                            config.COL_END_TIME,
-                            config.COL_TEAM1_SCORE,
-                            config.COL_TEAM2_SCORE,
-                            config.COL_MATCH_STATUS,
-                            config.COL_MATCH_TYPE
-                        ])
-                    elif range_name == config.SHEET_SCORES:
-                        return pd.DataFrame(columns=[config.COL_MATCH_ID, config.COL_NAME, config.COL_TOTAL_POINTS])
-                    else:
-                        return pd.DataFrame()
-
-                # Get the header row and data
-                header = values[0]
-                data = values[1:]
-
-                # Create DataFrame with actual headers
-                df = pd.DataFrame(data)
-                
-                # Get expected headers for this sheet
-                expected_header = None
-                if range_name == config.SHEET_PLAYERS:
-                    expected_header = [
-                        config.COL_NAME,
-                        config.COL_STATUS,
-                        config.COL_GENDER,
-                        config.COL_TOTAL_POINTS,
-                        config.COL_GAMES_PLAYED,
-                        config.COL_CHECK_IN_TIME,
-                        config.COL_LAST_MATCH_TIME,
-                        config.COL_AVG_POINTS
-                    ]
-                elif range_name == config.SHEET_MATCHES:
-                    expected_header = [
-                        config.COL_MATCH_ID,
-                        config.COL_COURT_NUMBER,
-                        config.COL_TEAM1_PLAYER1,
-                        config.COL_TEAM1_PLAYER2,
-                        config.COL_TEAM2_PLAYER1,
-                        config.COL_TEAM2_PLAYER2,
-                        config.COL_START_TIME,
-                        config.COL_END_TIME,
-                        config.COL_TEAM1_SCORE,
-                        config.COL_TEAM2_SCORE,
-                        config.COL_MATCH_STATUS,
-                        config.COL_MATCH_TYPE
-                    ]
-                elif range_name == config.SHEET_SCORES:
-                    expected_header = [config.COL_MATCH_ID, config.COL_NAME, config.COL_TOTAL_POINTS]
-
-                if expected_header:
-                    # Map actual column positions to expected columns
-                    column_mapping = {}
-                    for i, col in enumerate(header):
-                        if col in expected_header:
-                            column_mapping[i] = expected_header.index(col)
-                    
-                    # Reorder and pad columns as needed
-                    reordered_data = []
-                    for row in data:
-                        new_row = [''] * len(expected_header)
-                        for i, val in enumerate(row):
-                            if i in column_mapping:
-                                new_pos = column_mapping[i]
-                                new_row[new_pos] = val
-                        reordered_data.append(new_row)
-                    
-                    # Create new DataFrame with expected headers and reordered data
-                    df = pd.DataFrame(reordered_data, columns=expected_header)
-                
-                # Cache the result
-                self._sheet_cache[cache_key] = df
+        Always goes to the backend so the frames form one consistent snapshot,
+        unless the quota would hold the request up.
+        """
+        stale = self._stale_while_throttled(range_names)
+        if stale is not None:
+            return stale
+        try:
+            return self._fetch_sheets(range_names)
+        except QuotaExceeded as e:
+            stale = [self._cache.get_stale(name) for name in range_names]
+            if all(df is not None for df in stale):
+                logger.warning(f"Serving cached {', '.join(range_names)}: {str(e)}")
+                return stale
+            st.warning(f"Google Sheets is busy, try again in {e.retry_after:.0f} seconds")
+            return [pd.DataFrame() for _ in range_names]
+        except Exception as e:
+            st.error(f"Error reading sheets: {str(e)}")
+            return [pd.DataFrame() for _ in range_names]
+
+    def _stale_while_throttled(self, range_names):
+        """Cached copies of range_names if a read would have to wait for the quota, else None.
+        
+        Waiting would hold up the page, so it gets the last data we had and
+        the read is made by a later call once the quota allows it.
+        """
+        stale = [self._cache.get_stale(name) for name in range_names]
+        if any(df is None for df in stale):
+            return None
+        wait = self.backend.read_wait()
+        if wait <= 0:
+            return None
+        logger.warning(f"Serving cached {', '.join(range_names)}, reads are throttled for {wait:.1f}s")
+        return stale
+
+    def _fetch_sheets(self, range_names):
+        """Read and parse several sheets in one backend request. Errors are raised."""
+        self._log_api_call(f"Reading sheets {', '.join(range_names)}")
+        versions = {name: self._cache.version(name) for name in range_names}
+        tables = self.backend.read_tables(range_names)
+        return [self._parse_sheet(name, tables.get(name, []), versions[name]) for name in range_names]
+
+    def load_snapshot(self, refresh=False):
+        """Return Players, Matches and Scores as one consistent TournamentSnapshot.
+        
+        All three sheets are fetched in a single request and parsed once. The
+        snapshot is cached and the same object is returned to every caller until
+        one of the sheets is written locally or the cache TTL runs out, so all
+        consumers of a page run see the same data.
+        """
+        names = [config.SHEET_PLAYERS, config.SHEET_MATCHES, config.SHEET_SCORES]
+        versions = tuple(self._cache.version(name) for name in names)
+        if not refresh:
+            cached = self._cache.get(_SNAPSHOT_CACHE_KEY)
+            if cached is not None and cached[0] == versions:
+                return cached[1]
+            stale = self._cache.get_stale(_SNAPSHOT_CACHE_KEY)
+            if stale is not None and stale[0] == versions and self.backend.read_wait() > 0:
+                logger.warning("Serving cached snapshot, reads are throttled")
+                return stale[1]
+        
+        try:
+            players_df, matches_df, scores_df = self._fetch_sheets(names)
+        except QuotaExceeded as e:
+            # Nothing was written locally since the last snapshot, so it is only out of date
+            stale = self._cache.get_stale(_SNAPSHOT_CACHE_KEY)
+            if stale is not None and stale[0] == versions:
+                logger.warning(f"Serving cached snapshot: {str(e)}")
+                return stale[1]
+            st.warning(f"Google Sheets is busy, try again in {e.retry_after:.0f} seconds")
+            return TournamentSnapshot(pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), datetime.now())
+        except Exception as e:
+            st.error(f"Error loading tournament data: {str(e)}")
+            # Not cached, so the next call tries again
+            return TournamentSnapshot(pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), datetime.now())
+        
+        # Own copies, so in-place edits of read_sheet results can't leak into the snapshot
+        snapshot = TournamentSnapshot(
+            players=players_df.copy(),
+            matches=matches_df.copy(),
+            scores=scores_df.copy(),
+            loaded_at=datetime.now()
+        )
+        self._cache.put(_SNAPSHOT_CACHE_KEY, (versions, snapshot))
+        return snapshot
+
+    def _parse_sheet(self, range_name, values, version=None):
+        """Turn raw sheet values into a typed DataFrame with the expected columns and cache it.
+        
+        version is the sheet's cache version from before the read. If a local
+        write has bumped it since, the values may predate that write, so they
+        are returned but neither cached nor remembered.
+        """
+        df, rows = schema.parse(range_name, values)
+        with self._lock:
+            if version is not None and version != self._cache.version(range_name):
                 return df
+            self._checked_at[range_name] = time.monotonic()
+            # Remember the rows for delta writes, but only if the sheet is laid out
+            # in the expected column order, otherwise row positions can't be diffed
+            if rows is not None:
+                self._known_rows[range_name] = rows
+            else:
+                self._known_rows.pop(range_name, None)
+            
+            # Cache the result
+            self._cache.put(range_name, df)
+        return df
 
-            except HttpError as e:
-                if e.resp.status == 429:  # Quota exceeded error
-                    if attempt < max_retries - 1:
-                        time.sleep(retry_delay)
-                        continue
-                st.error(f"Error reading sheet after {max_retries} attempts: {str(e)}")
-                return pd.DataFrame()
-            except Exception as e:
-                st.error(f"Error reading sheet: {str(e)}")
-                return pd.DataFrame()
+    def _clear_cache(self, range_name=None):
+        """Invalidate cached data for one sheet, or for all sheets"""
+        self._cache.invalidate(range_name)
+        if range_name is None:
+            self._last_modified = {}
 
-    def _clear_cache(self):
-        """Clear internal sheet cache"""
-        self._sheet_cache = {}
-        self._last_modified = {}
+    def cache_stats(self):
+        """Hit/miss counters of the sheet cache"""
+        return self._cache.stats()
 
+    @_synchronized
     def update_sheet(self, range_name, values):
         """Update a sheet with new values. Updates in-place without clearing first."""
         self._log_api_call(f"Updating sheet {range_name}")
@@ -211,260 +335,378 @@ class SheetsManager:
             st.write(f"Warning: Attempted to update {range_name} with empty values")
             return False
 
-        max_retries = 3
-        # Progressive retry delays: 1s, 3s, 6s
-        retry_delays = [1, 3, 6]
+        try:
+            # Get the expected header based on the sheet
+            expected_header = config.SHEET_COLUMNS.get(range_name)
 
-        for attempt in range(max_retries):
-            try:
-                # Get the expected header based on the sheet
-                expected_header = None
-                if range_name == config.SHEET_PLAYERS:
-                    expected_header = [
-                        config.COL_NAME,
-                        config.COL_STATUS,
-                        config.COL_GENDER,
-                        config.COL_TOTAL_POINTS,
-                        config.COL_GAMES_PLAYED,
-                        config.COL_CHECK_IN_TIME,
-                        config.COL_LAST_MATCH_TIME,
-                        config.COL_AVG_POINTS
-                    ]
-                elif range_name == config.SHEET_MATCHES:
-                    expected_header = [
-                        config.COL_MATCH_ID,
-                        config.COL_COURT_NUMBER,
-                        config.COL_TEAM1_PLAYER1,
-                        config.COL_TEAM1_PLAYER2,
-                        config.COL_TEAM2_PLAYER1,
-                        config.COL_TEAM2_PLAYER2,
-                        config.COL_START_TIME,
-                        config.COL_END_TIME,
-                        config.COL_TEAM1_SCORE,
-                        config.COL_TEAM2_SCORE,
-                        config.COL_MATCH_STATUS,
-                        config.COL_MATCH_TYPE
-                    ]
-                elif range_name == config.SHEET_SCORES:
-                    expected_header = [config.COL_MATCH_ID, config.COL_NAME, config.COL_TOTAL_POINTS]
-
-                # Prepare the update data
-                if len(values) > 1:
-                    values_to_write = values[1:]  # Skip the header row
-                    num_rows = len(values_to_write)
-                    num_cols = len(values_to_write[0]) if values_to_write else len(expected_header)
-                    end_col = chr(ord('A') + num_cols - 1)
-                    
-                    # Create batch update request
-                    batch_update = {
-                        'valueInputOption': 'RAW',
-                        'data': [
-                            {
-                                'range': f"{range_name}!A1",
-                                'values': [expected_header]
-                            },
-                            {
-                                'range': f"{range_name}!A2:{end_col}{num_rows + 1}",
-                                'values': values_to_write
-                            }
-                        ]
-                    }
-                    
-                    # Execute batch update
-                    self.sheet.values().batchUpdate(
-                        spreadsheetId=config.SPREADSHEET_ID,
-                        body=batch_update
-                    ).execute()
-                    
-                    # Only verify on the final attempt or if previous attempt failed
-                    if attempt == max_retries - 1 or attempt > 0:
-                        if not self._verify_sheet_update(range_name, values):
-                            if attempt < max_retries - 1:
-                                time.sleep(retry_delays[attempt])
-                                continue
-                            st.error(f"Failed to verify update of {range_name} after {max_retries} attempts")
-                            return False
-
-                    # Get the total number of rows in the sheet
-                    result = self.sheet.values().get(
-                        spreadsheetId=config.SPREADSHEET_ID,
-                        range=f"{range_name}"
-                    ).execute()
-                    all_values = result.get('values', [])
-                    total_rows = len(all_values)
-                    
-                    # If there are extra rows beyond our data, clear them
-                    if total_rows > num_rows + 1:  # +1 for header
-                        self.sheet.values().clear(
-                            spreadsheetId=config.SPREADSHEET_ID,
-                            range=f"{range_name}!A{num_rows + 2}:{end_col}{total_rows}",
-                            body={}
-                        ).execute()
+            # Prepare the update data
+            if len(values) > 1:
+                values_to_write = [[schema.format_cell(v) for v in row] for row in values[1:]]  # Skip the header row
+                num_rows = len(values_to_write)
                 
-                # Clear cache after successful write
-                self._clear_cache()
-                return True
+                # Clear rows left over past our data, using the tracked row count.
+                # Done first so the revision bump below lands after the whole change
+                known_rows = self._known_rows.get(range_name)
+                if known_rows is None:
+                    # Row count unknown, so clear everything below
+                    self.backend.delete_rows(range_name, num_rows + 2)
+                    self._checked_at[range_name] = time.monotonic()
+                elif len(known_rows) > num_rows + 1:  # +1 for header
+                    self.backend.delete_rows(range_name, num_rows + 2, len(known_rows))
+
+                # Write header, data rows and the sheet's new revision in a single batch
+                rows = {1: expected_header}
+                rows.update({i + 2: row for i, row in enumerate(values_to_write)})
+                updates = {range_name: rows}
+                meta_rows = self._revision_rows([range_name])
+                if meta_rows:
+                    updates[config.SHEET_META] = meta_rows
+                written = self.backend.upsert_tables(updates)
+                for name, sent in updates.items():
+                    self._check_written(name, len(sent), written.get(name, 0))
+                self._remember_revisions(meta_rows)
+                
+                self._known_rows[range_name] = [list(expected_header)] + [
+                    [cell_to_text(v) for v in row] for row in values_to_write
+                ]
+            
+            # Bump the cached version of the sheet after successful write
+            self._clear_cache(range_name)
+            return True
+
+        except Exception as e:
+            # Drop any cached copy that a caller may have modified in place
+            self._known_rows.pop(range_name, None)
+            self._clear_cache(range_name)
+            st.error(self._write_error_message(range_name, e))
+            return False
+
+    def _check_written(self, range_name, expected, written):
+        """Raise if the backend reports writing a different number of rows than were sent"""
+        if written != expected:
+            raise Exception(f"{written} of {expected} rows of {range_name} were written")
+
+    def _write_error_message(self, range_name, error):
+        """User-facing message for a failed write (retries already happen in the backend)"""
+        if isinstance(error, QuotaExceeded):
+            return f"Google Sheets is busy, {range_name} was not saved. Try again in {error.retry_after:.0f} seconds."
+        return f"Error updating {range_name}: {str(error)}"
 
+    @_synchronized
+    def write_all_changes(self, frames, events_position=None):
+        """Write the changed rows of several sheets in one batch.
+        
+        frames maps sheet name to its modified DataFrame. Each is compared row by
+        row with the rows last read from (or written to) its sheet; changed and
+        new rows of every sheet go out in a single backend call and rows left
+        over past the end are cleared, so the payload depends on the size of
+        the change rather than the size of the sheets. A sheet whose layout
+        isn't known gets a full update_sheet instead. events_position is the last Events row the frames include, recorded in
+        the Meta sheet in the same batch.
+        """
+        updates = {}
+        new_known = {}
+        truncations = []
+        success = True
+        
+        for range_name, df in frames.items():
+            values = schema.to_values(df)
+            known_rows = self._known_rows.get(range_name)
+            if known_rows is None:
+                success = self.update_sheet(range_name, values) and success
+                continue
+            
+            width = len(values[0])
+            new_rows = [[cell_to_text(v) for v in row] for row in values]
+            
+            changed = {}
+            for i, row in enumerate(new_rows):
+                old_row = known_rows[i] if i < len(known_rows) else None
+                # Keep timestamps typed in by hand in another format, rather than blank them
+                if old_row is not None and old_row[:1] == row[:1]:
+                    for j in schema.unparsed_cells(range_name, old_row, row):
+                        row[j] = values[i][j] = old_row[j]
+                if old_row is None or list(old_row) + [''] * (width - len(old_row)) != row:
+                    changed[i + 1] = values[i]
+            
+            if changed:
+                updates[range_name] = changed
+            if len(known_rows) > len(new_rows):
+                truncations.append((range_name, len(new_rows) + 1, len(known_rows)))
+            new_known[range_name] = new_rows
+        
+        if not new_known and events_position is None:
+            return success
+        
+        # Bump the revisions of the changed sheets in the same batch as their rows
+        meta_rows = self._revision_rows(list(updates) + [t[0] for t in truncations], events_position)
+        if meta_rows:
+            updates[config.SHEET_META] = meta_rows
+        
+        self._log_api_call(f"Writing changes to sheets {', '.join(new_known) or config.SHEET_META}")
+        try:
+            # Truncate first so readers see the new revision only after the whole change
+            for range_name, start_row, end_row in truncations:
+                self.backend.delete_rows(range_name, start_row, end_row)
+            if updates:
+                written = self.backend.upsert_tables(updates)
+                for range_name, changed in updates.items():
+                    self._check_written(range_name, len(changed), written.get(range_name, 0))
+            self._remember_revisions(meta_rows)
+        except Exception as e:
+            # The sheets may be partially written, so stop trusting the known rows
+            for range_name in new_known:
+                self._known_rows.pop(range_name, None)
+                self._clear_cache(range_name)
+            st.error(self._write_error_message(', '.join(new_known), e))
+            return False
+        
+        self._known_rows.update(new_known)
+        for range_name in new_known:
+            self._clear_cache(range_name)
+        self.reconcile_row_counts(list(new_known))
+        return success
+
+    @_synchronized
+    def reconcile_row_counts(self, range_names=None, force=False):
+        """Re-read sheets whose tracked rows haven't been confirmed for a while.
+        
+        Writes trust the locally tracked rows rather than reading the sheet
+        back, so rows added or removed elsewhere would go unnoticed. This
+        re-reads, in one request, the given sheets (default: all tracked) that
+        were last read more than RECONCILE_INTERVAL_SECONDS ago, or all of them
+        if force is set. Returns the names of sheets whose row count had drifted.
+        """
+        now = time.monotonic()
+        names = []
+        for name in (range_names if range_names is not None else list(self._known_rows)):
+            checked_at = self._checked_at.get(name)
+            if name in self._known_rows and (
+                force or checked_at is None or now - checked_at >= config.RECONCILE_INTERVAL_SECONDS
+            ):
+                names.append(name)
+        if not names:
+            return []
+        
+        expected = {name: len(self._known_rows[name]) for name in names}
+        try:
+            self._fetch_sheets(names)
+        except Exception as e:
+            # Best effort: try again on the next write
+            logger.warning(f"Row count reconciliation failed: {str(e)}")
+            return []
+        
+        drifted = [name for name in names if len(self._known_rows.get(name, [])) != expected[name]]
+        for name in drifted:
+            logger.warning(f"{name} had {len(self._known_rows.get(name, []))} rows, tracked {expected[name]}")
+        return drifted
+
+    def _load_state(self):
+        """Read Players, Matches and Scores (and the Meta sheet) in one request as a TournamentState.
+        
+        Changes are recorded as events against this state and written with
+        _commit. Its position is the last Events row the sheets include.
+        """
+        if self._meta_available is None:
+            self.read_revisions()
+        names = [config.SHEET_PLAYERS, config.SHEET_MATCHES, config.SHEET_SCORES]
+        self._log_api_call(f"Reading sheets {', '.join(names)} to record events")
+        versions = {name: self._cache.version(name) for name in names}
+        tables = self.backend.read_tables(names + ([config.SHEET_META] if self._meta_available else []))
+        frames = [self._parse_sheet(name, tables.get(name, []), versions[name]) for name in names]
+        position = 0
+        if self._meta_available:
+            position = self._parse_revisions(tables.get(config.SHEET_META, [])).get(config.SHEET_EVENTS, 0)
+        return events.TournamentState.from_frames(*frames, position=position)
+
+    @_synchronized
+    def _commit(self, state):
+        """Log the events recorded on state, then write the rows they changed.
+        
+        The events go out in one append to the Events sheet, the record of
+        truth. Players, Matches and Scores are views of it: their changed rows
+        go out in one batch with the Meta row saying how far into the log they
+        are, so they double as snapshots that spare a replay on startup. If the
+        append lands past the end the views know about (events from another
+        process, or an earlier batch that failed after its append), those
+        events are replayed first so the views stay equal to the log.
+        """
+        if not state.pending:
+            return True
+        
+        position = None
+        committed = state.pending
+        if self._events_available is not False:
+            rows = [event.to_row() for event in state.pending]
+            self._log_api_call(f"Logging {len(rows)} events to {config.SHEET_EVENTS}")
+            try:
+                first_row = self.backend.append_rows(config.SHEET_EVENTS, rows)
             except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delays[attempt])
-                    st.write(f"Retry {attempt + 1}/{max_retries} after error: {str(e)}")
-                    continue
-                st.error(f"Error updating sheet after {max_retries} attempts: {str(e)}")
-                return False
+                # A 400 can be a bad request as well as a missing sheet, so look before giving up on the log
+                if getattr(getattr(e, 'resp', None), 'status', None) != 400 or self._has_sheet(config.SHEET_EVENTS):
+                    st.error(self._write_error_message(config.SHEET_EVENTS, e))
+                    return False
+                # No Events sheet (run initialize_sheets.py to add one), keep writing the views
+                logger.warning(f"No {config.SHEET_EVENTS} sheet, changes are not logged")
+                self._events_available = False
+            else:
+                self._events_available = True
+                # Row 1 is the header, so a log of nothing but the header is at position 0 or 1
+                if self._meta_available and first_row - 1 > max(state.position, 1):
+                    logger.warning(f"{config.SHEET_EVENTS} has rows the sheets don't include, replaying them")
+                    pending = state.pending
+                    state = self._load_state()
+                    logged = self.backend.read_table(config.SHEET_EVENTS)
+                    committed = events.parse_log(logged[state.position:first_row - 1]) + pending
+                    for event in committed:
+                        state.apply(event)
+                position = first_row + len(rows) - 1
+        
+        written = self.write_all_changes(state.frames(), events_position=position)
+        if written and self._interactions is not None:
+            for event in committed:
+                self._interactions.apply(event)
+        return written
 
-        return False
+    def _has_sheet(self, name):
+        """Whether the spreadsheet has a sheet called name, by reading its first cell."""
+        try:
+            self.backend.read_table(f"{name}!A1")
+        except Exception as e:
+            # Sheets answers 400 for a range on a sheet that doesn't exist
+            return getattr(getattr(e, 'resp', None), 'status', None) != 400
+        return True
 
+    def read_events(self):
+        """Every event in the Events sheet, oldest first."""
+        self._log_api_call(f"Reading {config.SHEET_EVENTS}")
+        return events.parse_log(self.backend.read_table(config.SHEET_EVENTS))
+
+    def snapshot_at(self, until=None):
+        """The tournament as it was after the first until events, or at the datetime until.
+        
+        Replays the event log from the start, so changes made before the
+        Events sheet existed are not included. With until=None this is the
+        current state according to the log.
+        """
+        state = events.replay(self.read_events(), until)
+        frames = state.frames()
+        return TournamentSnapshot(
+            players=frames[config.SHEET_PLAYERS],
+            matches=frames[config.SHEET_MATCHES],
+            scores=frames[config.SHEET_SCORES],
+            loaded_at=until if isinstance(until, datetime) else datetime.now()
+        )
+
+    @_synchronized
+    def rebuild_views(self, from_start=False):
+        """Bring Players, Matches and Scores up to date with the event log.
+        
+        By default the events past the position recorded in the Meta sheet are
+        applied to the sheets as they are. from_start rebuilds them from the
+        whole log instead. It refuses (returning False) while the sheets hold
+        players or matches the log has no record of, such as those added
+        before the Events sheet existed, as the rebuild would delete them.
+        """
+        try:
+            logged = self.backend.read_table(config.SHEET_EVENTS)
+            if from_start:
+                state = events.replay(events.parse_log(logged))
+                current = self._load_state()
+                unlogged_players = ({row[config.COL_NAME] for row in current.players}
+                                    - {row[config.COL_NAME] for row in state.players} - {""})
+                unlogged_matches = ({row[config.COL_MATCH_ID] for row in current.matches}
+                                    - {row[config.COL_MATCH_ID] for row in state.matches} - {""})
+                if unlogged_players or unlogged_matches:
+                    st.error(f"Not rebuilding from the start of {config.SHEET_EVENTS}: it has no record of "
+                             f"{len(unlogged_players)} players and {len(unlogged_matches)} matches in the sheets, "
+                             f"which would be deleted")
+                    return False
+            else:
+                state = self._load_state()
+                for event in events.parse_log(logged[state.position:]):
+                    state.apply(event)
+            return self.write_all_changes(state.frames(), events_position=len(logged))
+        except Exception as e:
+            st.error(f"Error rebuilding sheets from {config.SHEET_EVENTS}: {str(e)}")
+            return False
+
+    @_synchronized
     def update_match_status(self, match_id, new_status):
         try:
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
-            match_index = matches_df[matches_df[config.COL_MATCH_ID] == match_id].index[0]
-            match = matches_df.iloc[match_index]
+            state = self._load_state()
+            match = state.find_match(match_id)
+            if match is None:
+                raise ValueError(f"Match {match_id} not found")
+            completed_court = match[config.COL_COURT_NUMBER]
             
-            matches_df.loc[match_index, config.COL_MATCH_STATUS] = new_status
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            state.record(events.MATCH_STATUS_CHANGED, match_id=match_id, status=new_status)
             
-            if new_status == config.STATUS_IN_PROGRESS:
-                matches_df.loc[match_index, config.COL_START_TIME] = current_time
-            elif new_status == config.STATUS_COMPLETED:
-                matches_df.loc[match_index, config.COL_END_TIME] = current_time
-                
-                # Get the court number before updating
-                completed_court = match[config.COL_COURT_NUMBER]
-                
+            if new_status == config.STATUS_COMPLETED:
                 # Find the next queued match and assign it to this court
-                queued_matches = matches_df[matches_df[config.COL_MATCH_STATUS] == "Queued"]
-                if not queued_matches.empty:
-                    next_match_index = queued_matches.index[0]
-                    matches_df.loc[next_match_index, config.COL_COURT_NUMBER] = completed_court
-                    matches_df.loc[next_match_index, config.COL_MATCH_STATUS] = config.STATUS_SCHEDULED
+                queued = next((row for row in state.matches if row[config.COL_MATCH_STATUS] == "Queued"), None)
+                if queued is not None:
+                    state.record(events.COURT_ASSIGNED, match_id=queued[config.COL_MATCH_ID], court=completed_court)
             
-            result = self.update_sheet(config.SHEET_MATCHES, [matches_df.columns.tolist()] + matches_df.values.tolist())
-            return result
+            return self._commit(state)
         except Exception as e:
             st.write(f"Error updating match status: {str(e)}")
             return False
 
+    @_synchronized
     def update_match_score(self, match_id, team1_score, team2_score):
-        """Update match score and handle all related updates."""
+        """Update match score and handle all related updates.
+        
+        Logs the score, and the court it frees up going to the next pending
+        match, then writes the match, the player totals and the new score rows
+        in one batch.
+        """
         try:
             # Convert scores to integers
             team1_score = int(team1_score)
             team2_score = int(team2_score)
             
-            # Get matches DataFrame
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
-            
-            # Find the match
-            match_idx = matches_df[matches_df[config.COL_MATCH_ID] == match_id].index[0]
-            match = matches_df.iloc[match_idx]
-            
-            # Store the court number before updating status
-            freed_court = match[config.COL_COURT_NUMBER]
-            
-            # Update match scores and status
-            matches_df.loc[match_idx, config.COL_TEAM1_SCORE] = team1_score
-            matches_df.loc[match_idx, config.COL_TEAM2_SCORE] = team2_score
-            matches_df.loc[match_idx, config.COL_MATCH_STATUS] = config.STATUS_COMPLETED
-            matches_df.loc[match_idx, config.COL_END_TIME] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # Calculate points
-            point_diff = abs(team1_score - team2_score)
-            team1_won = team1_score > team2_score
-            
-            # Base points
-            team1_base = 2 if team1_won else 1
-            team2_base = 2 if not team1_won else 1
-            
-            # Performance bonus
-            if team1_won:
-                team1_bonus = min(1.0, point_diff * 0.1)  # Winner's bonus (unchanged)
-                team2_bonus = float(team2_score) / float(team1_score)  # Loser's performance ratio
-            else:
-                team2_bonus = min(1.0, point_diff * 0.1)  # Winner's bonus (unchanged)
-                team1_bonus = float(team1_score) / float(team2_score)  # Loser's performance ratio
-            
-            # Total points for each team
-            team1_points = team1_base + team1_bonus
-            team2_points = team2_base + team2_bonus
-            
-            # Get players DataFrame and scores DataFrame
-            players_df = self.read_sheet(config.SHEET_PLAYERS)
-            scores_df = self.read_sheet(config.SHEET_SCORES)
-            
-            # Prepare new scores data
-            new_scores = []
-            
-            # Update points and games played for each player
-            for player in [match[config.COL_TEAM1_PLAYER1], match[config.COL_TEAM1_PLAYER2]]:
-                if pd.notna(player):
-                    player_idx = players_df[players_df[config.COL_NAME] == player].index[0]
-                    
-                    # Get current values, defaulting to 0 if empty or NaN
-                    current_points = players_df.loc[player_idx, config.COL_TOTAL_POINTS]
-                    current_points = float(current_points) if pd.notna(current_points) and current_points != '' else 0.0
-                    
-                    current_games = players_df.loc[player_idx, config.COL_GAMES_PLAYED]
-                    current_games = int(float(current_games)) if pd.notna(current_games) and current_games != '' else 0
-                    
-                    # Update values
-                    players_df.loc[player_idx, config.COL_TOTAL_POINTS] = current_points + team1_points
-                    players_df.loc[player_idx, config.COL_GAMES_PLAYED] = current_games + 1
-                    
-                    # Update average points
-                    total_points = players_df.loc[player_idx, config.COL_TOTAL_POINTS]
-                    games_played = players_df.loc[player_idx, config.COL_GAMES_PLAYED]
-                    players_df.loc[player_idx, config.COL_AVG_POINTS] = total_points / games_played if games_played > 0 else 0
-                    
-                    # Add score record
-                    new_scores.append([match_id, player, team1_points])
-            
-            for player in [match[config.COL_TEAM2_PLAYER1], match[config.COL_TEAM2_PLAYER2]]:
-                if pd.notna(player):
-                    player_idx = players_df[players_df[config.COL_NAME] == player].index[0]
-                    
-                    # Get current values, defaulting to 0 if empty or NaN
-                    current_points = players_df.loc[player_idx, config.COL_TOTAL_POINTS]
-                    current_points = float(current_points) if pd.notna(current_points) and current_points != '' else 0.0
-                    
-                    current_games = players_df.loc[player_idx, config.COL_GAMES_PLAYED]
-                    current_games = int(float(current_games)) if pd.notna(current_games) and current_games != '' else 0
-                    
-                    # Update values
-                    players_df.loc[player_idx, config.COL_TOTAL_POINTS] = current_points + team2_points
-                    players_df.loc[player_idx, config.COL_GAMES_PLAYED] = current_games + 1
-                    
-                    # Update average points
-                    total_points = players_df.loc[player_idx, config.COL_TOTAL_POINTS]
-                    games_played = players_df.loc[player_idx, config.COL_GAMES_PLAYED]
-                    players_df.loc[player_idx, config.COL_AVG_POINTS] = total_points / games_played if games_played > 0 else 0
-                    
-                    # Add score record
-                    new_scores.append([match_id, player, team2_points])
-            
-            # Update sheets
-            self.update_sheet(config.SHEET_MATCHES, [matches_df.columns.tolist()] + matches_df.values.tolist())
-            self.update_sheet(config.SHEET_PLAYERS, [players_df.columns.tolist()] + players_df.values.tolist())
-            
-            # Update scores sheet
-            if scores_df.empty:
-                # If scores sheet is empty, create it with headers
-                scores_data = [[config.COL_MATCH_ID, config.COL_NAME, config.COL_TOTAL_POINTS]] + new_scores
-            else:
-                # Append new scores to existing data
-                scores_data = [scores_df.columns.tolist()] + scores_df.values.tolist() + new_scores
-            
-            self.update_sheet(config.SHEET_SCORES, scores_data)
-            
-            # Try to assign courts to the newly added matches
-            self.assign_courts_to_pending_matches()
+            # Get a consistent snapshot of all three sheets in one request
+            state = self._load_state()
+            if state.find_match(match_id) is None:
+                raise ValueError(f"Match {match_id} not found")
+            
+            # Points are logged with the score, so replays don't depend on the scoring rules of the day
+            team1_points, team2_points = self.calculate_match_points(team1_score, team2_score)
+            state.record(
+                events.SCORE_SUBMITTED, match_id=match_id,
+                team1_score=team1_score, team2_score=team2_score,
+                team1_points=team1_points, team2_points=team2_points
+            )
             
-            return True
+            # Hand the freed court to the next pending match in the same write
+            self._assign_courts(state)
+            return self._commit(state)
             
         except Exception as e:
             st.error(f"Error updating match score: {str(e)}")
             return False
 
+    def calculate_match_points(self, team1_score, team2_score):
+        """Return the points earned by each player of team 1 and team 2 for a final score."""
+        point_diff = abs(team1_score - team2_score)
+        team1_won = team1_score > team2_score
+        
+        # Base points
+        team1_base = 2 if team1_won else 1
+        team2_base = 2 if not team1_won else 1
+        
+        # Performance bonus
+        if team1_won:
+            team1_bonus = min(1.0, point_diff * 0.1)  # Winner's bonus (unchanged)
+            team2_bonus = float(team2_score) / float(team1_score)  # Loser's performance ratio
+        else:
+            team2_bonus = min(1.0, point_diff * 0.1)  # Winner's bonus (unchanged)
+            team1_bonus = float(team1_score) / float(team2_score)  # Loser's performance ratio
+        
+        # Total points for each team
+        return team1_base + team1_bonus, team2_base + team2_bonus
+
     def get_active_players(self):
         df = self.read_sheet(config.SHEET_PLAYERS)
         # Consider players active if their status is explicitly active or blank/empty
@@ -483,8 +725,9 @@ class SheetsManager:
 
     def get_leaderboard(self):
         """Get the tournament leaderboard sorted by total points."""
-        players_df = self.read_sheet(config.SHEET_PLAYERS)
-        scores_df = self.read_sheet(config.SHEET_SCORES)
+        snapshot = self.load_snapshot()
+        players_df = snapshot.players
+        scores_df = snapshot.scores
         
         if players_df.empty:
             return pd.DataFrame(columns=[config.COL_NAME, config.COL_TOTAL_POINTS, config.COL_GAMES_PLAYED])
@@ -520,21 +763,22 @@ class SheetsManager:
         
         return leaderboard
 
+    @_synchronized
     def update_player_status(self, player_name, status):
         """Update the status of a player."""
         try:
             if status not in [config.STATUS_PLAYER_ACTIVE, config.STATUS_PLAYER_INACTIVE]:
                 raise ValueError(f"Invalid status: {status}")
             
-            players_df = self.read_sheet(config.SHEET_PLAYERS)
-            player_idx = players_df[players_df[config.COL_NAME] == player_name].index[0]
-            players_df.loc[player_idx, config.COL_STATUS] = status
+            state = self._load_state()
+            if state.find_player(player_name) is None:
+                raise ValueError(f"Player {player_name} not found")
+            state.record(events.PLAYER_STATUS_CHANGED, name=player_name, status=status)
             
             # Update the sheet
-            success = self.update_sheet(config.SHEET_PLAYERS, [players_df.columns.tolist()] + players_df.values.tolist())
+            success = self._commit(state)
             
             if success:
-                self._clear_cache()  # Clear cache after successful update
                 if status == config.STATUS_PLAYER_INACTIVE:
                     # Handle removal of matches when deactivating
                     self.handle_player_inactivation(player_name)
@@ -544,37 +788,23 @@ class SheetsManager:
             st.error(f"Error updating player status: {str(e)}")
             return False
 
+    @_synchronized
     def add_player(self, player_name, is_woman=False):
         """Add a new player to the Players sheet."""
         # Read current players
-        players_df = self.read_sheet(config.SHEET_PLAYERS)
+        state = self._load_state()
         
         # Check if player already exists
-        if player_name in players_df[config.COL_NAME].values:
+        if state.find_player(player_name) is not None:
             return False
         
-        # Create new player row
-        new_player = {
-            config.COL_NAME: player_name,
-            config.COL_STATUS: config.STATUS_PLAYER_ACTIVE,
-            config.COL_GENDER: config.GENDER_FEMALE if is_woman else config.GENDER_MALE,
-            config.COL_TOTAL_POINTS: 0,
-            config.COL_GAMES_PLAYED: 0,
-            config.COL_CHECK_IN_TIME: "",
-            config.COL_LAST_MATCH_TIME: "",
-            config.COL_AVG_POINTS: 0
-        }
-        
-        # Add new player to dataframe
-        players_df = pd.concat([players_df, pd.DataFrame([new_player])], ignore_index=True)
+        state.record(
+            events.PLAYER_ADDED, name=player_name,
+            gender=config.GENDER_FEMALE if is_woman else config.GENDER_MALE
+        )
         
         # Update sheet
-        success = self.update_sheet(config.SHEET_PLAYERS, [players_df.columns.tolist()] + players_df.values.tolist())
-        
-        if success:
-            self._clear_cache()  # Clear the cache after successful update
-        
-        return success
+        return self._commit(state)
 
     def get_match_key(self, team1_players, team2_players):
         """Create a unique key for a match that is the same regardless of player order"""
@@ -652,88 +882,16 @@ class SheetsManager:
         """Check for available courts and assign them to pending matches."""
         return self.assign_courts_to_pending_matches()
 
+    @_synchronized
     def assign_courts_to_pending_matches(self):
         """Assign available courts to pending matches."""
         try:
             # Get current matches
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
-            
-            # Find courts that are currently in use (only scheduled or in-progress matches)
-            active_matches = matches_df[
-                (matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS])) &
-                (matches_df[config.COL_COURT_NUMBER].notna()) &  # Must have a court number
-                (matches_df[config.COL_COURT_NUMBER] != "")  # Must not be empty string
-            ]
-            
-            # Get players who are currently in active matches
-            busy_players = set()
-            for _, match in active_matches.iterrows():
-                players = [
-                    match[config.COL_TEAM1_PLAYER1],
-                    match[config.COL_TEAM1_PLAYER2],
-                    match[config.COL_TEAM2_PLAYER1],
-                    match[config.COL_TEAM2_PLAYER2]
-                ]
-                busy_players.update(p for p in players if pd.notna(p))
-            
-            used_courts = set(str(court) for court in active_matches[config.COL_COURT_NUMBER] if pd.notna(court) and court != "")
-            
-            # Get available courts (1-6)
-            available_courts = [str(i) for i in range(1, 7) if str(i) not in used_courts]
-            
-            if not available_courts:
-                return False
-            
-            # Find pending matches
-            pending_matches = matches_df[
-                (matches_df[config.COL_MATCH_STATUS] == config.STATUS_PENDING)
-            ].copy()
-            
-            if pending_matches.empty:
-                st.info("No pending matches to assign courts to")
-                return False
-                
-            updates_made = False
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # For each pending match, assign a court if available and players aren't busy
-            for idx, match in pending_matches.iterrows():
-                match_id = match[config.COL_MATCH_ID]
-                
-                # Skip if match already has a valid court number
-                court_number = match[config.COL_COURT_NUMBER]
-                if pd.notna(court_number) and court_number != "":
-                    continue
-                
-                # Check if any players in this match are already playing
-                match_players = {
-                    match[config.COL_TEAM1_PLAYER1],
-                    match[config.COL_TEAM1_PLAYER2],
-                    match[config.COL_TEAM2_PLAYER1],
-                    match[config.COL_TEAM2_PLAYER2]
-                }
-                match_players = {p for p in match_players if pd.notna(p)}  # Remove any NaN values
-                
-                # If any players are busy, skip this match
-                if match_players & busy_players:
-                    #st.write(f"Skipping match {match_id} - players already in active matches")
-                    continue
-                
-                if available_courts:  # We have courts available
-                    court = available_courts.pop(0)  # Take the first available court
-                    
-                    # Update match in the matches_df DataFrame
-                    matches_df.loc[idx, config.COL_COURT_NUMBER] = court
-                    matches_df.loc[idx, config.COL_MATCH_STATUS] = config.STATUS_SCHEDULED
-                    matches_df.loc[idx, config.COL_START_TIME] = current_time
-                    updates_made = True
-                    
-                    # Add these players to busy_players for subsequent matches
-                    busy_players.update(match_players)
+            state = self._load_state()
             
             # Update the sheet if changes were made
-            if updates_made:
-                self.update_sheet(config.SHEET_MATCHES, [matches_df.columns.tolist()] + matches_df.values.tolist())
+            if self._assign_courts(state):
+                self._commit(state)
                 #st.success("Successfully assigned courts to pending matches")
                 return True
             
@@ -743,22 +901,96 @@ class SheetsManager:
             st.error(f"Error assigning courts to pending matches: {str(e)}")
             return False
 
-    def generate_next_matches(self, active_players, court_count):
-        """Generate optimal matches based on player history."""
+    def _assign_courts(self, state):
+        """Record court assignments for pending matches on a TournamentState. Returns True if any were made."""
+        matches_df = state.frame(config.SHEET_MATCHES)
+        
+        # Find courts that are currently in use (only scheduled or in-progress matches)
+        active_matches = matches_df[
+            (matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS])) &
+            (matches_df[config.COL_COURT_NUMBER].notna())  # Must have a court number
+        ]
+        
+        # Get players who are currently in active matches
+        busy_players = set()
+        for _, match in active_matches.iterrows():
+            players = [
+                match[config.COL_TEAM1_PLAYER1],
+                match[config.COL_TEAM1_PLAYER2],
+                match[config.COL_TEAM2_PLAYER1],
+                match[config.COL_TEAM2_PLAYER2]
+            ]
+            busy_players.update(p for p in players if pd.notna(p))
+        
+        used_courts = set(active_matches[config.COL_COURT_NUMBER].astype(int))
+        
+        # Get available courts (1-6)
+        available_courts = [i for i in range(1, 7) if i not in used_courts]
+        
+        if not available_courts:
+            return False
+        
+        # Find pending matches
+        pending_matches = matches_df[
+            (matches_df[config.COL_MATCH_STATUS] == config.STATUS_PENDING)
+        ].copy()
+        
+        if pending_matches.empty:
+            st.info("No pending matches to assign courts to")
+            return False
+            
+        updates_made = False
+        
+        # For each pending match, assign a court if available and players aren't busy
+        for idx, match in pending_matches.iterrows():
+            match_id = match[config.COL_MATCH_ID]
+            
+            # Skip if match already has a valid court number
+            court_number = match[config.COL_COURT_NUMBER]
+            if pd.notna(court_number):
+                continue
+            
+            # Check if any players in this match are already playing
+            match_players = {
+                match[config.COL_TEAM1_PLAYER1],
+                match[config.COL_TEAM1_PLAYER2],
+                match[config.COL_TEAM2_PLAYER1],
+                match[config.COL_TEAM2_PLAYER2]
+            }
+            match_players = {p for p in match_players if pd.notna(p)}  # Remove any NaN values
+            
+            # If any players are busy, skip this match
+            if match_players & busy_players:
+                #st.write(f"Skipping match {match_id} - players already in active matches")
+                continue
+            
+            if available_courts:  # We have courts available
+                court = available_courts.pop(0)  # Take the first available court
+                
+                state.record(events.COURT_ASSIGNED, match_id=match_id, court=court, started=True)
+                updates_made = True
+                
+                # Add these players to busy_players for subsequent matches
+                busy_players.update(match_players)
+        
+        return updates_made
+
+    def generate_next_matches(self, active_players, court_count, time_limit=None):
+        """Generate optimal matches based on player history.
+
+        The round is found within time_limit seconds of the data being loaded
+        (default: SCHEDULER_TIME_BUDGET + SCHEDULER_SELECTION_BUDGET), however
+        many players there are; how good it is known to be is left in
+        last_round_quality.
+        """
         try:
             import streamlit as st
             
             # Cache the players and matches data
             with st.spinner("Loading player and match data..."):
-                players_df = self.read_sheet(config.SHEET_PLAYERS)
-                matches_df = self.read_sheet(config.SHEET_MATCHES)
-                
-                # Pre-calculate wait times for all players using cached matches_df
-                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                self.player_wait_times = {
-                    player: self._calculate_wait_time(player, current_time, matches_df)
-                    for player in active_players
-                }
+                snapshot = self.load_snapshot()
+                players_df = snapshot.players
+                matches_df = snapshot.matches
                 
                 # Filter out any players that are not marked as Active in the sheet
                 active_status_players = set(players_df[players_df[config.COL_STATUS] == "Active"][config.COL_NAME])
@@ -770,145 +1002,61 @@ class SheetsManager:
                 male_players = [p for p in active_players if player_genders.get(p) == config.GENDER_MALE]
                 female_players = [p for p in active_players if player_genders.get(p) == config.GENDER_FEMALE]
                 
-                # Pre-calculate all player interactions using cached matches_df
-                self.player_interactions = self._get_player_interactions(matches_df)
-                for player in active_players:
-                    if player not in self.player_interactions:
-                        self.player_interactions[player] = {'with': set(), 'against': set()}
-                
-                # Pre-calculate match counts using cached matches_df
-                self.player_match_counts, self.match_type_counts = self._get_player_match_counts(active_players, matches_df)
-            
-            # Calculate current match type ratios
-            total_matches = len(matches_df) if not matches_df.empty else 0
-            if total_matches > 0:
-                mixed_ratio = len(matches_df[matches_df[config.COL_MATCH_TYPE] == 'Mixed']) / total_matches
-                mens_ratio = len(matches_df[matches_df[config.COL_MATCH_TYPE] == 'Mens']) / total_matches
-                womens_ratio = len(matches_df[matches_df[config.COL_MATCH_TYPE] == 'Womens']) / total_matches
-                print(f"Current match type ratios - Mixed: {mixed_ratio:.2f}, Mens: {mens_ratio:.2f}, Womens: {womens_ratio:.2f}")
-            
-            # Generate all possible combinations
-            from itertools import combinations
-            possible_matches = []
-            
-            with st.spinner("Generating possible match combinations..."):
-                progress_bar = st.progress(0)
-                total_steps = 3  # Mixed, Mens, Womens
-                current_step = 0
-                
-                # Generate Mixed Doubles combinations
-                if len(male_players) >= 2 and len(female_players) >= 2:
-                    male_combos = list(combinations(male_players, 2))
-                    female_combos = list(combinations(female_players, 2))
-                    total_mixed = len(male_combos) * len(female_combos)
+                with self._lock:
+                    # Partner/opponent counts follow committed events; rebuild them only if the sheet has moved on without us
+                    if self._interactions is None or not self._interactions.covers(matches_df):
+                        self._interactions = scheduler.InteractionIndex.from_matches(matches_df)
                     
-                    for i, males in enumerate(male_combos):
-                        for females in female_combos:
-                            match = {
-                                'players': (males[0], females[0], males[1], females[1]),
-                                'type': 'Mixed',
-                                'score': self.score_combination([males[0], females[0], males[1], females[1]], 'Mixed')
-                            }
-                            possible_matches.append(match)
-                            
-                            # Update progress every 100 combinations
-                            if len(possible_matches) % 100 == 0:
-                                progress = (i * len(female_combos)) / total_mixed / total_steps
-                                progress_bar.progress(progress)
-                
-                current_step += 1
-                progress_bar.progress(current_step / total_steps)
-                
-                # Generate Mens Doubles combinations
-                if len(male_players) >= 4:
-                    mens_combos = list(combinations(male_players, 4))
-                    for i, players in enumerate(mens_combos):
-                        match = {
-                            'players': players,
-                            'type': 'Mens',
-                            'score': self.score_combination(players, 'Mens')
-                        }
-                        possible_matches.append(match)
-                        
-                        # Update progress every 10 combinations
-                        if i % 10 == 0:
-                            progress = (current_step + (i / len(mens_combos))) / total_steps
-                            progress_bar.progress(progress)
-                
-                current_step += 1
-                progress_bar.progress(current_step / total_steps)
-                
-                # Generate Womens Doubles combinations
-                if len(female_players) >= 4:
-                    womens_combos = list(combinations(female_players, 4))
-                    for i, players in enumerate(womens_combos):
-                        match = {
-                            'players': players,
-                            'type': 'Womens',
-                            'score': self.score_combination(players, 'Womens')
-                        }
-                        possible_matches.append(match)
-                        
-                        # Update progress every 10 combinations
-                        if i % 10 == 0:
-                            progress = (current_step + (i / len(womens_combos))) / total_steps
-                            progress_bar.progress(progress)
-                
-                progress_bar.progress(1.0)
+                    # Games, type mix, waits and partnerships of every player, as arrays for the scoring kernel
+                    stats = self.player_stats = scheduler.player_stats(active_players, matches_df, self._interactions)
+            
+            if stats.type_ratios:
+                ratios = stats.type_ratios
+                print(f"Current match type ratios - Mixed: {ratios[config.MATCH_TYPE_MIXED]:.2f}, "
+                      f"Mens: {ratios[config.MATCH_TYPE_MENS]:.2f}, Womens: {ratios[config.MATCH_TYPE_WOMENS]:.2f}")
+            
+            players = [p for p in active_players if player_genders.get(p) in (config.GENDER_MALE, config.GENDER_FEMALE)]
+            deadline = time.perf_counter() + time_limit if time_limit is not None else None
+            self.last_round_quality = None
+            if config.SCHEDULER_LOOKAHEAD_ROUNDS > 0:
+                with st.spinner("Taking the next planned round..."):
+                    selected = self._next_planned_round(stats, players, male_players, female_players, court_count, deadline)
+            else:
+                # Search the players most in need of a game first, and keep the best round found by the deadline
+                with st.spinner("Finding the best round..."):
+                    progress_bar = st.progress(0)
+                    selected, self.last_round_quality = scheduler.find_round(
+                        stats, players, male_players, female_players, court_count,
+                        deadline or scheduler.round_deadline(),
+                        progress=progress_bar.progress, workers=config.SCHEDULER_WORKERS
+                    )
+                    progress_bar.progress(1.0, f"Round {self.last_round_quality}")
+                    print(f"Found a round from {len(active_players)} players: {self.last_round_quality}")
             
-            # Sort by score
-            with st.spinner("Selecting optimal matches..."):
-                possible_matches.sort(key=lambda x: x['score'], reverse=True)
-                
-                # Select best balanced set
-                selected = []
-                used_players = set()
-                selected_type_counts = {'Mixed': 0, 'Mens': 0, 'Womens': 0}
-                
-                while len(selected) < court_count and possible_matches:
-                    for match in possible_matches[:]:
-                        # Skip if any player already used
-                        if any(p in used_players for p in match['players']):
-                            continue
-                        
-                        # Check match type balance for this batch
-                        current_type = match['type']
-                        total_selected = sum(selected_type_counts.values())
-                        if total_selected > 0:
-                            type_ratio = selected_type_counts[current_type] / total_selected
-                            if type_ratio > 0.6:  # No more than 60% of any type
-                                continue
-                        
-                        # Add match
-                        selected.append(match)
-                        used_players.update(match['players'])
-                        selected_type_counts[current_type] += 1
-                        possible_matches.remove(match)
-                        break
-                    else:
-                        break  # No valid match found
-                
-                print(f"Selected match types: {selected_type_counts}")
+            selected_type_counts = {match_type: sum(c.type == match_type for c in selected) for match_type in scheduler.TYPE_ORDER}
+            print(f"Selected match types: {selected_type_counts}")
             
-            # Convert to match format and write to sheet
-            with st.spinner("Writing matches to sheet..."):
+            # Convert to match format and write to sheet, numbering the matches
+            # from the state they are recorded against so concurrent rounds can't share IDs
+            with st.spinner("Writing matches to sheet..."), self._lock:
+                state = self._load_state()
                 new_matches = []
-                match_id_counter = self._get_next_match_id()
+                match_id_counter = self._get_next_match_id(state)
                 
                 for match in selected:
-                    players = match['players']
+                    players = match.players
                     new_match = {
                         config.COL_MATCH_ID: f"M{match_id_counter}",
-                        config.COL_COURT_NUMBER: "",
+                        config.COL_COURT_NUMBER: None,
                         config.COL_TEAM1_PLAYER1: players[0],
                         config.COL_TEAM1_PLAYER2: players[1],
                         config.COL_TEAM2_PLAYER1: players[2],
                         config.COL_TEAM2_PLAYER2: players[3],
-                        config.COL_START_TIME: "",
-                        config.COL_END_TIME: "",
-                        config.COL_TEAM1_SCORE: "",
-                        config.COL_TEAM2_SCORE: "",
-                        config.COL_MATCH_TYPE: match['type'],
+                        config.COL_START_TIME: None,
+                        config.COL_END_TIME: None,
+                        config.COL_TEAM1_SCORE: None,
+                        config.COL_TEAM2_SCORE: None,
+                        config.COL_MATCH_TYPE: match.type,
                         config.COL_MATCH_STATUS: config.STATUS_PENDING
                     }
                     new_matches.append(new_match)
@@ -918,57 +1066,25 @@ class SheetsManager:
                     print("No valid matches could be generated")
                     return []
                 
-                # Convert new matches to DataFrame rows
-                new_rows = []
+                # Log the new matches and put as many as fit on free courts, written together
                 for match in new_matches:
-                    new_rows.append([
-                        match[config.COL_MATCH_ID],
-                        match[config.COL_COURT_NUMBER],
-                        match[config.COL_TEAM1_PLAYER1],
-                        match[config.COL_TEAM1_PLAYER2],
-                        match[config.COL_TEAM2_PLAYER1],
-                        match[config.COL_TEAM2_PLAYER2],
-                        match[config.COL_START_TIME],
-                        match[config.COL_END_TIME],
-                        match[config.COL_TEAM1_SCORE],
-                        match[config.COL_TEAM2_SCORE],
-                        match[config.COL_MATCH_STATUS],
-                        match[config.COL_MATCH_TYPE]
-                    ])
-                
-                # Get existing matches or create empty DataFrame with correct columns
-                if matches_df.empty:
-                    matches_df = pd.DataFrame(columns=[
-                        config.COL_MATCH_ID,
-                        config.COL_COURT_NUMBER,
-                        config.COL_TEAM1_PLAYER1,
-                        config.COL_TEAM1_PLAYER2,
-                        config.COL_TEAM2_PLAYER1,
-                        config.COL_TEAM2_PLAYER2,
-                        config.COL_START_TIME,
-                        config.COL_END_TIME,
-                        config.COL_TEAM1_SCORE,
-                        config.COL_TEAM2_SCORE,
-                        config.COL_MATCH_STATUS,
-                        config.COL_MATCH_TYPE
-                    ])
-                
-                # Append new matches to existing ones
-                new_matches_df = pd.DataFrame(new_rows, columns=matches_df.columns)
-                all_matches = pd.concat([matches_df, new_matches_df], ignore_index=True)
+                    state.record(
+                        events.MATCH_GENERATED,
+                        match_id=match[config.COL_MATCH_ID],
+                        players=[
+                            match[config.COL_TEAM1_PLAYER1], match[config.COL_TEAM1_PLAYER2],
+                            match[config.COL_TEAM2_PLAYER1], match[config.COL_TEAM2_PLAYER2]
+                        ],
+                        type=match[config.COL_MATCH_TYPE]
+                    )
+                print("Assigning courts to pending matches...")
+                self._assign_pending_matches(state, court_count)
                 
                 # Update the matches sheet
-                self.update_sheet(config.SHEET_MATCHES, [all_matches.columns.tolist()] + all_matches.values.tolist())
-                
-                # Clear cache after successful write
-                self._clear_cache()
+                self._commit(state)
                 
                 print(f"Successfully generated and wrote {len(new_matches)} matches")
                 
-                # Assign courts to pending matches
-                print("Assigning courts to pending matches...")
-                self.assign_pending_matches_to_courts(court_count)
-                
                 return new_matches
             
         except Exception as e:
@@ -977,188 +1093,58 @@ class SheetsManager:
             traceback.print_exc()
             return []
 
-    def score_combination(self, players, match_type):
-        score = 0
-        matches_df = self.read_sheet(config.SHEET_MATCHES)
-        
-        # For first run with empty matches sheet, ensure mix of types
-        if matches_df.empty:
-            # Give slight preference to non-mixed matches initially
-            if match_type in ['Mens', 'Womens']:
-                score += 50
-            return score
-        
-        # Calculate current match type ratios
-        total_matches = len(matches_df)
-        mixed_ratio = len(matches_df[matches_df[config.COL_MATCH_TYPE] == 'Mixed']) / total_matches
-        mens_ratio = len(matches_df[matches_df[config.COL_MATCH_TYPE] == 'Mens']) / total_matches
-        womens_ratio = len(matches_df[matches_df[config.COL_MATCH_TYPE] == 'Womens']) / total_matches
-        
-        # Adjust score based on match type ratios
-        if mixed_ratio > 0.5 and match_type == 'Mixed':
-            score -= 300  # Heavy penalty for too many mixed matches
-        elif mens_ratio < 0.2 and match_type == 'Mens':
-            score += 200  # Bonus for needed mens matches
-        elif womens_ratio < 0.2 and match_type == 'Womens':
-            score += 200  # Bonus for needed womens matches
-        
-        # Prefer players with fewer games
-        max_games = max(self.player_match_counts.values()) if self.player_match_counts else 1
-        for player in players:
-            games_played = self.player_match_counts.get(player, 0)
-            score += (max_games - games_played) * 2
-        
-        # Hard requirements for match type balance per player
-        for player in players:
-            total_matches = self.match_type_counts[player]['Mixed'] + self.match_type_counts[player]['Same']
-            if total_matches >= 3:  # Only apply after a few matches
-                mixed_ratio = self.match_type_counts[player]['Mixed'] / total_matches
-                same_ratio = self.match_type_counts[player]['Same'] / total_matches
-                
-                # Severe penalty if ratio is too imbalanced (should be close to 0.5)
-                if mixed_ratio > 0.6 and match_type == 'Mixed':
-                    score -= 400  # Even heavier penalty for too many mixed matches
-                elif same_ratio < 0.3 and match_type in ['Mens', 'Womens']:
-                    score += 300  # Strong bonus for needed same-gender matches
-        
-        # Partner repetition penalty
-        for i, p1 in enumerate(players):
-            for p2 in players[i+1:]:
-                if p2 in self.player_interactions[p1]['with']:
-                    shared_matches = sum(1 for _, match in matches_df.iterrows() if 
-                        ((match[config.COL_TEAM1_PLAYER1] == p1 and match[config.COL_TEAM1_PLAYER2] == p2) or
-                         (match[config.COL_TEAM1_PLAYER2] == p1 and match[config.COL_TEAM1_PLAYER1] == p2) or
-                         (match[config.COL_TEAM2_PLAYER1] == p1 and match[config.COL_TEAM2_PLAYER2] == p2) or
-                         (match[config.COL_TEAM2_PLAYER2] == p1 and match[config.COL_TEAM2_PLAYER1] == p2)))
-                    score -= 50 * shared_matches  # Doubled penalty for repeat partnerships
-        
-        return score
-
-    def _get_player_interactions(self, matches_df=None):
-        """Track who has played with/against whom."""
-        if matches_df is None:
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
-        
-        interactions = {}
-        
-        for _, match in matches_df.iterrows():
-            team1_players = [match[config.COL_TEAM1_PLAYER1], match[config.COL_TEAM1_PLAYER2]]
-            team2_players = [match[config.COL_TEAM2_PLAYER1], match[config.COL_TEAM2_PLAYER2]]
-            
-            # Initialize player records if not exists
-            for player in team1_players + team2_players:
-                if pd.notna(player) and player not in interactions:
-                    interactions[player] = {'with': set(), 'against': set()}
-            
-            # Record team1 interactions
-            for i, p1 in enumerate(team1_players):
-                if pd.notna(p1):
-                    # Played with teammates
-                    for p2 in team1_players[i+1:]:
-                        if pd.notna(p2):
-                            interactions[p1]['with'].add(p2)
-                            interactions[p2]['with'].add(p1)
-                    
-                    # Played against opponents
-                    for p2 in team2_players:
-                        if pd.notna(p2):
-                            interactions[p1]['against'].add(p2)
-                            interactions[p2]['against'].add(p1)
-            
-            # Record team2 interactions
-            for i, p1 in enumerate(team2_players):
-                if pd.notna(p1):
-                    for p2 in team2_players[i+1:]:
-                        if pd.notna(p2):
-                            interactions[p1]['with'].add(p2)
-                            interactions[p2]['with'].add(p1)
-        
-        return interactions
-
-    def _calculate_wait_time(self, player, current_time, matches_df=None):
-        """Calculate how long a player has been waiting since their last match."""
-        if matches_df is None:
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
-        
-        # Get player's matches
-        player_matches = matches_df[
-            (matches_df[config.COL_TEAM1_PLAYER1] == player) |
-            (matches_df[config.COL_TEAM1_PLAYER2] == player) |
-            (matches_df[config.COL_TEAM2_PLAYER1] == player) |
-            (matches_df[config.COL_TEAM2_PLAYER2] == player)
-        ]
-        
-        if player_matches.empty:
-            return float('inf')  # Player hasn't played any matches
-        
-        # Get the most recent match
-        last_match = player_matches.iloc[-1]
-        last_match_time = last_match[config.COL_END_TIME] if pd.notna(last_match[config.COL_END_TIME]) else last_match[config.COL_START_TIME]
-        
-        if pd.isna(last_match_time) or last_match_time == '':
-            return float('inf')
-        
-        # Calculate time difference
-        last_match_dt = datetime.strptime(last_match_time, "%Y-%m-%d %H:%M:%S")
-        current_dt = datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S")
-        wait_time = (current_dt - last_match_dt).total_seconds() / 60  # Convert to minutes
-        
-        return wait_time
+    def _next_planned_round(self, stats, players, males, females, court_count, deadline=None):
+        """The next round of the lookahead plan, repaired to fit, planning afresh when the plan no longer holds.
 
-    def _get_player_match_counts(self, active_players, matches_df=None):
-        """Get the number of matches played by each player and their match type distribution"""
-        if matches_df is None:
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
-        
-        match_counts = {}
-        match_type_counts = {}  # Track mixed vs same-gender matches per player
-        
-        for player in active_players:
-            match_counts[player] = 0
-            match_type_counts[player] = {'Mixed': 0, 'Same': 0}  # Same represents Mens/Womens
-            
-            # Count completed and in-progress matches
-            player_matches = matches_df[
-                ((matches_df[config.COL_TEAM1_PLAYER1] == player) |
-                 (matches_df[config.COL_TEAM1_PLAYER2] == player) |
-                 (matches_df[config.COL_TEAM2_PLAYER1] == player) |
-                 (matches_df[config.COL_TEAM2_PLAYER2] == player)) &
-                (matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_COMPLETED, config.STATUS_IN_PROGRESS, config.STATUS_SCHEDULED, config.STATUS_PENDING]))
-            ]
-            
-            match_counts[player] = len(player_matches)
-            
-            # Count match types
-            for _, match in player_matches.iterrows():
-                if match[config.COL_MATCH_TYPE] == 'Mixed':
-                    match_type_counts[player]['Mixed'] += 1
-                else:
-                    match_type_counts[player]['Same'] += 1
-        
-        return match_counts, match_type_counts
+        A fresh plan must be done by deadline too, so a shorter one gets a shallower search per round.
+        """
+        with self._lock:
+            planned = self._plan.popleft() if self._plan else None
+        selected = None
+        if planned is not None:
+            selected = scheduler.repair_round(
+                planned, stats, players, males, females, court_count,
+                workers=config.SCHEDULER_WORKERS, deadline=deadline
+            )
+        if selected is None:
+            plan = deque(scheduler.plan_rounds(
+                stats, players, males, females, court_count,
+                config.SCHEDULER_LOOKAHEAD_ROUNDS, workers=config.SCHEDULER_WORKERS, deadline=deadline
+            ))
+            print(f"Planned {len(plan)} rounds ahead")
+            selected = plan.popleft().matches if plan else []
+            with self._lock:
+                self._plan = plan
+        return selected
 
-    def _get_next_match_id(self):
-        """Get the next available match ID"""
+    def score_combination(self, players, match_type):
+        """Score one possible match against the player stats of the last generate_next_matches run."""
+        seats = [[self.player_stats.ids[p] for p in players]]
+        return int(scheduler.score_matches(self.player_stats, seats, match_type)[0])
+
+    def _get_next_match_id(self, state):
+        """Get the next available match ID among the matches of state"""
         match_id_pattern = r'M(\d+)'
-        existing_match_ids = self.read_sheet(config.SHEET_MATCHES)[config.COL_MATCH_ID].str.extract(match_id_pattern, expand=False).astype(float)
-        return int(existing_match_ids.max() + 1) if not existing_match_ids.empty else 1
+        match_ids = pd.Series([match[config.COL_MATCH_ID] for match in state.matches], dtype=str)
+        existing_match_ids = match_ids.str.extract(match_id_pattern, expand=False).astype(float)
+        return int(existing_match_ids.max() + 1) if existing_match_ids.notna().any() else 1
 
+    @_synchronized
     def cancel_match(self, match_id):
         """Cancel a match and assign next pending match if court is available."""
         try:
             # Get matches
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
+            state = self._load_state()
             
             # Find the match to cancel
-            match_idx = matches_df[matches_df[config.COL_MATCH_ID] == match_id].index
-            if len(match_idx) == 0:
+            if state.find_match(match_id) is None:
                 return False, "Match not found"
             
             # Remove the match
-            matches_df = matches_df.drop(match_idx)
+            state.record(events.MATCH_CANCELLED, match_id=match_id)
             
             # Update the sheet
-            success = self.update_sheet(config.SHEET_MATCHES, [matches_df.columns.tolist()] + matches_df.values.tolist())
+            success = self._commit(state)
             
             if success:
                 # Check and assign courts after cancellation
@@ -1170,6 +1156,7 @@ class SheetsManager:
         except Exception as e:
             return False, f"Error cancelling match: {str(e)}"
 
+    @_synchronized
     def handle_player_inactivation(self, player_name):
         """Handle matches when a player is marked as inactive."""
         try:
@@ -1195,7 +1182,6 @@ class SheetsManager:
                 if success:
                     # Check and assign courts after removing matches
                     self.assign_courts_to_pending_matches()
-                    self._clear_cache()  # Clear cache after handling matches
                     return True, f"Removed {len(match_ids)} matches for inactive player"
                 else:
                     return False, "Failed to remove matches"
@@ -1206,23 +1192,25 @@ class SheetsManager:
             st.error(f"Error handling player matches: {str(e)}")
             return False, f"Error handling player matches: {str(e)}"
 
+    @_synchronized
     def remove_matches(self, match_ids, assign_pending=True, return_freed_courts=False):
         """Remove specified matches from the Matches sheet and optionally assign pending matches to freed courts."""
-        matches_df = self.read_sheet(config.SHEET_MATCHES)
+        state = self._load_state()
+        matches_df = state.frame(config.SHEET_MATCHES)
         
         # Get courts that will be freed up
         freed_courts = matches_df[
             (matches_df[config.COL_MATCH_ID].isin(match_ids)) &
             (matches_df[config.COL_COURT_NUMBER].notna()) &  # Must have a court number
-            (matches_df[config.COL_COURT_NUMBER] != "") &  # Must not be empty string
             (matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS]))
         ][config.COL_COURT_NUMBER].unique().tolist()  # Use unique to prevent duplicates
         
         # Remove the matches
-        matches_df = matches_df[~matches_df[config.COL_MATCH_ID].isin(match_ids)]
+        for match_id in matches_df[matches_df[config.COL_MATCH_ID].isin(match_ids)][config.COL_MATCH_ID].unique():
+            state.record(events.MATCH_CANCELLED, match_id=match_id)
         
         # Update the matches sheet
-        self.update_sheet(config.SHEET_MATCHES, [matches_df.columns.tolist()] + matches_df.values.tolist())
+        self._commit(state)
         
         # Either assign pending matches or return the freed courts
         if assign_pending and freed_courts:
@@ -1239,37 +1227,40 @@ class SheetsManager:
         if len(active_players) >= 4:  # Need at least 4 players for a match
             self.generate_next_matches(active_players[config.COL_NAME].tolist(), num_matches)
 
+    @_synchronized
     def migrate_gender_values(self):
         """Migrate old gender values (W) to new values (M/F)"""
         try:
             # Read current players
-            players_df = self.read_sheet(config.SHEET_PLAYERS)
+            state = self._load_state()
             
             # Update gender values
-            players_df[config.COL_GENDER] = players_df[config.COL_GENDER].apply(
-                lambda x: config.GENDER_FEMALE if x == "W" else (
-                    config.GENDER_MALE if pd.isna(x) or x == "" else x
-                )
-            )
+            for player in state.players:
+                gender = player[config.COL_GENDER]
+                if gender in ("W", ""):
+                    state.record(
+                        events.PLAYER_GENDER_CHANGED, name=player[config.COL_NAME],
+                        gender=config.GENDER_FEMALE if gender == "W" else config.GENDER_MALE
+                    )
             
             # Update sheet
-            self.update_sheet(config.SHEET_PLAYERS, [players_df.columns.tolist()] + players_df.values.tolist())
+            self._commit(state)
             return True
         except Exception as e:
             st.error(f"Error migrating gender values: {str(e)}")
             return False
 
-    def get_available_courts(self, total_courts):
+    def get_available_courts(self, total_courts, matches_df=None):
         """Get list of courts that don't have scheduled/in-progress matches."""
-        matches_df = self.read_sheet(config.SHEET_MATCHES)
+        if matches_df is None:
+            matches_df = self.read_sheet(config.SHEET_MATCHES)
         if matches_df.empty:
             return list(range(1, total_courts + 1))
             
         # Get courts that are currently in use (scheduled or in progress)
         busy_courts = set(matches_df[
             (matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS])) &
-            (matches_df[config.COL_COURT_NUMBER].notna()) &
-            (matches_df[config.COL_COURT_NUMBER] != "")
+            (matches_df[config.COL_COURT_NUMBER].notna())
         ][config.COL_COURT_NUMBER].astype(int).unique())
         
         # Return available courts
@@ -1278,63 +1269,72 @@ class SheetsManager:
         available_courts.sort()  # Keep courts in order
         return available_courts
 
+    @_synchronized
     def assign_pending_matches_to_courts(self, total_courts):
         """Assign pending matches to available courts."""
         try:
-            # Get truly available courts
-            available_courts = self.get_available_courts(total_courts)
-            if not available_courts:
-                print("No courts available")
-                return False
-                
-            # Get current matches
-            matches_df = self.read_sheet(config.SHEET_MATCHES)
-            if matches_df.empty:
-                print("No matches found")
+            state = self._load_state()
+            if not self._assign_pending_matches(state, total_courts):
                 return False
             
-            # Filter for pending matches
-            pending_matches = matches_df[
-                (matches_df[config.COL_MATCH_STATUS] == config.STATUS_PENDING) & 
-                (matches_df[config.COL_COURT_NUMBER].isna() | (matches_df[config.COL_COURT_NUMBER] == ""))
-            ]
-            
-            if pending_matches.empty:
-                print("No pending matches found")
-                return False
-            
-            # Assign courts to pending matches
-            court_assignments = {}
-            available_courts = list(available_courts)  # Make a copy to avoid modifying original
-            
-            for _, match in pending_matches.iterrows():
-                match_id = match[config.COL_MATCH_ID]
-                if available_courts:
-                    court = available_courts.pop(0)
-                    court_assignments[match_id] = court
-            
-            if not court_assignments:
-                print("No courts available to assign")
-                return False
-            
-            # Update matches with court assignments
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            for match_id, court in court_assignments.items():
-                matches_df.loc[matches_df[config.COL_MATCH_ID] == match_id, config.COL_COURT_NUMBER] = court
-                matches_df.loc[matches_df[config.COL_MATCH_ID] == match_id, config.COL_START_TIME] = current_time
-                matches_df.loc[matches_df[config.COL_MATCH_ID] == match_id, config.COL_MATCH_STATUS] = config.STATUS_SCHEDULED
-            
             # Write updated matches back to sheet
-            self.update_sheet(config.SHEET_MATCHES, [matches_df.columns.tolist()] + matches_df.values.tolist())
-            
-            # Clear cache after update
-            self._clear_cache()
-            
-            print(f"Assigned {len(court_assignments)} matches to courts {list(court_assignments.values())}")
-            return True
+            return self._commit(state)
             
         except Exception as e:
             print(f"Error assigning courts: {str(e)}")
             import traceback
             traceback.print_exc()
             return False
+
+    def _assign_pending_matches(self, state, total_courts):
+        """Record court assignments for pending matches on a TournamentState. Returns True if any were made."""
+        matches_df = state.frame(config.SHEET_MATCHES)
+        
+        # Get truly available courts
+        available_courts = self.get_available_courts(total_courts, matches_df)
+        if not available_courts:
+            print("No courts available")
+            return False
+        
+        if matches_df.empty:
+            print("No matches found")
+            return False
+        
+        # Filter for pending matches
+        pending_matches = matches_df[
+            (matches_df[config.COL_MATCH_STATUS] == config.STATUS_PENDING) & 
+            (matches_df[config.COL_COURT_NUMBER].isna())
+        ]
+        
+        if pending_matches.empty:
+            print("No pending matches found")
+            return False
+        
+        # Assign courts to pending matches
+        court_assignments = {}
+        available_courts = list(available_courts)  # Make a copy to avoid modifying original
+        
+        for match_id in pending_matches[config.COL_MATCH_ID]:
+            if available_courts:
+                court = available_courts.pop(0)
+                court_assignments[match_id] = court
+        
+        if not court_assignments:
+            print("No courts available to assign")
+            return False
+        
+        for match_id, court in court_assignments.items():
+            state.record(events.COURT_ASSIGNED, match_id=match_id, court=court, started=True)
+        
+        print(f"Assigned {len(court_assignments)} matches to courts {list(court_assignments.values())}")
+        return True
+
+
+@st.cache_resource
+def get_sheets_manager():
+    """The SheetsManager shared by every session and page of this server process.
+    
+    Sharing one manager means one API client, one pool of HTTP connections and
+    one warm cache, instead of rebuilding them on every rerun of every page.
+    """
+    return SheetsManager()
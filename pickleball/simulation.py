@@ -1,8 +1,6 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
 from datetime import datetime, timedelta
 import random
 
@@ -280,6 +278,9 @@ def run_tournament_analysis(num_players):
     }
 
 def main():
+    # plotly is slow to import, so only load it when the analysis actually runs
+    import plotly.graph_objects as go
+
     st.title("Pickleball Tournament Simulation Analysis")
     st.write("Compare Standard vs Rally Scoring")
     
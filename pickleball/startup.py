@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+
+# Start of the clock: when the pickleball package was first imported
+PROCESS_START = time.perf_counter()
+
+_phases = {}  # label -> seconds taken the first time that phase ran
+_reported = set()
+
+
+@contextmanager
+def timed(label):
+    """Time a one-off setup phase, such as building the API client. Only the first run is kept."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.setdefault(label, time.perf_counter() - start)
+
+
+def report(page, render_start):
+    """Print how long a page's first render took and where setup time went, once per page per process."""
+    if page in _reported:
+        return
+    _reported.add(page)
+    now = time.perf_counter()
+    lines = [
+        f"Startup timing for {page}: first frame in {now - render_start:.2f}s, "
+        f"{now - PROCESS_START:.2f}s after startup"
+    ]
+    lines += [f"  {label}: {seconds:.3f}s" for label, seconds in _phases.items()]
+    print("\n".join(lines))
@@ -0,0 +1,443 @@
+import functools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import streamlit as st
+
+from . import config, startup
+from .governor import RequestGovernor
+
+logger = logging.getLogger(__name__)
+
+
+def cell_to_text(value):
+    """Render a cell the way the Sheets API hands it back: as text, blanks as ''."""
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        if value.is_integer():  # Sheets shows 2.0 as 2
+            return str(int(value))
+    return str(value)
+
+
+class StorageBackend:
+    """Table storage underneath SheetsManager.
+
+    A table is addressed by its sheet name and laid out like a spreadsheet:
+    row 1 holds the header and data starts at row 2. Row numbers are 1-based.
+    """
+
+    def read_table(self, name):
+        """Return every row of a table, header first, as lists of cell values."""
+        raise NotImplementedError
+
+    def read_tables(self, names):
+        """Return {name: rows} for several tables, read as one consistent snapshot."""
+        return {name: self.read_table(name) for name in names}
+
+    def upsert_rows(self, name, rows):
+        """Write rows keyed by row number, replacing whatever was there.
+
+        Returns the number of rows written.
+        """
+        raise NotImplementedError
+
+    def upsert_tables(self, updates):
+        """Apply {name: {row_num: row}} across several tables in one write.
+
+        Returns {name: number of rows written}.
+        """
+        return {name: self.upsert_rows(name, rows) for name, rows in updates.items()}
+
+    def append_rows(self, name, rows):
+        """Add rows after the last non-empty row of a table.
+
+        Returns the row number the first appended row landed on.
+        """
+        raise NotImplementedError
+
+    def delete_rows(self, name, start_row, end_row=None):
+        """Clear rows start_row..end_row inclusive (to the end if end_row is None)."""
+        raise NotImplementedError
+
+    def read_wait(self):
+        """Seconds a read would have to wait for the API quota if sent now."""
+        return 0.0
+
+
+def _range_rows(a1_range):
+    """Sheet name and first/last row numbers of an A1 range like "'Scores'!A12:C14"."""
+    name, _, cells = a1_range.rpartition('!')
+    rows = [int(''.join(c for c in ref if c.isdigit())) for ref in cells.split(':')]
+    return name.strip("'"), rows[0], rows[-1]
+
+
+def load_google_credentials():
+    """Load service account credentials from Streamlit secrets or the environment."""
+    from google.oauth2 import service_account
+
+    # Try to get credentials from Streamlit secrets first
+    if 'google_credentials_type' in st.secrets:
+        # Reconstruct credentials dict from flattened secrets
+        creds_info = {
+            'type': st.secrets['google_credentials_type'],
+            'project_id': st.secrets['google_credentials_project_id'],
+            'private_key_id': st.secrets['google_credentials_private_key_id'],
+            'private_key': st.secrets['google_credentials_private_key'],
+            'client_email': st.secrets['google_credentials_client_email'],
+            'client_id': st.secrets['google_credentials_client_id'],
+            'auth_uri': st.secrets['google_credentials_auth_uri'],
+            'token_uri': st.secrets['google_credentials_token_uri'],
+            'auth_provider_x509_cert_url': st.secrets['google_credentials_auth_provider_x509_cert_url'],
+            'client_x509_cert_url': st.secrets['google_credentials_client_x509_cert_url'],
+            'universe_domain': st.secrets['google_credentials_universe_domain']
+        }
+        return service_account.Credentials.from_service_account_info(
+            creds_info, scopes=config.SCOPES
+        )
+
+    # Fall back to environment variable
+    creds_json = os.getenv('GOOGLE_CREDENTIALS_JSON')
+    if creds_json:
+        creds_info = json.loads(creds_json)
+        return service_account.Credentials.from_service_account_info(
+            creds_info, scopes=config.SCOPES
+        )
+    raise Exception("No credentials found in Streamlit secrets or environment variables")
+
+
+@functools.lru_cache(maxsize=None)
+def _sheets_discovery_document():
+    """The Sheets v4 discovery document bundled with google-api-python-client, parsed once per process."""
+    from googleapiclient.discovery_cache import get_static_doc
+
+    with startup.timed("Sheets discovery document"):
+        return json.loads(get_static_doc('sheets', 'v4'))
+
+
+class SheetsBackend(StorageBackend):
+    """Storage backed by the Google Sheets values API.
+
+    Every request goes through a RequestGovernor, which keeps within the quota
+    and raises QuotaExceeded rather than blocking the session for long.
+    httplib2 connections aren't thread-safe, so each request borrows an
+    authorized connection from a pool and returns it afterwards; concurrent
+    sessions get their own connection and idle ones stay open for reuse.
+    Credentials and the API client are only set up on the first request.
+    A ready-made service object, such as a FakeSheetsService, can be passed
+    instead; its requests are executed as they are, without credentials.
+    """
+
+    def __init__(self, spreadsheet_id=None, credentials=None, governor=None, service=None):
+        self.spreadsheet_id = spreadsheet_id or config.SPREADSHEET_ID
+        self.governor = governor or RequestGovernor()
+        self._creds = credentials
+        self._sheet = service.spreadsheets() if service is not None else None
+        self._pooled = service is None
+        self._client_lock = threading.Lock()
+        self._http_pool = queue.LifoQueue()  # Most recently used first, so warm connections get reused
+
+    @property
+    def creds(self):
+        """Service account credentials, loaded on first use."""
+        with self._client_lock:
+            if self._creds is None:
+                with startup.timed("Google credentials"):
+                    self._creds = load_google_credentials()
+            return self._creds
+
+    @property
+    def sheet(self):
+        """The spreadsheets() resource, built on first use without fetching the discovery document."""
+        if self._sheet is None:
+            from googleapiclient.discovery import build_from_document
+
+            creds = self.creds
+            with self._client_lock:
+                if self._sheet is None:
+                    with startup.timed("Sheets client build"):
+                        service = build_from_document(_sheets_discovery_document(), credentials=creds)
+                        self._sheet = service.spreadsheets()
+        return self._sheet
+
+    def _execute(self, operation, request, **kwargs):
+        """Send a request through the governor on a pooled connection."""
+        if not self._pooled:
+            return self.governor.execute(operation, request.execute, **kwargs)
+
+        def send():
+            try:
+                http = self._http_pool.get_nowait()
+            except queue.Empty:
+                import google_auth_httplib2
+                import httplib2
+                http = google_auth_httplib2.AuthorizedHttp(self.creds, http=httplib2.Http())
+            try:
+                return request.execute(http=http)
+            finally:
+                self._http_pool.put(http)
+        return self.governor.execute(operation, send, **kwargs)
+
+    @property
+    def api_calls(self):
+        """Requests sent to the API so far, by operation."""
+        return self.governor.calls
+
+    def read_wait(self):
+        return self.governor.wait_time('read')
+
+    def read_table(self, name):
+        request = self.sheet.values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=name
+        )
+        result = self._execute('values.get', request)
+        return result.get('values', [])
+
+    def read_tables(self, names):
+        request = self.sheet.values().batchGet(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=list(names)
+        )
+        result = self._execute('values.batchGet', request)
+        # Value ranges come back in the order they were requested
+        value_ranges = result.get('valueRanges', [])
+        return {name: value_range.get('values', []) for name, value_range in zip(names, value_ranges)}
+
+    def upsert_rows(self, name, rows):
+        return self.upsert_tables({name: rows}).get(name, 0)
+
+    def upsert_tables(self, updates):
+        data = []
+        for name, rows in updates.items():
+            # Merge consecutive row numbers into a single range each
+            blocks = []
+            for row_num in sorted(rows):
+                if blocks and blocks[-1]['end'] == row_num - 1:
+                    blocks[-1]['values'].append(rows[row_num])
+                    blocks[-1]['end'] = row_num
+                else:
+                    blocks.append({'start': row_num, 'end': row_num, 'values': [rows[row_num]]})
+            data.extend(
+                {'range': f"{name}!A{block['start']}", 'values': block['values']}
+                for block in blocks
+            )
+        if not data:
+            return {}
+
+        request = self.sheet.values().batchUpdate(
+            spreadsheetId=self.spreadsheet_id,
+            body={'valueInputOption': 'RAW', 'data': data}
+        )
+        result = self._execute('values.batchUpdate', request, kind='write')
+        # The response says what landed, so there's no need to read it back
+        written = {}
+        for response in result.get('responses', []):
+            name = _range_rows(response['updatedRange'])[0]
+            written[name] = written.get(name, 0) + response.get('updatedRows', 0)
+        return written
+
+    def append_rows(self, name, rows):
+        if not rows:
+            return None
+        request = self.sheet.values().append(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{name}!A1",
+            valueInputOption='RAW',
+            insertDataOption='INSERT_ROWS',
+            body={'values': rows}
+        )
+        # A repeated append would duplicate rows, so only retry when it was refused outright
+        result = self._execute('values.append', request, kind='write', idempotent=False)
+        return _range_rows(result['updates']['updatedRange'])[1]
+
+    def delete_rows(self, name, start_row, end_row=None):
+        end = end_row if end_row is not None else ""
+        request = self.sheet.values().clear(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{name}!A{start_row}:ZZZ{end}",
+            body={}
+        )
+        self._execute('values.clear', request, kind='write')
+
+
+class SQLiteBackend(StorageBackend):
+    """Transactional storage in a local SQLite file.
+
+    Every table lives in a single ``sheet_rows`` table keyed by sheet name and
+    row number, so the layout matches the spreadsheet one-to-one. Cells are
+    stored as text, which is what the Sheets API returns on read. When a mirror
+    backend is given, each committed write is forwarded to it; mirror failures
+    are logged and never fail the local write.
+    """
+
+    def __init__(self, path=None, mirror=None):
+        self.path = path or config.SQLITE_PATH
+        self.mirror = mirror
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sheet_rows ("
+            " sheet TEXT NOT NULL,"
+            " row_num INTEGER NOT NULL,"
+            " cells TEXT NOT NULL,"
+            " PRIMARY KEY (sheet, row_num))"
+        )
+        self._depth = 0
+        self._pending_mirror = []
+
+    @property
+    def api_calls(self):
+        """Requests sent to the mirror's API so far, by operation."""
+        return getattr(self.mirror, 'api_calls', Counter())
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one atomic commit. Nested use joins the outer one."""
+        with self._lock:
+            outermost = self._depth == 0
+            if outermost:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield self
+            except Exception:
+                self._depth -= 1
+                if outermost:
+                    self._conn.execute("ROLLBACK")
+                    self._pending_mirror = []
+                raise
+            self._depth -= 1
+            if outermost:
+                self._conn.execute("COMMIT")
+                pending, self._pending_mirror = self._pending_mirror, []
+                for operation, args in pending:
+                    self._forward(operation, *args)
+
+    def _last_row(self, name):
+        row = self._conn.execute(
+            "SELECT MAX(row_num) FROM sheet_rows WHERE sheet = ?", (name,)
+        ).fetchone()
+        return row[0] or 0
+
+    def read_table(self, name):
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT row_num, cells FROM sheet_rows WHERE sheet = ? ORDER BY row_num",
+                (name,)
+            ).fetchall()
+        if not stored:
+            return []
+        # Blank rows in the middle come back as [] like they do from Sheets
+        values = [[] for _ in range(stored[-1][0])]
+        for row_num, cells in stored:
+            values[row_num - 1] = json.loads(cells)
+        return values
+
+    def read_tables(self, names):
+        with self._lock:
+            if self._depth:
+                return {name: self.read_table(name) for name in names}
+            # A read transaction keeps other writers from landing between the tables
+            self._conn.execute("BEGIN")
+            try:
+                return {name: self.read_table(name) for name in names}
+            finally:
+                self._conn.execute("COMMIT")
+
+    def upsert_tables(self, updates):
+        with self.transaction():
+            return {name: self.upsert_rows(name, rows) for name, rows in updates.items()}
+
+    def upsert_rows(self, name, rows):
+        if not rows:
+            return 0
+        with self.transaction():
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sheet_rows (sheet, row_num, cells) VALUES (?, ?, ?)",
+                [
+                    (name, row_num, json.dumps([cell_to_text(v) for v in row]))
+                    for row_num, row in rows.items()
+                ]
+            )
+        self._forward('upsert_rows', name, rows)
+        return len(rows)
+
+    def append_rows(self, name, rows):
+        if not rows:
+            return None
+        with self.transaction():
+            start = self._last_row(name) + 1
+            self._conn.executemany(
+                "INSERT INTO sheet_rows (sheet, row_num, cells) VALUES (?, ?, ?)",
+                [
+                    (name, start + offset, json.dumps([cell_to_text(v) for v in row]))
+                    for offset, row in enumerate(rows)
+                ]
+            )
+        self._forward('append_rows', name, rows)
+        return start
+
+    def delete_rows(self, name, start_row, end_row=None):
+        with self.transaction():
+            if end_row is None:
+                self._conn.execute(
+                    "DELETE FROM sheet_rows WHERE sheet = ? AND row_num >= ?",
+                    (name, start_row)
+                )
+            else:
+                self._conn.execute(
+                    "DELETE FROM sheet_rows WHERE sheet = ? AND row_num BETWEEN ? AND ?",
+                    (name, start_row, end_row)
+                )
+        self._forward('delete_rows', name, start_row, end_row)
+
+    def _forward(self, operation, *args):
+        """Replay a committed write on the mirror backend, if there is one."""
+        if self.mirror is None:
+            return
+        if self._depth:
+            # Inside a transaction: hold the write until the outer commit
+            self._pending_mirror.append((operation, args))
+            return
+        try:
+            getattr(self.mirror, operation)(*args)
+        except Exception as e:
+            logger.warning(f"Mirror {operation} failed for {args[0]}: {str(e)}")
+
+    def sync_mirror(self, names):
+        """Push full copies of the given tables to the mirror, e.g. after it was unreachable."""
+        if self.mirror is None:
+            return
+        for name in names:
+            values = self.read_table(name)
+            if values:
+                self.mirror.upsert_rows(name, {i + 1: row for i, row in enumerate(values)})
+            self.mirror.delete_rows(name, len(values) + 1)
+
+
+def create_backend():
+    """Build the storage backend selected by config.STORAGE_BACKEND."""
+    if config.STORAGE_BACKEND == "fake":
+        from .fake_sheets import FakeSheetsService
+
+        service = FakeSheetsService(
+            latency=config.FAKE_SHEETS_LATENCY_SECONDS,
+            quota_per_minute=config.FAKE_SHEETS_QUOTA_PER_MINUTE
+        )
+        return SheetsBackend(spreadsheet_id="fake", service=service)
+    if config.STORAGE_BACKEND == "sqlite":
+        mirror = SheetsBackend() if config.SQLITE_MIRROR_TO_SHEETS else None
+        return SQLiteBackend(config.SQLITE_PATH, mirror=mirror)
+    if config.STORAGE_BACKEND == "sheets":
+        return SheetsBackend()
+    raise ValueError(f"Unknown storage backend: {config.STORAGE_BACKEND}")
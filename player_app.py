@@ -1,16 +1,33 @@
 import streamlit as st
 from pickleball.csv_manager import CSVManager
-from pickleball import config
+from pickleball import config, startup
 import pandas as pd
 from datetime import datetime
 import numpy as np
-from PIL import Image
 import time
 import extra_streamlit_components as stx
 import traceback
-import qrcode
 import io
 
+_render_start = time.perf_counter()
+
+@st.cache_data
+def qr_code_png(url):
+    """PNG bytes of a QR code for url. qrcode is only imported the first time one is drawn."""
+    with startup.timed("import qrcode"):
+        import qrcode
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(url)
+    qr.make(fit=True)
+    
+    # Create the QR code image
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    # Convert PIL image to bytes
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
 def display_qr_code():
     """Display QR code at the bottom of the page"""
 
@@ -44,17 +61,7 @@ def display_qr_code():
     st.subheader("Let someone scan this code to view the player app")
     
     # Generate QR code for the current page URL
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data("https://pickleball-tournament.streamlit.app/")  # Get the current URL
-    qr.make(fit=True)
-    
-    # Create the QR code image
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert PIL image to bytes
-    img_byte_arr = io.BytesIO()
-    img.save(img_byte_arr, format='PNG')
-    img_byte_arr = img_byte_arr.getvalue()
+    img_byte_arr = qr_code_png("https://pickleball-tournament.streamlit.app/")
     
     # Display the QR code
     st.image(img_byte_arr)
@@ -84,8 +91,9 @@ def main():
     # Initialize sheets manager
     sheets_mgr = CSVManager()
 
-    # Get all players and sort by name
-    players_df = sheets_mgr.read_sheet(config.SHEET_PLAYERS)
+    # Fetch players and matches together, then sort players by name
+    frames = sheets_mgr.read_all([config.SHEET_PLAYERS, config.SHEET_MATCHES])
+    players_df = frames[config.SHEET_PLAYERS]
     player_names = players_df[config.COL_NAME].sort_values().tolist()
 
     # Get current selection from cookie and initialize session state
@@ -147,17 +155,10 @@ def main():
             st.write(f"Average Points per Game: {avg_points_display}")
             
             # Display player's current match and score entry
-            matches_df = sheets_mgr.read_sheet(config.SHEET_MATCHES)
-            current_match = matches_df[
-                ((matches_df[config.COL_TEAM1_PLAYER1] == selected_player) |
-                 (matches_df[config.COL_TEAM1_PLAYER2] == selected_player) |
-                 (matches_df[config.COL_TEAM2_PLAYER1] == selected_player) |
-                 (matches_df[config.COL_TEAM2_PLAYER2] == selected_player)) &
-                (matches_df[config.COL_MATCH_STATUS].isin([config.STATUS_SCHEDULED, config.STATUS_IN_PROGRESS]))
-            ]
+            player_matches = sheets_mgr.player_matches(selected_player)
             
-            if not current_match.empty:
-                match = current_match.iloc[0]
+            if player_matches.current is not None:
+                match = player_matches.current
                 st.header("Your Current Match")
                 court_number = match[config.COL_COURT_NUMBER]
                 if pd.isna(court_number):
@@ -194,24 +195,9 @@ def main():
                 st.info("⚠️ Note: Match scores must be entered by the tournament coordinator.")
             
             # Display upcoming matches
-            upcoming_matches = matches_df[
-                ((matches_df[config.COL_TEAM1_PLAYER1] == selected_player) |
-                 (matches_df[config.COL_TEAM1_PLAYER2] == selected_player) |
-                 (matches_df[config.COL_TEAM2_PLAYER1] == selected_player) |
-                 (matches_df[config.COL_TEAM2_PLAYER2] == selected_player)) &
-                (matches_df[config.COL_MATCH_STATUS] == config.STATUS_PENDING)
-            ]
-            
             st.write("### Up-coming Matches")
-            if not upcoming_matches.empty:
-                # Get all pending matches to determine queue position
-                all_pending_matches = matches_df[matches_df[config.COL_MATCH_STATUS] == config.STATUS_PENDING]
-                all_pending_matches = all_pending_matches.reset_index()  # Reset index to get position
-                
-                for _, match in upcoming_matches.iterrows():
-                    # Find position in pending queue
-                    match_position = all_pending_matches[all_pending_matches[config.COL_MATCH_ID] == match[config.COL_MATCH_ID]].index[0] + 1
-                    
+            if player_matches.upcoming:
+                for match_position, match in player_matches.upcoming:
                     court_number = match[config.COL_COURT_NUMBER]
                     if pd.isna(court_number):
                         court_display = "Court TBC"
@@ -227,17 +213,9 @@ def main():
                 st.info("Check back when a court is free for your next scheduled match")
 
             # Display completed matches
-            completed_matches = matches_df[
-                ((matches_df[config.COL_TEAM1_PLAYER1] == selected_player) |
-                 (matches_df[config.COL_TEAM1_PLAYER2] == selected_player) |
-                 (matches_df[config.COL_TEAM2_PLAYER1] == selected_player) |
-                 (matches_df[config.COL_TEAM2_PLAYER2] == selected_player)) &
-                (matches_df[config.COL_MATCH_STATUS] == config.STATUS_COMPLETED)
-            ].sort_values(by=config.COL_END_TIME)  # Sort by end time to get chronological order
-            
             st.write("### Completed Matches")
-            if not completed_matches.empty:
-                for match_num, (_, match) in enumerate(completed_matches.iterrows(), 1):
+            if player_matches.completed:
+                for match_num, match in enumerate(player_matches.completed, 1):
                     court_number = match[config.COL_COURT_NUMBER]
                     if pd.isna(court_number):
                         court_display = "Court TBC"
@@ -262,6 +240,7 @@ def main():
 
     # Always display the QR code at the bottom
     display_qr_code()
+    startup.report("Player App", _render_start)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,76 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from pickleball import config
+from pickleball.fake_sheets import FakeSheetsService
+from pickleball.governor import RequestGovernor
+from pickleball.sheets_manager import SheetsManager
+from pickleball.storage import SheetsBackend
+
+
+class Clock:
+    """Stands in for time.monotonic and time.sleep: sleeping moves the clock on at once."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(time, "sleep", clock.sleep)
+    return clock
+
+
+def player_rows(count):
+    """Players sheet rows for count checked-in players, alternating men and women."""
+    check_in = datetime.now().strftime(config.TIMESTAMP_FORMAT)
+    return [
+        [f"Player {i + 1}", config.STATUS_ACTIVE,
+         config.GENDER_FEMALE if i % 2 else config.GENDER_MALE, 0, 0, check_in, "", 0]
+        for i in range(count)
+    ]
+
+
+def _spreadsheet(players=8, events=True):
+    """Initial sheets for a FakeSheetsService, as initialize_sheets.py lays them out."""
+    sheets = {
+        config.SHEET_PLAYERS: [config.PLAYERS_COLUMNS] + player_rows(players),
+        config.SHEET_MATCHES: [config.MATCHES_COLUMNS],
+        config.SHEET_SCORES: [config.SCORES_COLUMNS],
+        config.SHEET_META: [["Sheet", "Revision"]],
+    }
+    if events:
+        sheets[config.SHEET_EVENTS] = [config.EVENTS_COLUMNS]
+    return sheets
+
+
+@pytest.fixture
+def spreadsheet():
+    """Build initial sheets for a FakeSheetsService: spreadsheet(players=8, events=True) -> {sheet: rows}."""
+    return _spreadsheet
+
+
+@pytest.fixture
+def make_manager():
+    """Build a SheetsManager on a fake spreadsheet: make_manager(sheets, governor, **service_args) -> (manager, service).
+
+    The default governor never throttles.
+    """
+    def make(sheets=None, governor=None, **service_args):
+        service = FakeSheetsService(sheets=sheets or _spreadsheet(), **service_args)
+        governor = governor or RequestGovernor(requests_per_minute=1_000_000)
+        backend = SheetsBackend(spreadsheet_id="test", service=service, governor=governor)
+        return SheetsManager(backend=backend), service
+    return make
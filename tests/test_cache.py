@@ -0,0 +1,38 @@
+from pickleball.cache import SheetCache
+
+
+def test_entry_is_served_until_it_expires_then_only_as_stale(clock):
+    cache = SheetCache(ttl=60)
+    cache.put("Players", "rows")
+
+    assert cache.get("Players") == "rows"
+    clock.now += 61
+    assert cache.get("Players") is None
+    assert cache.get_stale("Players") == "rows"
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_invalidate_drops_the_sheet_and_only_that_sheet(clock):
+    cache = SheetCache(ttl=60)
+    cache.put("Players", "players")
+    cache.put("Matches", "matches")
+    version = cache.version("Players")
+
+    cache.invalidate("Players")
+
+    assert cache.version("Players") == version + 1
+    assert cache.get("Players") is None and cache.get_stale("Players") is None
+    assert cache.get("Matches") == "matches"
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = SheetCache(ttl=60, max_entries=2)
+    cache.put("Players", "players")
+    cache.put("Matches", "matches")
+    cache.get("Players")
+
+    cache.put("Scores", "scores")
+
+    assert cache.get_stale("Matches") is None
+    assert cache.get("Players") == "players" and cache.get("Scores") == "scores"
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,112 @@
+import pytest
+import requests
+
+from pickleball import config, csv_manager
+from pickleball.csv_manager import CSVManager
+
+META_URL = "https://example.com/meta.csv"
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} error")
+
+
+class FakeSession:
+    """Serves published CSVs by URL, answering If-None-Match with a 304 when the ETag still matches."""
+
+    def __init__(self):
+        self.csvs = {}  # url -> (text, etag)
+        self.down = False
+        self.requests = []  # (url, headers) of every request
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, headers or {}))
+        if self.down:
+            raise requests.exceptions.ConnectionError("host unreachable")
+        text, etag = self.csvs[url]
+        if (headers or {}).get('If-None-Match') == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, text, {'ETag': etag})
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """A FakeSession behind every CSVManager, with the shared downloads emptied."""
+    session = FakeSession()
+    monkeypatch.setattr(csv_manager, "_session", session)
+    monkeypatch.setattr(csv_manager, "_downloads", {})
+    monkeypatch.setattr(csv_manager, "_indexes", {})
+    return session
+
+
+def players_csv(*names):
+    return "\n".join([config.COL_NAME, *names]) + "\n"
+
+
+def publish(session, manager, sheet, text, etag):
+    session.csvs[manager.urls[sheet]] = (text, etag)
+
+
+def test_expired_download_is_revalidated_and_kept_when_unchanged(session, clock):
+    manager = CSVManager()
+    publish(session, manager, 'players', players_csv("Ann"), '"v1"')
+    manager.read_sheet('players')
+    shared = csv_manager._downloads[manager.urls['players']].df
+
+    manager.read_sheet('players')
+    assert len(session.requests) == 1
+
+    clock.now += config.CSV_CACHE_TTL_SECONDS + config.CSV_STALE_SECONDS + 1
+    assert manager.read_sheet('players')[config.COL_NAME].tolist() == ["Ann"]
+    assert session.requests[-1][1] == {'If-None-Match': '"v1"'}
+    assert csv_manager._downloads[manager.urls['players']].df is shared
+
+
+def test_sheet_is_requested_again_only_when_its_revision_moves(session, clock):
+    manager = CSVManager()
+    publish(session, manager, 'players', players_csv("Ann"), '"v1"')
+    session.csvs[META_URL] = ("Sheet,Revision\nPlayers,1\n", '"m1"')
+    CSVManager(meta_url=META_URL).read_sheet('players')
+    players_url = manager.urls['players']
+
+    clock.now += config.CSV_CACHE_TTL_SECONDS + config.CSV_STALE_SECONDS + 1
+    CSVManager(meta_url=META_URL).read_sheet('players')
+    assert [url for url, _ in session.requests].count(players_url) == 1
+
+    publish(session, manager, 'players', players_csv("Ann", "Bob"), '"v2"')
+    session.csvs[META_URL] = ("Sheet,Revision\nPlayers,2\n", '"m2"')
+    clock.now += config.CSV_CACHE_TTL_SECONDS + config.CSV_STALE_SECONDS + 1
+    assert CSVManager(meta_url=META_URL).read_sheet('players')[config.COL_NAME].tolist() == ["Ann", "Bob"]
+
+
+def test_cached_copy_is_served_while_the_host_is_down(session, clock):
+    manager = CSVManager()
+    publish(session, manager, 'players', players_csv("Ann"), '"v1"')
+    manager.read_sheet('players')
+    session.down = True
+    clock.now += config.CSV_CACHE_TTL_SECONDS + config.CSV_STALE_SECONDS + 1
+
+    assert manager.read_sheet('players')[config.COL_NAME].tolist() == ["Ann"]
+    assert CSVManager().read_sheet('matches').empty
+
+
+def test_read_all_reads_meta_once_and_every_sheet(session, clock):
+    manager = CSVManager(meta_url=META_URL)
+    session.csvs[META_URL] = ("Sheet,Revision\nPlayers,1\nMatches,1\nScores,1\n", '"m1"')
+    for sheet in manager.urls:
+        publish(session, manager, sheet, players_csv(sheet), f'"{sheet}"')
+
+    frames = manager.read_all()
+
+    assert {sheet: df[config.COL_NAME].tolist() for sheet, df in frames.items()} == {
+        'players': ["players"], 'matches': ["matches"], 'scores': ["scores"]
+    }
+    assert [url for url, _ in session.requests].count(META_URL) == 1
+    assert len(session.requests) == 4
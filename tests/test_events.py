@@ -0,0 +1,107 @@
+from pickleball import config, events
+from pickleball.events import Event, TournamentState
+
+
+def score_event(match_id="M1", team1_score=11, team2_score=5, team1_points=2.6, team2_points=1.45):
+    return Event("2024-01-01 10:00:00", events.SCORE_SUBMITTED, {
+        'match_id': match_id, 'team1_score': team1_score, 'team2_score': team2_score,
+        'team1_points': team1_points, 'team2_points': team2_points,
+    })
+
+
+def state_with_match():
+    state = TournamentState()
+    for name, gender in [("A", "M"), ("B", "F"), ("C", "M"), ("D", "F")]:
+        state.apply(Event("2024-01-01 09:00:00", events.PLAYER_ADDED, {'name': name, 'gender': gender}))
+    state.apply(Event("2024-01-01 09:00:00", events.MATCH_GENERATED,
+                      {'match_id': "M1", 'players': ["A", "B", "C", "D"], 'type': config.MATCH_TYPE_MIXED}))
+    return state
+
+
+def test_score_applied_twice_counts_once():
+    state = state_with_match()
+    state.apply(score_event())
+    state.apply(score_event())
+
+    assert len(state.scores) == 4
+    assert [p[config.COL_GAMES_PLAYED] for p in state.players] == [1, 1, 1, 1]
+    assert state.find_player("A")[config.COL_TOTAL_POINTS] == 2.6
+
+
+def test_corrected_score_is_applied():
+    state = state_with_match()
+    state.apply(score_event())
+    state.apply(score_event(team2_score=9, team1_points=2.2, team2_points=1.8))
+
+    assert state.find_match("M1")[config.COL_TEAM2_SCORE] == 9
+    assert len(state.scores) == 4
+    assert [p[config.COL_GAMES_PLAYED] for p in state.players] == [1, 1, 1, 1]
+    assert state.find_player("A")[config.COL_TOTAL_POINTS] == 2.2
+    assert state.find_player("D")[config.COL_TOTAL_POINTS] == 1.8
+    assert state.find_player("D")[config.COL_AVG_POINTS] == 1.8
+
+
+def test_duplicate_player_and_match_are_skipped():
+    state = state_with_match()
+    state.apply(Event("2024-01-01 09:05:00", events.PLAYER_ADDED, {'name': "A", 'gender': "F"}))
+    state.apply(Event("2024-01-01 09:05:00", events.MATCH_GENERATED,
+                      {'match_id': "M1", 'players': ["D", "C", "B", "A"], 'type': config.MATCH_TYPE_MIXED}))
+
+    assert len(state.players) == 4
+    assert state.find_player("A")[config.COL_GENDER] == "M"
+    assert len(state.matches) == 1
+    assert state.find_match("M1")[config.COL_TEAM1_PLAYER1] == "A"
+
+
+def test_retried_score_after_failed_view_write_counts_once(make_manager):
+    manager, service = make_manager()
+    manager.generate_next_matches([f"Player {i + 1}" for i in range(8)], 2)
+    matches = manager.read_sheet(config.SHEET_MATCHES)
+    match_id = matches[config.COL_MATCH_ID].iloc[0]
+
+    # The score is logged, but writing the views fails
+    write_all_changes = manager.write_all_changes
+    manager.write_all_changes = lambda *args, **kwargs: False
+    assert not manager.update_match_score(match_id, 11, 5)
+    manager.write_all_changes = write_all_changes
+
+    assert manager.update_match_score(match_id, 11, 5)
+    scores = manager.read_sheet(config.SHEET_SCORES)
+    players = manager.read_sheet(config.SHEET_PLAYERS)
+    assert len(scores) == 4
+    assert players[config.COL_GAMES_PLAYED].max() == 1
+
+
+def test_rebuild_from_start_keeps_rows_added_before_the_log(make_manager):
+    manager, service = make_manager()
+
+    assert not manager.rebuild_views(from_start=True)
+    assert len(manager.read_sheet(config.SHEET_PLAYERS)) == 8
+
+
+def test_rebuild_from_start_replays_the_log(make_manager, spreadsheet):
+    manager, service = make_manager(spreadsheet(players=0))
+    for i in range(4):
+        assert manager.add_player(f"Player {i + 1}", is_woman=bool(i % 2))
+
+    assert manager.rebuild_views(from_start=True)
+    assert manager.read_sheet(config.SHEET_PLAYERS)[config.COL_NAME].tolist() == [f"Player {i + 1}" for i in range(4)]
+
+
+def test_changes_without_an_events_sheet_are_written_unlogged(make_manager, spreadsheet):
+    manager, service = make_manager(spreadsheet(players=0, events=False))
+
+    assert manager.add_player("Player 1")
+    assert manager.read_sheet(config.SHEET_PLAYERS)[config.COL_NAME].tolist() == ["Player 1"]
+
+
+def test_rejected_event_append_is_an_error(make_manager, spreadsheet):
+    manager, service = make_manager(spreadsheet(players=0))
+
+    def reject(name, rows):
+        raise service._error(400, "Invalid values")
+    manager.backend.append_rows = reject
+
+    assert not manager.add_player("Player 1")
+    assert manager._events_available is not False
+    assert service.sheets[config.SHEET_PLAYERS] == [config.PLAYERS_COLUMNS]
@@ -0,0 +1,87 @@
+import pytest
+
+from pickleball import config
+from pickleball.fake_sheets import FakeSheetsService
+from pickleball.governor import QuotaExceeded, RequestGovernor
+from pickleball.storage import SheetsBackend
+
+
+@pytest.fixture
+def make_backend(spreadsheet):
+    """Build a SheetsBackend on a fake spreadsheet: make_backend(governor_args, **service_args) -> (backend, service, governor)."""
+    def make(governor_args=None, **service_args):
+        service = FakeSheetsService(sheets=spreadsheet(), **service_args)
+        gate = RequestGovernor(**{'requests_per_minute': 1_000_000, **(governor_args or {})})
+        return SheetsBackend(spreadsheet_id="test", service=service, governor=gate), service, gate
+    return make
+
+
+def test_rejected_call_is_retried_after_retry_after(make_backend, clock):
+    backend, service, gate = make_backend(fail_every=2, retry_after=3)
+
+    first = backend.read_table(config.SHEET_PLAYERS)
+    assert backend.read_table(config.SHEET_PLAYERS) == first
+    assert service.rejected['values.get'] == 1
+    assert gate.calls['values.get'] == 3
+    assert clock.slept == [3]
+
+
+def test_append_rejected_with_429_lands_once(make_backend, clock):
+    backend, service, gate = make_backend(fail_every=2, retry_after=0)
+
+    backend.read_table(config.SHEET_EVENTS)
+    backend.append_rows(config.SHEET_EVENTS, [["2024-01-01 10:00:00", "Test", "{}"]])
+    assert service.rejected['values.append'] == 1
+    assert service.sheets[config.SHEET_EVENTS][1:] == [["2024-01-01 10:00:00", "Test", "{}"]]
+
+
+def test_backoff_without_retry_after_grows_until_quota_exceeded(make_backend, clock):
+    backend, service, gate = make_backend({'backoff_base': 1, 'backoff_max': 64, 'max_wait': 5}, fail_every=1)
+
+    with pytest.raises(QuotaExceeded):
+        backend.read_table(config.SHEET_PLAYERS)
+    assert service.rejected['values.get'] == gate.calls['values.get'] == len(clock.slept) + 1
+    assert all(0 <= delay <= 2 ** attempt for attempt, delay in enumerate(clock.slept))
+    assert gate.throttled['values.get'] == 1
+
+
+def test_quota_exceeded_when_retry_after_is_past_max_wait(make_backend, clock):
+    backend, service, gate = make_backend({'max_wait': 5}, quota_per_minute=2, retry_after=30)
+
+    backend.read_table(config.SHEET_PLAYERS)
+    backend.read_table(config.SHEET_MATCHES)
+    with pytest.raises(QuotaExceeded) as error:
+        backend.read_table(config.SHEET_SCORES)
+    assert error.value.retry_after == 30
+    assert service.rejected['values.get'] == 1
+    assert gate.throttled['values.get'] == 1
+    assert gate.retry_after('read') == 30
+    assert clock.slept == []
+
+
+def test_manager_serves_cached_sheet_while_over_quota(make_manager, clock):
+    manager, service = make_manager(governor=RequestGovernor(requests_per_minute=1_000_000, max_wait=5),
+                                    retry_after=30)
+    players = manager.read_sheet(config.SHEET_PLAYERS)
+    clock.now += config.CACHE_TTL_SECONDS + 1
+    service.fail_every = 1
+
+    assert manager.read_sheet(config.SHEET_PLAYERS) is players
+    assert sum(service.rejected.values()) == 1
+
+
+def test_manager_does_not_wait_on_the_quota_when_it_has_cached_data(make_manager, clock):
+    manager, service = make_manager(governor=RequestGovernor(requests_per_minute=1_000_000, max_wait=60),
+                                    retry_after=30)
+    players, matches = manager.read_sheets([config.SHEET_PLAYERS, config.SHEET_MATCHES])
+    service.fail_every = 1
+    clock.now += config.CACHE_TTL_SECONDS + 1
+    assert manager.read_sheet(config.SHEET_SCORES).empty  # Nothing cached, so this one waits and fails
+    sent = sum(service.calls.values())
+    slept = len(clock.slept)
+
+    assert manager.read_sheet(config.SHEET_PLAYERS) is players
+    cached_players, cached_matches = manager.read_sheets([config.SHEET_PLAYERS, config.SHEET_MATCHES])
+    assert cached_players is players and cached_matches is matches
+    assert sum(service.calls.values()) == sent
+    assert len(clock.slept) == slept
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from pickleball import config
+from pickleball.player_index import build_player_index
+
+
+def match(match_id, players, status, end_time=None):
+    return {
+        config.COL_MATCH_ID: match_id,
+        **dict(zip(config.MATCH_PLAYER_COLUMNS, players)),
+        config.COL_MATCH_STATUS: status,
+        config.COL_END_TIME: end_time,
+    }
+
+
+def test_each_player_gets_their_current_upcoming_and_completed_matches():
+    matches = pd.DataFrame([
+        match("M1", ["A", "B", "C", "D"], config.STATUS_COMPLETED, "2024-01-01 10:30:00"),
+        match("M2", ["A", "C", "E", "F"], config.STATUS_COMPLETED, "2024-01-01 10:00:00"),
+        match("M3", ["A", "B", "E", "F"], config.STATUS_IN_PROGRESS),
+        match("M4", ["C", "D", "G", "H"], config.STATUS_PENDING),
+        match("M5", ["A", "D", "G", "H"], config.STATUS_PENDING),
+    ])
+
+    index = build_player_index(matches)
+
+    assert index["A"].current[config.COL_MATCH_ID] == "M3"
+    assert [(position, m[config.COL_MATCH_ID]) for position, m in index["A"].upcoming] == [(2, "M5")]
+    assert [m[config.COL_MATCH_ID] for m in index["A"].completed] == ["M2", "M1"]
+    assert index["G"].current is None
+    assert [position for position, _ in index["G"].upcoming] == [1, 2]
+
+
+def test_blank_seats_are_not_players():
+    matches = pd.DataFrame([match("M1", ["A", "", "C", float("nan")], config.STATUS_SCHEDULED)])
+
+    assert set(build_player_index(matches)) == {"A", "C"}
+    assert build_player_index(pd.DataFrame()) == {}
@@ -0,0 +1,229 @@
+import concurrent.futures
+import itertools
+import math
+import random
+import time
+
+import pandas as pd
+
+from pickleball import config, events, scheduler
+from pickleball.events import Event
+
+
+def roster(count):
+    """count players alternating men and women, as (players, males, females)."""
+    players = [f"P{i}" for i in range(count)]
+    return players, players[0::2], players[1::2]
+
+
+def stats_after(players, matches=()):
+    """PlayerStats for players once matches, (players, type) pairs, have all been played."""
+    matches_df = pd.DataFrame([
+        {
+            config.COL_MATCH_ID: f"M{i + 1}",
+            **dict(zip(config.MATCH_PLAYER_COLUMNS, seats)),
+            config.COL_END_TIME: "2024-01-01 10:00:00",
+            config.COL_MATCH_STATUS: config.STATUS_COMPLETED,
+            config.COL_MATCH_TYPE: match_type,
+        }
+        for i, (seats, match_type) in enumerate(matches)
+    ], columns=config.MATCHES_COLUMNS)
+    return scheduler.player_stats(players, matches_df, now="2024-01-01 11:00:00")
+
+
+def test_search_scores_every_match_among_the_players_once():
+    players, males, females = roster(8)
+    stats = stats_after(players)
+
+    candidates, searched = scheduler.search(scheduler.need_order(stats, players), males, females, stats, math.inf)
+
+    foursomes = [frozenset(c.players) for c in candidates]
+    assert searched == 8
+    # Mixed: two of the four men with two of the four women; same gender: all four of either
+    assert len(foursomes) == len(set(foursomes)) == 6 * 6 + 2
+    assert [c.score for c in candidates] == sorted((c.score for c in candidates), reverse=True)
+
+
+def test_search_past_its_deadline_still_returns_a_candidate():
+    players, males, females = roster(12)
+    stats = stats_after(players)
+
+    candidates, searched = scheduler.search(players, males, females, stats, deadline=0)
+
+    assert candidates and searched < len(players)
+
+
+def test_fill_round_fills_free_courts_from_unused_players():
+    players, males, females = roster(16)
+    stats = stats_after(players)
+    first = scheduler.Candidate(("P0", "P1", "P2", "P3"), config.MATCH_TYPE_MIXED)
+
+    matches = scheduler.fill_round(stats, [first], players, males, females, 4)
+
+    seated = [p for match in matches for p in match.players]
+    assert matches[0] is first and len(matches) == 4
+    assert len(seated) == len(set(seated)) == 16
+
+
+def test_kernel_scores_a_batch_as_it_scores_each_match():
+    players, males, females = roster(12)
+    stats = stats_after(players, [(("P0", "P2", "P4", "P6"), config.MATCH_TYPE_MENS)])
+    seats = [[stats.ids[p] for p in four] for four in [("P0", "P2", "P8", "P10"), ("P0", "P8", "P2", "P10")]]
+
+    batch = scheduler.score_matches(stats, seats, config.MATCH_TYPE_MENS)
+
+    assert batch.tolist() == [scheduler.score_matches(stats, [row], config.MATCH_TYPE_MENS)[0] for row in seats]
+    # P0 and P2 partnered before; splitting them up loses the penalty and nothing else
+    assert batch[1] - batch[0] == config.PARTNER_REPEAT_PENALTY
+
+
+def test_interaction_index_follows_events_like_a_rebuild():
+    generated = [("M1", ["A", "B", "C", "D"]), ("M2", ["A", "C", "B", "E"]), ("M3", ["E", "F", "A", "B"])]
+    index = scheduler.InteractionIndex()
+    for match_id, players in generated:
+        index.apply(Event("2024-01-01 10:00:00", events.MATCH_GENERATED,
+                          {'match_id': match_id, 'players': players, 'type': config.MATCH_TYPE_MIXED}))
+    index.apply(Event("2024-01-01 10:05:00", events.MATCH_CANCELLED, {'match_id': "M2"}))
+
+    kept = pd.DataFrame([{config.COL_MATCH_ID: match_id, **dict(zip(config.MATCH_PLAYER_COLUMNS, players))}
+                         for match_id, players in generated if match_id != "M2"])
+    rebuilt = scheduler.InteractionIndex.from_matches(kept)
+    names = ["A", "B", "C", "D", "E", "F"]
+    assert index.covers(kept)
+    assert all((mine == theirs).all() for mine, theirs in zip(index.among(names), rebuilt.among(names)))
+    assert index.among(["A", "B"])[0][0, 1] == 2
+
+
+def best_packing(candidates, court_count):
+    """(courts filled, score) of the best round of candidates, by trying every combination."""
+    best = (0, 0)
+    for size in range(1, court_count + 1):
+        for combo in itertools.combinations(candidates, size):
+            seated = [p for c in combo for p in c.players]
+            if len(seated) != len(set(seated)):
+                continue
+            if any(sum(c.type == t for c in combo) > scheduler.type_cap(size) for t in scheduler.TYPE_ORDER):
+                continue
+            best = max(best, (size, sum(c.score for c in combo)))
+    return best
+
+
+def test_pack_round_finds_the_best_round():
+    rng = random.Random(3)
+    for trial in range(100):
+        players = [f"P{i}" for i in range(rng.randint(6, 12))]
+        candidates = sorted(
+            (scheduler.Candidate(tuple(rng.sample(players, 4)), rng.choice(scheduler.TYPE_ORDER), rng.randint(-50, 100), (i,))
+             for i in range(rng.randint(3, 20))),
+            key=lambda c: (-c.score, c.rank)
+        )
+        court_count = rng.randint(1, 3)
+
+        packed, bound = scheduler.pack_round(candidates, court_count)
+
+        assert (len(packed), sum(c.score for c in packed)) == best_packing(candidates, court_count)
+        assert bound == sum(c.score for c in packed)
+
+
+def test_pack_round_cut_short_bounds_every_round():
+    players, males, females = roster(16)
+    stats = stats_after(players)
+    candidates, _ = scheduler.search(players, males, females, stats, math.inf)
+
+    packed, bound = scheduler.pack_round(candidates, 4, deadline=0)
+
+    assert len(packed) == 4
+    assert bound >= sum(c.score for c in packed)
+    assert bound >= scheduler.pack_round(candidates, 4)[1]
+
+
+def test_best_split_keeps_past_partners_apart():
+    players, males, females = roster(8)
+    stats = stats_after(players, [(("P0", "P2", "P4", "P6"), config.MATCH_TYPE_MENS),
+                                  (("P0", "P1", "P2", "P3"), config.MATCH_TYPE_MIXED)])
+
+    def split(four, match_type):
+        seats = scheduler.best_split(stats, [[stats.ids[p] for p in four]], match_type)
+        return tuple(stats.names[i] for i in seats[0])
+
+    # Both splits that part the pairs repeat the same number of match-ups; the first one wins the tie
+    assert split(("P0", "P2", "P4", "P6"), config.MATCH_TYPE_MENS) == ("P0", "P4", "P2", "P6")
+    # Mixed matches only swap the women, keeping a man and a woman on each team
+    assert split(("P0", "P1", "P4", "P5"), config.MATCH_TYPE_MIXED) == ("P0", "P5", "P4", "P1")
+    candidate = scheduler.Candidate(("P0", "P2", "P4", "P6"), config.MATCH_TYPE_MENS)
+    scheduler.score_candidates(stats, [candidate])
+    assert candidate.players == ("P0", "P4", "P2", "P6")
+
+
+def test_sharded_search_returns_the_serial_search_best_first():
+    players, males, females = roster(16)
+    stats = stats_after(players, [(("P0", "P1", "P2", "P3"), config.MATCH_TYPE_MIXED)])
+    order = scheduler.need_order(stats, players)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+        sharded, searched = scheduler._search_parallel(pool, order, males, females, stats, time.perf_counter() + 60)
+    serial, _ = scheduler.search(order, males, females, stats, math.inf)
+
+    assert searched == len(order)
+    assert [(c.players, c.score) for c in sharded] == [(c.players, c.score) for c in serial]
+
+
+def test_plan_rounds_plans_each_round_after_the_ones_before():
+    players, males, females = roster(8)
+    stats = stats_after(players)
+
+    plan = scheduler.plan_rounds(stats, players, males, females, 1, 3, deadline=time.perf_counter() + 5)
+
+    assert len(plan) == 3
+    # Each round goes to the players the rounds before it left out
+    assert set(plan[0].matches[0].players).isdisjoint(plan[1].matches[0].players)
+    assert [sum(round.games.values()) for round in plan] == [0, 4, 8]
+
+
+def test_repair_round_keeps_the_plan_only_while_it_holds():
+    players, males, females = roster(12)
+    stats = stats_after(players)
+    plan = scheduler.plan_rounds(stats, players, males, females, 2, 1, deadline=time.perf_counter() + 5)
+    planned = plan[0]
+
+    kept = scheduler.repair_round(planned, stats, players, males, females, 2, deadline=time.perf_counter() + 5)
+    assert kept == planned.matches
+
+    # A player of the first match leaves: the second is kept and a new match takes the free court
+    leaver = planned.matches[0].players[0]
+    present = [p for p in players if p != leaver]
+    repaired = scheduler.repair_round(planned, stats, present, [p for p in males if p != leaver],
+                                      [p for p in females if p != leaver], 2, deadline=time.perf_counter() + 5)
+    assert repaired[0] is planned.matches[1] and len(repaired) == 2
+    assert leaver not in repaired[1].players
+
+    # A game the plan didn't expect means the plan no longer holds
+    played = stats_after(players, [(planned.matches[0].players, planned.matches[0].type)])
+    assert scheduler.repair_round(planned, played, players, males, females, 2) is None
+
+
+def test_find_round_is_ready_by_its_deadline():
+    players, males, females = roster(120)
+    stats = stats_after(players, [((f"P{i}", f"P{i + 1}", f"P{i + 2}", f"P{i + 3}"), config.MATCH_TYPE_MIXED)
+                                  for i in range(0, 40, 4)])
+    scheduler.find_round(stats, players, males, females, 15, time.perf_counter() + 0.1)  # Warm up
+
+    started = time.perf_counter()
+    matches, quality = scheduler.find_round(stats, players, males, females, 15, started + 0.3)
+
+    # Allow for a slow machine, but not for a search that ignores the deadline
+    assert time.perf_counter() - started < 0.4
+    assert len(matches) == 15 and quality.matches == 15
+    assert quality.score <= quality.bound
+    # The bound covers the packed matches only, so the filled ones are scored apart
+    assert quality.score + quality.filled_score == sum(c.score for c in matches)
+
+
+def test_round_quality_compares_the_packed_matches_with_the_bound():
+    players, males, females = roster(8)
+    stats = stats_after(players)
+
+    matches, quality = scheduler.find_round(stats, players, males, females, 2, time.perf_counter() + 5)
+
+    assert quality.complete and not quality.filled
+    assert quality.score == quality.bound == sum(c.score for c in matches)
@@ -0,0 +1,42 @@
+from pickleball import config, schema
+
+HAND_TYPED = "5/3/2024 9:15"  # Not config.TIMESTAMP_FORMAT
+
+
+def test_blank_status_loads_as_blank_and_counts_as_active(make_manager, spreadsheet):
+    sheets = spreadsheet(players=3)
+    sheets[config.SHEET_PLAYERS][2][1] = ""
+    sheets[config.SHEET_PLAYERS][3][1] = config.STATUS_INACTIVE
+    manager, service = make_manager(sheets)
+
+    players = manager.read_sheet(config.SHEET_PLAYERS)
+    assert players[config.COL_STATUS].tolist() == [config.STATUS_ACTIVE, "", config.STATUS_INACTIVE]
+    assert manager.get_active_players()[config.COL_NAME].tolist() == ["Player 1", "Player 2"]
+
+
+def test_unparsed_timestamp_loads_as_nat(spreadsheet):
+    values = spreadsheet(players=1)[config.SHEET_PLAYERS]
+    values[1][5] = HAND_TYPED
+    df, rows = schema.parse(config.SHEET_PLAYERS, values)
+
+    assert df[config.COL_CHECK_IN_TIME].isna().all()
+    assert rows[1][5] == HAND_TYPED
+
+
+def test_unparsed_timestamp_survives_a_write_of_its_row(make_manager, spreadsheet):
+    sheets = spreadsheet(players=2)
+    sheets[config.SHEET_PLAYERS][1][5] = HAND_TYPED
+    manager, service = make_manager(sheets)
+
+    assert manager.update_player_status("Player 1", config.STATUS_INACTIVE)
+    row = service.sheets[config.SHEET_PLAYERS][1]
+    assert row[1] == config.STATUS_INACTIVE
+    assert row[5] == HAND_TYPED
+
+
+def test_unparsed_cells_flags_only_blanked_unreadable_timestamps():
+    old = ["Player 1", "Active", "M", "0", "0", HAND_TYPED, "", "0"]
+    assert schema.unparsed_cells(config.SHEET_PLAYERS, old, old[:5] + [""] + old[6:]) == [5]
+    assert schema.unparsed_cells(config.SHEET_PLAYERS, old, old) == []
+    parsed = old[:5] + ["2024-05-03 09:15:00"] + old[6:]
+    assert schema.unparsed_cells(config.SHEET_PLAYERS, parsed, old[:5] + [""] + old[6:]) == []
@@ -0,0 +1,74 @@
+import pytest
+
+from pickleball import config
+from pickleball.sheets_manager import SheetsManager
+from pickleball.storage import SQLiteBackend
+
+
+class RecordingMirror:
+    """Mirror backend that records the writes forwarded to it, failing them if asked."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.writes = []
+
+    def __getattr__(self, operation):
+        def write(*args):
+            self.writes.append((operation,) + args)
+            if self.fail:
+                raise ConnectionError("mirror is unreachable")
+        return write
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return SQLiteBackend(str(tmp_path / "tournament.db"))
+
+
+def test_rows_read_back_as_text_with_gaps_as_empty_rows(backend):
+    backend.upsert_rows("Players", {1: ["Name", "Games"], 3: ["Ann", 2.0], 4: ["Bob", None]})
+
+    assert backend.read_table("Players") == [["Name", "Games"], [], ["Ann", "2"], ["Bob", ""]]
+    assert backend.read_table("Scores") == []
+
+
+def test_append_lands_after_the_last_row_and_delete_clears_to_the_end(backend):
+    backend.upsert_rows("Events", {1: ["Time"], 2: ["a"]})
+
+    assert backend.append_rows("Events", [["b"], ["c"]]) == 3
+    backend.delete_rows("Events", 3)
+    assert backend.read_table("Events") == [["Time"], ["a"]]
+
+
+def test_failed_transaction_writes_nothing_and_mirrors_nothing(tmp_path):
+    mirror = RecordingMirror()
+    backend = SQLiteBackend(str(tmp_path / "tournament.db"), mirror=mirror)
+
+    with pytest.raises(RuntimeError):
+        with backend.transaction():
+            backend.upsert_rows("Players", {1: ["Name"]})
+            backend.append_rows("Players", [["Ann"]])
+            raise RuntimeError("stop")
+
+    assert backend.read_table("Players") == []
+    assert mirror.writes == []
+
+
+def test_mirror_gets_committed_writes_and_its_failures_are_not_raised(tmp_path):
+    mirror = RecordingMirror(fail=True)
+    backend = SQLiteBackend(str(tmp_path / "tournament.db"), mirror=mirror)
+
+    assert backend.upsert_tables({"Players": {1: ["Name"]}, "Scores": {1: ["Match ID"]}}) == {"Players": 1, "Scores": 1}
+    assert [write[:2] for write in mirror.writes] == [("upsert_rows", "Players"), ("upsert_rows", "Scores")]
+    assert backend.read_table("Players") == [["Name"]]
+
+
+def test_manager_records_changes_in_sqlite(tmp_path, spreadsheet):
+    backend = SQLiteBackend(str(tmp_path / "tournament.db"))
+    for name, rows in spreadsheet(players=0).items():
+        backend.upsert_rows(name, {i + 1: row for i, row in enumerate(rows)})
+    manager = SheetsManager(backend=backend)
+
+    assert manager.add_player("Player 1", is_woman=True)
+    assert SheetsManager(backend=backend).read_sheet(config.SHEET_PLAYERS)[config.COL_NAME].tolist() == ["Player 1"]
+    assert len(backend.read_table(config.SHEET_EVENTS)) == 2